@@ -0,0 +1,83 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Benchmark for int8 dynamic activation + int4 weight (8da4w) quantization of the `Transformer` in
+`test/quantization/model.py` on cpu, compares the unpacked int8 weight storage of
+`Int8DynActInt4WeightLinear` (dequantize + float linear) against the packed int4 storage
+(integer domain forward) and the unquantized model. Reports the size of the linear weights
+and the time of a prefill and of a decoding step
+
+Example:
+    python benchmarks/benchmark_8da4w.py --n_layer 2 --dim 1024 --groupsize 256
+"""
+import argparse
+import copy
+import pathlib
+import sys
+
+import torch
+import pandas as pd
+from torchao.quantization.GPTQ import Int8DynActInt4WeightLinear, Int8DynActInt4WeightQuantizer
+from torchao.utils import benchmark_torch_function_in_microseconds
+
+sys.path.append(str(pathlib.Path(__file__).parents[1] / "test" / "quantization"))
+from model import ModelArgs, Transformer  # noqa: E402
+
+
+def linear_weights_nbytes(model):
+    nbytes = 0
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            nbytes += module.weight.nbytes
+        elif isinstance(module, Int8DynActInt4WeightLinear):
+            nbytes += module.weight.nbytes + module.scales.nbytes + module.zeros.nbytes
+    return nbytes
+
+
+def run_benchmark(name, quantizer, model, prompt_length):
+    model = copy.deepcopy(model)
+    if quantizer is not None:
+        model = quantizer.quantize(model)
+    prompt = torch.randint(0, model.config.vocab_size, (1, prompt_length))
+    next_token = torch.randint(0, model.config.vocab_size, (1, 1))
+    with torch.no_grad():
+        prefill_time = benchmark_torch_function_in_microseconds(model, prompt, torch.arange(prompt_length))
+        decode_time = benchmark_torch_function_in_microseconds(model, next_token, torch.tensor([prompt_length]))
+    return {
+        "model": name,
+        "linear weights (MB)": linear_weights_nbytes(model) / 1e6,
+        f"prefill {prompt_length} tokens (ms)": prefill_time / 1e3,
+        "decode (ms)": decode_time / 1e3,
+        "decode tokens/s": 1e6 / decode_time,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="8da4w Transformer cpu benchmarks")
+    parser.add_argument("--n_layer", type=int, default=2)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--n_head", type=int, default=16)
+    parser.add_argument("--vocab_size", type=int, default=32000)
+    parser.add_argument("--groupsize", type=int, default=256)
+    parser.add_argument("--prompt_length", type=int, default=128)
+    args = parser.parse_args()
+
+    config = ModelArgs(n_layer=args.n_layer, n_head=args.n_head, dim=args.dim, vocab_size=args.vocab_size)
+    model = Transformer(config).eval()
+    model.setup_caches(max_batch_size=1, max_seq_length=args.prompt_length + 1)
+    # the kv cache defaults to bfloat16, the 8da4w linears run in float32
+    for b in model.layers:
+        b.attention.kv_cache.float()
+
+    configs = [
+        ("float32", None),
+        ("8da4w", Int8DynActInt4WeightQuantizer(groupsize=args.groupsize)),
+        ("8da4w packed", Int8DynActInt4WeightQuantizer(groupsize=args.groupsize, packed=True)),
+    ]
+    results = [run_benchmark(name, quantizer, model, args.prompt_length) for name, quantizer in configs]
+    df = pd.DataFrame(results)
+    print(df.to_markdown(index=False))
@@ -0,0 +1,84 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Benchmark for the search strategies of the torchao.kernel autotuner on the int_mm shapes. Tunes
+`int_matmul_kernel` for every shape with each strategy on a cold cache (nothing is written to the
+config store) and reports the tuning wall time and the time of the selected config relative to the
+config found by the exhaustive search. The nearest shape warm start uses the exhaustive results of
+the shapes tuned before it.
+
+Example:
+    python benchmarks/benchmark_autotuner_search.py --file_path benchmarks/intmm_shapes.csv --max_shapes 8
+"""
+import argparse
+import csv
+import pathlib
+import time
+
+import torch
+import pandas as pd
+
+
+def run_benchmark(m, k, n, strategies, tuned_records):
+    from torchao.kernel.autotuner import config_to_dict, do_bench, get_store_key, search_best_config
+    from torchao.kernel.intmm_triton import int8_mm_kernel_configs, int_matmul_kernel
+
+    a = torch.randint(-128, 127, (m, k), dtype=torch.int8, device="cuda")
+    b = torch.randint(-128, 127, (n, k), dtype=torch.int8, device="cuda").t()
+    c = torch.empty((m, n), dtype=torch.int32, device="cuda")
+    args = [a, b, c]
+
+    results = []
+    selected = {}
+    for strategy in strategies:
+        start = time.perf_counter()
+        config, _ = search_best_config(int_matmul_kernel, args, int8_mm_kernel_configs, strategy, tuned_records)
+        tuning_time = time.perf_counter() - start
+        selected[strategy] = config
+        results.append({"m": m, "k": k, "n": n, "strategy": strategy, "tuning time (s)": tuning_time})
+
+    # benchmark the selected configs again, so that they are all measured the same way
+    times = {strategy: do_bench(int_matmul_kernel, args, config) for strategy, config in selected.items()}
+    for result in results:
+        result["config time (ms)"] = times[result["strategy"]]
+        result["slowdown vs exhaustive"] = times[result["strategy"]] / times["exhaustive"]
+
+    key = get_store_key(int_matmul_kernel, args)
+    tuned_records.append(
+        dict(
+            zip(("kernel", "args", "device", "torch", "triton"), key),
+            config=config_to_dict(selected["exhaustive"]),
+            time=times["exhaustive"],
+        )
+    )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="autotuner search strategy benchmarks")
+    parser.add_argument("--file_path", type=str, required=True, help="Path to csv file with shapes")
+    parser.add_argument("--max_shapes", type=int, default=None)
+    parser.add_argument(
+        "--strategies", type=str, nargs="+", default=["successive_halving", "random_restart", "nearest_shape"]
+    )
+    args = parser.parse_args()
+    if not torch.cuda.is_available():
+        print("CUDA is not available, the autotuner only tunes triton kernels on cuda. Exiting the script.")
+        raise SystemExit(0)
+
+    file_path = pathlib.Path(args.file_path)
+    assert file_path.is_file()
+    # Format is (m, k, n)
+    shapes = [tuple(map(int, row)) for row in list(csv.reader(open(file_path, "r")))[1:]]
+    shapes = shapes[:args.max_shapes]
+
+    strategies = ["exhaustive"] + [s for s in args.strategies if s != "exhaustive"]
+    tuned_records = []
+    results = sum((run_benchmark(m, k, n, strategies, tuned_records) for m, k, n in shapes), [])
+    df = pd.DataFrame(results)
+    print(df.to_markdown(index=False))
+    print(df.groupby("strategy")[["tuning time (s)", "slowdown vs exhaustive"]].agg(["mean", "max"]).to_markdown())
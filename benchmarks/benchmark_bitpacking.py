@@ -0,0 +1,57 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Benchmark for the throughput of `pack_bits` / `unpack_bits` for 1 to 7 bit elements, in GB/s of
+unpacked uint8 elements, with `pack` / `unpack` into uint8 for the bit widths that divide 8
+
+Example:
+    python benchmarks/benchmark_bitpacking.py --device cpu --compile
+"""
+import argparse
+
+import torch
+import pandas as pd
+from torchao.prototype.common.bitpacking import pack, pack_bits, unpack, unpack_bits
+from torchao.utils import benchmark_torch_function_in_microseconds
+
+
+def run_benchmark(shape, nbits, device, compile):
+    data = torch.randint(0, 2**nbits, shape, dtype=torch.uint8, device=device)
+    size_gb = data.numel() / 1e9
+    pack_fn, unpack_fn = pack_bits, unpack_bits
+    if compile:
+        torch._dynamo.reset()
+        pack_fn = torch.compile(pack_bits, fullgraph=True)
+        unpack_fn = torch.compile(unpack_bits, fullgraph=True)
+
+    packed = pack_fn(data, nbits)
+    assert torch.equal(unpack_fn(packed, nbits, shape[-1]), data)
+    result = {
+        "shape": tuple(shape),
+        "nbits": nbits,
+        "pack_bits (GB/s)": size_gb / (benchmark_torch_function_in_microseconds(pack_fn, data, nbits) / 1e6),
+        "unpack_bits (GB/s)": size_gb / (benchmark_torch_function_in_microseconds(unpack_fn, packed, nbits, shape[-1]) / 1e6),
+    }
+    if 8 % nbits == 0:
+        packed = pack(data, 8, nbits, False)
+        result["pack (GB/s)"] = size_gb / (benchmark_torch_function_in_microseconds(pack, data, 8, nbits, False) / 1e6)
+        result["unpack (GB/s)"] = size_gb / (benchmark_torch_function_in_microseconds(unpack, packed, nbits, False) / 1e6)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bit packing throughput benchmarks")
+    parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--compile", action="store_true", help="benchmark torch.compile'd pack_bits / unpack_bits")
+    args = parser.parse_args()
+    # compile a graph specialized to each bit width
+    torch._dynamo.config.specialize_int = True
+
+    shapes = [(4096, 4096), (11008, 4096)]
+    results = [run_benchmark(shape, nbits, args.device, args.compile) for shape in shapes for nbits in range(1, 8)]
+    df = pd.DataFrame(results)
+    print(df.to_markdown(index=False))
@@ -0,0 +1,72 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Benchmark for int8 weight only quantized linear on cpu, compares the `int8_packed_cpu`
+AffineQuantizedTensor layout (fused `_weight_int8pack_mm` kernel) against the
+dequantize fallback and the floating point linear
+
+Example:
+    python benchmarks/benchmark_int8wo_cpu.py --file_path benchmarks/intmm_shapes.csv
+"""
+import argparse
+import csv
+import pathlib
+
+import torch
+import torch.nn.functional as F
+import pandas as pd
+from torchao.quantization.quant_api import get_apply_int8wo_quant
+from torchao.utils import benchmark_torch_function_in_microseconds
+
+
+def run_benchmark(m, k, n, dtype):
+    x = torch.randn(m, k, dtype=dtype)
+    w = torch.randn(n, k, dtype=dtype)
+
+    w_plain = get_apply_int8wo_quant()(w)
+    w_packed = get_apply_int8wo_quant(extended_layout="int8_packed_cpu")(w)
+
+    fp_time = benchmark_torch_function_in_microseconds(F.linear, x, w)
+    dequant_time = benchmark_torch_function_in_microseconds(lambda x: F.linear(x, w_plain.dequantize()), x)
+    packed_time = benchmark_torch_function_in_microseconds(F.linear, x, w_packed)
+
+    return {
+        "m": m,
+        "k": k,
+        "n": n,
+        "dtype": str(dtype),
+        "fp_time (us)": fp_time,
+        "dequant_time (us)": dequant_time,
+        "int8_packed_cpu_time (us)": packed_time,
+        "speedup (dequant / packed)": dequant_time / packed_time,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="int8 weight only cpu linear benchmarks")
+    parser.add_argument("--file_path", type=str, required=True, help="Path to csv file with shapes")
+    parser.add_argument("--dtype", type=str, default="bfloat16", choices=["float32", "bfloat16", "float16"])
+    parser.add_argument("--max_m", type=int, default=None, help="Only run shapes with m <= max_m, e.g. for decode shapes")
+    args = parser.parse_args()
+    file_path = pathlib.Path(args.file_path)
+    assert file_path.is_file()
+
+    # Format is (m, k, n)
+    shapes = list(csv.reader(open(file_path, "r")))[1:]
+    # Turn into list of int tuples
+    shapes = list(map(lambda x: tuple(map(int, x)), shapes))
+    if args.max_m is not None:
+        shapes = [shape for shape in shapes if shape[0] <= args.max_m]
+
+    dtype = getattr(torch, args.dtype)
+    results = []
+    for m, k, n in shapes:
+        results.append(run_benchmark(m, k, n, dtype))
+        print(results[-1])
+
+    df = pd.DataFrame(results)
+    print(df.to_markdown(index=False))
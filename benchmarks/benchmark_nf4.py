@@ -0,0 +1,74 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Benchmark for the throughput of `to_nf4` on cpu for typical LLM weight shapes, compares the
+search over the nf4 boundaries (binary search, or a lookup table for 16 bit dtypes) against the previous brute force nearest value search
+(distances to all 16 nf4 values, computed in chunks of 1024**2 elements)
+
+Example:
+    python benchmarks/benchmark_nf4.py --dtype bfloat16
+"""
+import argparse
+import math
+
+import torch
+import pandas as pd
+from torchao.dtypes.nf4tensor import NF4Tensor, to_nf4
+from torchao.utils import benchmark_torch_function_in_microseconds
+
+CHUNK_SIZE = 1024**2
+
+
+def brute_force_quantize_tensor_nearest(value, nf4):
+    quantized = torch.empty(value.numel(), dtype=torch.long, device=value.device)
+    for chunk_num in range(math.ceil(value.numel() / CHUNK_SIZE)):
+        start = chunk_num * CHUNK_SIZE
+        end = min(start + CHUNK_SIZE, value.numel())
+        diff = (value[start:end].unsqueeze(-1) - nf4).abs()
+        quantized[start:end] = diff.min(dim=-1).indices
+    return quantized
+
+
+def run_benchmark(shape, dtype):
+    w = torch.randn(shape, dtype=dtype)
+    size_gb = w.numel() * w.element_size() / 1e9
+
+    bucketize_time = benchmark_torch_function_in_microseconds(to_nf4, w)
+    quantize_tensor_nearest = NF4Tensor.quantize_tensor_nearest
+    NF4Tensor.quantize_tensor_nearest = staticmethod(brute_force_quantize_tensor_nearest)
+    try:
+        brute_force_time = benchmark_torch_function_in_microseconds(to_nf4, w)
+        ref = to_nf4(w)
+    finally:
+        NF4Tensor.quantize_tensor_nearest = quantize_tensor_nearest
+    assert torch.equal(ref.quantized_data, to_nf4(w).quantized_data)
+
+    return {
+        "shape": tuple(shape),
+        "dtype": str(dtype),
+        "brute force (GB/s)": size_gb / (brute_force_time / 1e6),
+        "boundaries (GB/s)": size_gb / (bucketize_time / 1e6),
+        "speedup": brute_force_time / bucketize_time,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="to_nf4 cpu throughput benchmarks")
+    parser.add_argument("--dtype", type=str, default="bfloat16", choices=["float32", "bfloat16", "float16"])
+    args = parser.parse_args()
+    dtype = getattr(torch, args.dtype)
+
+    # weight shapes of llama 7B
+    shapes = [
+        (4096, 4096),
+        (11008, 4096),
+        (4096, 11008),
+        (32000, 4096),
+    ]
+    results = [run_benchmark(shape, dtype) for shape in shapes]
+    df = pd.DataFrame(results)
+    print(df.to_markdown(index=False))
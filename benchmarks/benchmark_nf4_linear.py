@@ -0,0 +1,70 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Benchmark for `linear_nf4` forward + backward on cpu, compares dequantizing the full weight
+against dequantizing `tile_rows` rows of the weight at a time. Reports the time and the
+peak memory allocated during the call (not counting the inputs and the NF4 weight)
+
+Example:
+    python benchmarks/benchmark_nf4_linear.py --tile_rows 256
+"""
+import argparse
+
+import torch
+import pandas as pd
+from torch.profiler import profile, ProfilerActivity
+from torchao.dtypes.nf4tensor import linear_nf4, to_nf4
+from torchao.utils import benchmark_torch_function_in_microseconds
+
+
+def peak_memory_mb(f, *args):
+    with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as prof:
+        f(*args)
+    allocations = [e for e in prof.profiler.kineto_results.events() if e.name() == "[memory]"]
+    allocations.sort(key=lambda e: e.start_ns())
+    current = peak = 0
+    for e in allocations:
+        current += e.nbytes()
+        peak = max(peak, current)
+    return peak / 2**20
+
+
+def forward_backward(x, weight, grad_output, tile_rows):
+    out = linear_nf4(x, weight, tile_rows=tile_rows)
+    out.backward(grad_output)
+    x.grad = None
+
+
+def run_benchmark(m, k, n, dtype, tile_rows):
+    x = torch.randn(m, k, dtype=dtype, requires_grad=True)
+    weight = to_nf4(torch.randn(n, k, dtype=dtype))
+    grad_output = torch.randn(m, n, dtype=dtype)
+
+    result = {"m": m, "k": k, "n": n, "dtype": str(dtype)}
+    for name, rows in [("full", None), ("tiled", tile_rows)]:
+        result[f"{name} time (us)"] = benchmark_torch_function_in_microseconds(forward_backward, x, weight, grad_output, rows)
+        result[f"{name} peak memory (MB)"] = peak_memory_mb(forward_backward, x, weight, grad_output, rows)
+    result["speedup (full / tiled)"] = result["full time (us)"] / result["tiled time (us)"]
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="linear_nf4 cpu forward + backward benchmarks")
+    parser.add_argument("--dtype", type=str, default="bfloat16", choices=["float32", "bfloat16", "float16"])
+    parser.add_argument("--tile_rows", type=int, default=256)
+    args = parser.parse_args()
+    dtype = getattr(torch, args.dtype)
+
+    # (m, k, n), m is batch size * sequence length, weight shapes of llama 7B
+    shapes = [
+        (2048, 4096, 4096),
+        (2048, 4096, 11008),
+        (2048, 11008, 4096),
+    ]
+    results = [run_benchmark(m, k, n, dtype, args.tile_rows) for m, k, n in shapes]
+    df = pd.DataFrame(results)
+    print(df.to_markdown(index=False))
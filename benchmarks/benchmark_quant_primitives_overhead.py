@@ -0,0 +1,88 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Microbenchmark for the per call overhead of the affine quantization primitives with
+small, decode sized inputs (this is what dynamic activation quantization sees for every
+linear in every decoding step), with and without the memoized quantization plan, and
+with the fused `choose_qparams_and_quantize_affine`
+
+Example:
+    python benchmarks/benchmark_quant_primitives_overhead.py
+"""
+import torch
+import pandas as pd
+import torchao.quantization.quant_primitives as quant_primitives
+from torchao.quantization.quant_primitives import (
+    choose_qparams_affine,
+    choose_qparams_and_quantize_affine,
+    quantize_affine,
+    dequantize_affine,
+    MappingType,
+)
+from torchao.utils import benchmark_torch_function_in_microseconds
+
+
+def dynamic_quant_dequant(x):
+    # per token symmetric int8 quantization, same as the activation quantization in `get_apply_int8dyn_quant`
+    block_size = [1] * (x.dim() - 1) + [x.shape[-1]]
+    scale, zero_point = choose_qparams_affine(x, MappingType.SYMMETRIC, block_size, torch.int8, quant_min=-127, quant_max=127, eps=1e-5)
+    int_data = quantize_affine(x, block_size, scale, zero_point, torch.int8, -127, 127)
+    return dequantize_affine(int_data, block_size, scale, zero_point, torch.int8, -127, 127, output_dtype=x.dtype)
+
+
+def fused_dynamic_quant_dequant(x):
+    block_size = [1] * (x.dim() - 1) + [x.shape[-1]]
+    int_data, scale, zero_point = choose_qparams_and_quantize_affine(x, MappingType.SYMMETRIC, block_size, torch.int8, quant_min=-127, quant_max=127, eps=1e-5)
+    return dequantize_affine(int_data, block_size, scale, zero_point, torch.int8, -127, 127, output_dtype=x.dtype)
+
+
+def uncached_quantization_plan(block_size, input_size):
+    return quant_primitives._build_quantization_plan(block_size, input_size)
+
+
+def run_benchmark(shape, dtype):
+    x = torch.randn(*shape, dtype=dtype)
+
+    cached_plan = quant_primitives._get_quantization_plan
+    quant_primitives._get_quantization_plan = uncached_quantization_plan
+    try:
+        uncached_time = benchmark_torch_function_in_microseconds(dynamic_quant_dequant, x)
+        plan_uncached_time = benchmark_torch_function_in_microseconds(uncached_quantization_plan, [1] * (x.dim() - 1) + [x.shape[-1]], x.shape)
+    finally:
+        quant_primitives._get_quantization_plan = cached_plan
+
+    cached_time = benchmark_torch_function_in_microseconds(dynamic_quant_dequant, x)
+    plan_cached_time = benchmark_torch_function_in_microseconds(cached_plan, [1] * (x.dim() - 1) + [x.shape[-1]], x.shape)
+    fused_time = benchmark_torch_function_in_microseconds(fused_dynamic_quant_dequant, x)
+
+    return {
+        "shape": tuple(shape),
+        "dtype": str(dtype),
+        "plan uncached (us)": plan_uncached_time,
+        "plan cached (us)": plan_cached_time,
+        "qdq uncached (us)": uncached_time,
+        "qdq cached (us)": cached_time,
+        "qdq speedup": uncached_time / cached_time,
+        "fused qdq (us)": fused_time,
+    }
+
+
+if __name__ == "__main__":
+    shapes = [
+        (1, 1, 4096),
+        (1, 4, 4096),
+        (8, 1, 4096),
+        (1, 1, 11008),
+        (1, 512, 4096),
+    ]
+    results = []
+    for shape in shapes:
+        for dtype in [torch.float32, torch.bfloat16]:
+            results.append(run_benchmark(shape, dtype))
+
+    df = pd.DataFrame(results)
+    print(df.to_markdown(index=False))
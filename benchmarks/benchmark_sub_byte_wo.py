@@ -0,0 +1,87 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Benchmark for cpu decoding (batch size 1) with 2 and 3 bit weight only quantization in the bit packed
+`int2_packed` / `int3_packed` layouts, compared to the unquantized weight, int8 weight only quantization and
+int4 weight only quantization in the `int4_packed_cpu` layout.
+Runs the linears of one llama 7B decoder layer and reports the bits per weight (including scales and
+zero points), the size of the linear weights of the 32 layer model, and the tokens/s of the 32 layers
+
+Example:
+    python benchmarks/benchmark_sub_byte_wo.py --groupsize 64
+"""
+import argparse
+import copy
+
+import torch
+import pandas as pd
+from torchao.dtypes.aqt import AffineQuantizedTensor
+from torchao.quantization.quant_api import (
+    get_apply_int4wo_quant,
+    get_apply_int8wo_quant,
+    get_apply_sub_byte_wo_quant,
+    quantize,
+)
+from torchao.utils import benchmark_torch_function_in_microseconds
+
+# (in_features, out_features) of the linears in a llama 7B decoder layer, q, k, v, o, w1, w3, w2
+LAYER_SHAPES = [(4096, 4096)] * 4 + [(4096, 11008)] * 2 + [(11008, 4096)]
+N_LAYERS = 32
+
+
+def weight_nbytes(weight):
+    if isinstance(weight, AffineQuantizedTensor):
+        layout_tensor = weight.layout_tensor
+        names, _ = layout_tensor.__tensor_flatten__()
+        return sum(getattr(layout_tensor, name).nbytes for name in names)
+    return weight.nbytes
+
+
+def run_layer(linears, inputs):
+    for linear, x in zip(linears, inputs):
+        linear(x)
+
+
+def run_benchmark(name, apply_quant, linears, inputs):
+    linears = copy.deepcopy(linears)
+    if apply_quant is not None:
+        linears = quantize(linears, apply_quant)
+    numel = sum(linear.weight.numel() for linear in linears)
+    nbytes = sum(weight_nbytes(linear.weight) for linear in linears)
+    with torch.no_grad():
+        layer_time = benchmark_torch_function_in_microseconds(run_layer, linears, inputs)
+    return {
+        "weight": name,
+        "bits per weight": nbytes * 8 / numel,
+        "model linears (GB)": nbytes * N_LAYERS / 1e9,
+        "layer time (ms)": layer_time / 1e3,
+        "tokens/s": 1e6 / (layer_time * N_LAYERS),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="sub byte weight only quantization cpu decoding benchmarks")
+    parser.add_argument("--dtype", type=str, default="bfloat16", choices=["float32", "bfloat16"])
+    parser.add_argument("--groupsize", type=int, default=64)
+    args = parser.parse_args()
+    dtype = getattr(torch, args.dtype)
+
+    linears = torch.nn.ModuleList(
+        [torch.nn.Linear(k, n, bias=False, dtype=dtype) for k, n in LAYER_SHAPES]
+    ).eval()
+    inputs = [torch.randn(1, k, dtype=dtype) for k, _ in LAYER_SHAPES]
+
+    configs = [
+        (str(dtype), None),
+        ("int8 (int8_packed_cpu)", get_apply_int8wo_quant(extended_layout="int8_packed_cpu")),
+        (f"int4 (int4_packed_cpu, groupsize {args.groupsize})", get_apply_int4wo_quant(args.groupsize, "int4_packed_cpu")),
+        (f"int3 (int3_packed, groupsize {args.groupsize})", get_apply_sub_byte_wo_quant(3, args.groupsize)),
+        (f"int2 (int2_packed, groupsize {args.groupsize})", get_apply_sub_byte_wo_quant(2, args.groupsize)),
+    ]
+    results = [run_benchmark(name, apply_quant, linears, inputs) for name, apply_quant in configs]
+    df = pd.DataFrame(results)
+    print(df.to_markdown(index=False))
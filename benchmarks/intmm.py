@@ -2,18 +2,13 @@ import argparse
 import csv
 import itertools
 import math
-import sys
 import pathlib
+import time
 
 import torch
 from torchao.quantization.utils import TORCH_VERSION_AFTER_2_4, TORCH_VERSION_AFTER_2_2
 
 
-# Check if CUDA is available, if not, exit the script
-if not torch.cuda.is_available():
-    print("CUDA is not available. Exiting the script.")
-    sys.exit(0)
-
 import torch.nn.functional as F
 import torch.utils.benchmark as benchmark
 from torchao.kernel.intmm import int_matmul, int_scaled_matmul
@@ -22,12 +17,18 @@ torch._dynamo.config.cache_size_limit = 128
 torch._dynamo.config.accumulated_cache_size_limit = 128
 
 dtype = torch.float16
-device = "cuda"
+device = "cuda" if torch.cuda.is_available() else "cpu"
 
 
 def benchmark_in_ms(warmup, iters, f, *args, **kwargs):
     for _ in range(warmup):
         f(*args, **kwargs)
+    if device == "cpu":
+        start = time.perf_counter()
+        for _ in range(iters):
+            f(*args, **kwargs)
+        return (time.perf_counter() - start) * 1e3 / float(iters)
+
     torch.cuda.synchronize()
     start_event = torch.cuda.Event(enable_timing=True)
     end_event = torch.cuda.Event(enable_timing=True)
@@ -51,30 +52,29 @@ def compiled_int_mm(x, w):
     return torch._int_mm(x, w)
 
 
-def run_int_mm_benchmark(x, w, b):
-    fp_time = benchmark_in_ms(10, 100, torch.mm, x, w)
+def run_int_mm_benchmark(x, w, b, warmup, iters):
+    fp_time = benchmark_in_ms(warmup, iters, torch.mm, x, w)
     x_int = x.to(dtype=torch.int8)
     w_int = w.to(dtype=torch.int8)
-    int_mm_time = benchmark_in_ms(10, 100, int_matmul, x_int, w_int)
+    int_mm_time = benchmark_in_ms(warmup, iters, int_matmul, x_int, w_int)
     return fp_time, int_mm_time
 
 
-def run_int_scaled_mm_benchmark(x, w, b):
+def run_int_scaled_mm_benchmark(x, w, b, warmup, iters):
     scales = x.sum(-1, keepdim=True)
-    fp_time = benchmark_in_ms(10, 100, lambda x, w, s: torch.mm(x, w) * s, x, w, scales)
+    fp_time = benchmark_in_ms(warmup, iters, lambda x, w, s: torch.mm(x, w) * s, x, w, scales)
     x_int = x.to(dtype=torch.int8)
     w_int = w.to(dtype=torch.int8)
     int_scaled_mm_time = benchmark_in_ms(
-        10, 100, int_scaled_matmul, x_int, w_int, scales
+        warmup, iters, int_scaled_matmul, x_int, w_int, scales
     )
     return fp_time, int_scaled_mm_time
 
 
-def run_benchmarks(shapes):
+def run_benchmarks(shapes, warmup, iters):
     print("fn,m,k,n,fp_time,int_mm_time,ratio")
     positives = []
     dtype = torch.bfloat16
-    device = "cuda"
     for fn, (m, k, n) in itertools.product(
         [run_int_mm_benchmark, run_int_scaled_mm_benchmark], shapes
     ):
@@ -82,7 +82,7 @@ def run_benchmarks(shapes):
         w = torch.randn(n, k, dtype=dtype, device=device).t()
         b = torch.randn(m, n, dtype=dtype, device=device)
 
-        fp_time, int_mm_time = fn(x, w, b)
+        fp_time, int_mm_time = fn(x, w, b, warmup, iters)
         ratio = fp_time / int_mm_time
         result = ",".join(map(str, [fn, m, k, n, fp_time, int_mm_time, ratio]))
         print(result)
@@ -91,7 +91,12 @@ def run_benchmarks(shapes):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="integer matmul benchmarks")
     parser.add_argument("--file_path", type=str, required=True, help="Path to csv file with shapes")
+    parser.add_argument("--device", type=str, default=device, choices=["cuda", "cpu"])
+    # the defaults are for cuda, a few iterations are enough on cpu
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--iters", type=int, default=100)
     args = parser.parse_args()
+    device = args.device
     # Access the file path provided as an argument
     file_path = args.file_path
     file_path = pathlib.Path(file_path)
@@ -102,4 +107,4 @@ if __name__ == "__main__":
     # Turn into list of int tuples
     shapes = list(map(lambda x: tuple(map(int, x)), shapes))
 
-    run_benchmarks(shapes)
+    run_benchmarks(shapes, args.warmup, args.iters)
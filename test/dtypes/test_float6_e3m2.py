@@ -116,6 +116,15 @@ class TestFloat6E3M2(TestCase):
         expected = from_float6_e3m2(x_unpacked, no_bit_packing=True)
         torch.testing.assert_close(actual, expected)
 
+    @parametrize("device", _DEVICES)
+    @parametrize("dtype", _DTYPES)
+    def test_from_float6_e3m2_lut(self, device, dtype):
+        from torchao.dtypes.float6_e3m2 import _lut_float6_e3m2_to_dtype, _pt_float6_e3m2_to_float32
+
+        x = torch.randint(64, (20, 16), device=device, dtype=torch.uint8)
+        expected = _pt_float6_e3m2_to_float32(x).to(dtype)
+        torch.testing.assert_close(_lut_float6_e3m2_to_dtype(x, dtype), expected, atol=0, rtol=0)
+
     @parametrize("device", _DEVICES)
     @parametrize("no_bit_packing", [False, True])
     def test_from_float6_e3m2_compile(self, device, no_bit_packing):
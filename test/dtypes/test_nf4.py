@@ -13,12 +13,16 @@ from torch.testing._internal.common_utils import (
 )
 from torchao.dtypes.nf4tensor import (
     linear_nf4,
+    load_nf4_checkpoint,
     NF4Tensor,
+    save_nf4_checkpoint,
     to_nf4,
     _INNER_TENSOR_NAMES_FOR_SHARDING,
 )
 import torch.nn.functional as F
 import io
+import os
+import tempfile
 from collections import OrderedDict
 import torchao
 from typing import Tuple, Union
@@ -38,6 +42,53 @@ logging.basicConfig(
 )
 
 
+def _nf4_flat_all_gather_worker(rank: int, world_size: int, init_file: str, dtype: torch.dtype):
+    # all-gathers the shards of the NF4 weights the same way FSDP2 does for an FSDP unit
+    import torch.distributed as dist
+    from torch.distributed.device_mesh import init_device_mesh
+
+    dist.init_process_group("gloo", init_method=f"file://{init_file}", rank=rank, world_size=world_size)
+    try:
+        mesh = init_device_mesh("cpu", (world_size,))
+        torch.manual_seed(0)
+        # the all-gather format is chosen per tensor
+        other_weight = to_nf4(torch.randn(256, 256, dtype=dtype))
+        other_inputs, other_metadata = torch.chunk(other_weight, world_size)[rank].fsdp_pre_all_gather(mesh)
+        assert len(other_inputs) == 3 and other_metadata[-1] is None
+
+        weights = [
+            to_nf4(torch.randn(512, 256, dtype=dtype), flat_all_gather=True),
+            to_nf4(torch.randn(256, 512, dtype=dtype), flat_all_gather=True),
+        ]
+        shards = [torch.chunk(weight, world_size)[rank] for weight in weights]
+        all_gather_inputs, metadatas = zip(*(shard.fsdp_pre_all_gather(mesh) for shard in shards))
+        all_gather_inputs = [t for inputs in all_gather_inputs for t in inputs]
+        assert len(all_gather_inputs) == len(weights)
+        assert all(t.dtype == torch.uint8 for t in all_gather_inputs)
+
+        flat_input = torch.cat(all_gather_inputs)
+        flat_output = flat_input.new_empty(world_size * flat_input.numel())
+        dist.all_gather_into_tensor(flat_output, flat_input)
+        split_sizes = [t.numel() for t in all_gather_inputs]
+        outputs = [t.reshape(-1) for t in flat_output.view(world_size, -1).split(split_sizes, dim=1)]
+
+        for weight, shard, output, metadata in zip(weights, shards, outputs, metadatas):
+            unsharded, inner_tensors = shard.fsdp_post_all_gather((output,), metadata, dtype)
+            assert inner_tensors == (output,)
+            for name in _INNER_TENSOR_NAMES_FOR_SHARDING:
+                # views of the all-gather output, no copies
+                assert getattr(unsharded, name).untyped_storage().data_ptr() == output.untyped_storage().data_ptr()
+            assert unsharded.shape == weight.shape
+            assert unsharded.flat_all_gather
+            torch.testing.assert_close(unsharded.get_original_weight(), weight.get_original_weight(), atol=0, rtol=0)
+            inp = torch.randn(4, weight.size(1), dtype=dtype)
+            torch.testing.assert_close(linear_nf4(inp, unsharded), linear_nf4(inp, weight))
+            torch.testing.assert_close(linear_nf4(inp, unsharded, tile_rows=64), linear_nf4(inp, weight, tile_rows=64))
+            assert shard.fsdp_post_all_gather((output,), metadata, dtype, out=unsharded) is None
+    finally:
+        dist.destroy_process_group()
+
+
 def _build_input_weight(embed_dim: int, device: torch.device, dtype: torch.dtype):
     torch.manual_seed(0)
     input_weight = torch.empty(
@@ -97,6 +148,24 @@ class TestNF4Linear(TestCase):
         assert inp.grad is not None and inp.grad.dtype == dtype
         assert nf4_tensor.grad is None
 
+    @parametrize("dtype", [torch.bfloat16, torch.float16, torch.float32])
+    @parametrize("tile_rows", [64, 100, 512])
+    def test_linear_nf4_tiled(self, dtype: torch.dtype, tile_rows: int):
+        nf4_tensor = to_nf4(torch.randn(512, 384, dtype=dtype))
+        inp = torch.randn(2, 3, 384, dtype=dtype, requires_grad=True)
+        inp_tiled = inp.detach().clone().requires_grad_(True)
+        out = linear_nf4(inp, nf4_tensor)
+        out_tiled = linear_nf4(inp_tiled, nf4_tensor, tile_rows=tile_rows)
+        grad_output = torch.randn_like(out)
+        out.backward(grad_output)
+        out_tiled.backward(grad_output)
+        self.assertEqual(out_tiled.dtype, dtype)
+        # the tiles change the order of the accumulations, allow a few ulps of the largest values
+        for res, ref in [(out_tiled, out), (inp_tiled.grad, inp.grad)]:
+            atol = 4 * torch.finfo(dtype).eps * ref.abs().max().item()
+            torch.testing.assert_close(res, ref, atol=atol, rtol=0)
+        assert nf4_tensor.grad is None
+
     @unittest.skipIf(not bnb_available, "Need bnb availble")
     @unittest.skipIf(not torch.cuda.is_available(), "Need CUDA available")
     @parametrize("dtype", [torch.bfloat16, torch.float16, torch.float32])
@@ -242,18 +311,55 @@ class TestNF4Linear(TestCase):
         inp = torch.randn(2, 32, 32, dtype=a.dtype, device=a.device)
         out3 = torch.compile(torch.nn.functional.linear, mode='max-autotune')(inp, a_nf4)
     
-    @unittest.skipIf(not torch.cuda.is_available(), "Need CUDA available")
     @parametrize("dtype", [torch.bfloat16, torch.float16, torch.float32])
-    @parametrize("shape", [(16, 16), (32, 16)])
-    @parametrize("chunk_size", [8, 16, 32])
-    def test_chunk_size_equivalence(self, dtype: torch.dtype, shape, chunk_size):
-        a = torch.randn(shape, device='cuda', dtype=dtype)
-        with unittest.mock.patch("torchao.dtypes.nf4tensor.CHUNK_SIZE", chunk_size):
-            nf4_patched = to_nf4(a, 16, 2)
-        # This will be essentially no chunking since the numel is alot smaller than default chunk_size
-        nf4_base = to_nf4(a, 16, 2)
-
-        torch.testing.assert_close(nf4_patched.quantized_data, nf4_base.quantized_data)
+    def test_quantize_tensor_nearest(self, dtype: torch.dtype):
+        nf4 = to_nf4(torch.randn(512, 512, dtype=dtype)).nf4
+        boundaries = NF4Tensor.get_nf4_boundaries(nf4)
+        # random values, values next to the boundaries and nan (from blocks of zeros)
+        value = torch.cat([
+            torch.rand(2**16, dtype=dtype) * 2 - 1,
+            boundaries,
+            torch.nextafter(boundaries, torch.full_like(boundaries, -2)),
+            torch.nextafter(boundaries, torch.full_like(boundaries, 2)),
+            torch.tensor([-1.0, 0.0, 1.0, float("nan")], dtype=dtype),
+        ])
+        # brute force nearest value
+        ref = (value.unsqueeze(-1) - nf4).abs().min(dim=-1).indices
+        res = NF4Tensor.quantize_tensor_nearest(value, nf4)
+        self.assertEqual(res.to(torch.long), ref)
+
+    def test_deprecated_chunk_size(self):
+        with self.assertWarns(DeprecationWarning):
+            from torchao.dtypes.nf4tensor import CHUNK_SIZE
+        self.assertEqual(CHUNK_SIZE, 1024**2)
+
+    @parametrize("dtype", [torch.bfloat16, torch.float32])
+    @parametrize("mmap", [True, False])
+    def test_nf4_checkpoint(self, dtype: torch.dtype, mmap: bool):
+        linear = nn.Linear(128, 64, dtype=dtype)
+        linear.weight = nn.Parameter(to_nf4(linear.weight.detach(), 32, 16), requires_grad=False)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "nf4.pt")
+            save_nf4_checkpoint(linear.state_dict(), path)
+            state_dict = load_nf4_checkpoint(path, mmap=mmap)
+
+            weight = state_dict["weight"]
+            self.assertIsInstance(weight, NF4Tensor)
+            self.assertEqual(weight.shape, linear.weight.shape)
+            self.assertEqual(weight.dtype, dtype)
+            self.assertEqual(weight.block_size, 32)
+            self.assertEqual(weight.scaler_block_size, 16)
+            self.assertFalse(weight.flat_all_gather)
+            for name in ["quantized_data", "quantized_scalers", "quantization_factor", "scaler_mean", "nf4"]:
+                self.assertEqual(getattr(weight, name), getattr(linear.weight, name))
+            self.assertEqual(state_dict["bias"], linear.bias)
+
+            other = nn.Linear(128, 64, dtype=dtype, device="meta")
+            other.load_state_dict(state_dict, assign=True)
+            # no copy of the (mapped) data
+            self.assertEqual(other.weight.quantized_data.data_ptr(), weight.quantized_data.data_ptr())
+            inp = torch.randn(2, 128, dtype=dtype)
+            self.assertEqual(linear_nf4(inp, other.weight), linear_nf4(inp, linear.weight))
 
 
 
@@ -271,6 +377,25 @@ class TestFSDPOps(TestCase):
         for chunk in chunks:
             self.assertEqual(chunk.size(0), expected_size0)
 
+    def test_flat_all_gather_option(self):
+        nf4_tensor = to_nf4(torch.randn(512, 512), flat_all_gather=True)
+        self.assertFalse(to_nf4(torch.randn(512, 512)).flat_all_gather)
+        # the option is kept by the ops FSDP uses to shard and move the tensor
+        for chunk in torch.chunk(nf4_tensor, 2):
+            self.assertTrue(chunk.flat_all_gather)
+        self.assertTrue(nf4_tensor.detach().flat_all_gather)
+        self.assertTrue(nf4_tensor.view(-1).flat_all_gather)
+        self.assertTrue(nf4_tensor.t().flat_all_gather)
+        inner_tensors, ctx = nf4_tensor.__tensor_flatten__()
+        unflattened = NF4Tensor.__tensor_unflatten__(
+            {name: getattr(nf4_tensor, name) for name in inner_tensors}, ctx, None, None
+        )
+        self.assertTrue(unflattened.flat_all_gather)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "nf4.pt")
+            save_nf4_checkpoint({"weight": nf4_tensor}, path)
+            self.assertTrue(load_nf4_checkpoint(path)["weight"].flat_all_gather)
+
     @parametrize("input_size", [511 * 512, (511 * 512,), (511, 512)])
     def test_torch_chunk_invalid_divide(self, input_size: Union[Tuple[int], int]):
         num_chunks = 2
@@ -422,6 +547,17 @@ class TestFSDPOps(TestCase):
         self.assertEqual(nf4_tensor.device.type, "cuda")
         self.assertEqual(nf4_tensor.dtype, torch.bfloat16)
 
+    @unittest.skipIf(not torch.distributed.is_available(), "Need torch.distributed")
+    @parametrize("dtype", [torch.bfloat16, torch.float32])
+    def test_flat_all_gather(self, dtype: torch.dtype):
+        world_size = 2
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            torch.multiprocessing.spawn(
+                _nf4_flat_all_gather_worker,
+                args=(world_size, os.path.join(tmp_dir, "init"), dtype),
+                nprocs=world_size,
+            )
+
     @unittest.skipIf(not torch.cuda.is_available(), "Need CUDA available")
     def test_to_cpu(self):
         nf4_tensor = to_nf4(torch.randn(512 * 512, device='cuda'))
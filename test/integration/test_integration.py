@@ -58,12 +58,21 @@ from torchao.quantization.utils import (
     LoggingTensorMode,
 )
 from torchao.quantization.autoquant import (
+    AQFloatLinearWeight,
     AQInt8DynamicallyQuantizedLinearWeight,
     AQWeightOnlyQuantizedLinearWeight,
     AQWeightOnlyQuantizedLinearWeight2,
     AQWeightOnlyQuantizedLinearWeight3,
     AutoQuantizableLinearWeight,
-
+    AutoQuantFileCacheStore,
+    AUTOQUANT_CACHE,
+    DEFAULT_CLASS_LIST,
+    check_cache,
+    update_cache,
+    set_autoquant_cache_store,
+    export_autoquant_cache,
+    import_autoquant_cache,
+    _write_cache_file,
 )
 from torch.ao.quantization.quantize_fx import convert_to_reference_fx, prepare_fx
 import os
@@ -658,6 +667,22 @@ class PythonQuantPrimitivesUnitTest(unittest.TestCase):
         torch.testing.assert_close(y_ref, y_raw, atol=0, rtol=0)
         torch.testing.assert_close(y_ref, y_opt, atol=0, rtol=0)
 
+    def test__int_mm_cpu(self):
+        from torchao.kernel.intmm import _blocked_int_mm, int_scaled_matmul
+
+        # k = 2500 is more than two blocks of the blocked implementation
+        for m, k, n in [(1, 64, 16), (7, 33, 5), (32, 2500, 24)]:
+            x = torch.randint(-128, 128, (m, k), dtype=torch.int8)
+            w = torch.randint(-128, 128, (n, k), dtype=torch.int8).t()
+            y_ref = torch.matmul(x.to(torch.int32), w.to(torch.int32))
+            torch.testing.assert_close(y_ref, safe_int_mm(x, w), atol=0, rtol=0)
+            torch.testing.assert_close(y_ref, _blocked_int_mm(x, w), atol=0, rtol=0)
+
+            scales = torch.rand(m, 1, dtype=torch.bfloat16)
+            y_scaled = int_scaled_matmul(x, w, scales)
+            assert y_scaled.dtype == torch.bfloat16
+            torch.testing.assert_close(y_scaled, y_ref.to(torch.bfloat16) * scales)
+
     @unittest.skipIf(not torch.cuda.is_available(), "Need CUDA available")
     def test__int_mm_eager_and_torch_compile_numerics(self):
         def __int_mm_ref(x, w):
@@ -1371,8 +1396,10 @@ class TestAutoQuant(unittest.TestCase):
     @unittest.skipIf(not TORCH_VERSION_AFTER_2_3, "autoquant requires 2.3+.")
     def test_autoquant_one_input(self, device, dtype, m, k, n):
         print("(m, k, n): ", (m, k, n))
-        if device != "cuda" or not torch.cuda.is_available():
-            self.skipTest(f"autoquant currently does not support {device}")
+        if device == "cuda" and not torch.cuda.is_available():
+            self.skipTest(f"Need CUDA available.")
+        if device == "cpu" and dtype == torch.float16:
+            self.skipTest(f"autoquant currently does not support float16 on {device}")
         if torch.cuda.is_available() and torch.cuda.get_device_capability() < (8, 0):
             if dtype == torch.bfloat16:
                 self.skipTest(f"bfloat16 requires sm80+")
@@ -1403,10 +1430,10 @@ class TestAutoQuant(unittest.TestCase):
         ]))
     @unittest.skipIf(not TORCH_VERSION_AFTER_2_3, "autoquant requires 2.3+.")
     def test_autoquant_compile(self, device, dtype, m1, m2, k, n):
-        if device != "cuda" and dtype != torch.bfloat16:
-            self.skipTest(f"autoquant currently does not support {device}")
-        if device != "cuda" or not torch.cuda.is_available():
-            self.skipTest(f"autoquant currently does not support {device}")
+        if device == "cuda" and not torch.cuda.is_available():
+            self.skipTest(f"Need CUDA available.")
+        if device == "cpu" and dtype == torch.float16:
+            self.skipTest(f"autoquant currently does not support float16 on {device}")
         if torch.cuda.is_available() and torch.cuda.get_device_capability() < (8, 0):
             if dtype == torch.bfloat16:
                 self.skipTest(f"bfloat16 requires sm80+")
@@ -1437,10 +1464,10 @@ class TestAutoQuant(unittest.TestCase):
         ]))
     @unittest.skipIf(not TORCH_VERSION_AFTER_2_3, "autoquant requires 2.3+.")
     def test_autoquant_kwargs(self, device, dtype, m1, m2, k, n):
-        if device != "cuda" and dtype != torch.bfloat16:
-            self.skipTest(f"autoquant currently does not support {device}")
-        if device != "cuda" or not torch.cuda.is_available():
-            self.skipTest(f"autoquant currently does not support {device}")
+        if device == "cuda" and not torch.cuda.is_available():
+            self.skipTest(f"Need CUDA available.")
+        if device == "cpu" and dtype == torch.float16:
+            self.skipTest(f"autoquant currently does not support float16 on {device}")
         if torch.cuda.is_available() and torch.cuda.get_device_capability() < (8, 0):
             if dtype == torch.bfloat16:
                 self.skipTest(f"bfloat16 requires sm80+")
@@ -1481,8 +1508,8 @@ class TestAutoQuant(unittest.TestCase):
     def test_autoquant_double_access(self, device, dtype, m, k, n):
         if device != "cuda" and dtype != torch.bfloat16:
             self.skipTest(f"autoquant currently does not support {device}")
-        if device != "cuda" or not torch.cuda.is_available():
-            self.skipTest(f"autoquant currently does not support {device}")
+        if device == "cuda" and not torch.cuda.is_available():
+            self.skipTest(f"Need CUDA available.")
         if torch.cuda.is_available() and torch.cuda.get_device_capability() < (8, 0):
             if dtype == torch.bfloat16:
                 self.skipTest(f"bfloat16 requires sm80+")
@@ -1508,6 +1535,173 @@ class TestAutoQuant(unittest.TestCase):
         assert not isinstance(model.lin1.weight.weight, AutoQuantizableLinearWeight)
         model(x_in)
 
+    def test_autoquant_cache_export_import(self):
+        import tempfile
+        shapes_and_dtype = (torch.Size([16, 128]), torch.Size([256, 128]), None, torch.bfloat16)
+        saved_cache = dict(AUTOQUANT_CACHE)
+        try:
+            AUTOQUANT_CACHE.clear()
+            update_cache(AQWeightOnlyQuantizedLinearWeight, shapes_and_dtype, 0.5)
+            update_cache(AQWeightOnlyQuantizedLinearWeight2, shapes_and_dtype, None)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "autoquant_cache.json")
+                self.assertEqual(export_autoquant_cache(path), 1)
+
+                AUTOQUANT_CACHE.clear()
+                self.assertEqual(import_autoquant_cache(path), 1)
+                self.assertEqual(check_cache(AQWeightOnlyQuantizedLinearWeight, shapes_and_dtype), 0.5)
+                self.assertIsNone(check_cache(AQWeightOnlyQuantizedLinearWeight2, shapes_and_dtype))
+
+                # results are versioned by the class set
+                AUTOQUANT_CACHE.clear()
+                self.assertEqual(import_autoquant_cache(path, qtensor_class_list=DEFAULT_CLASS_LIST[:2]), 0)
+        finally:
+            AUTOQUANT_CACHE.clear()
+            AUTOQUANT_CACHE.update(saved_cache)
+
+    def test_autoquant_cache_store(self):
+        import tempfile
+        shapes_and_dtype = (torch.Size([16, 128]), torch.Size([256, 128]), torch.Size([256]), torch.float32)
+        saved_cache = dict(AUTOQUANT_CACHE)
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "autoquant_cache.json")
+                store = AutoQuantFileCacheStore(path)
+                set_autoquant_cache_store(store)
+                AUTOQUANT_CACHE.clear()
+                update_cache(AQInt8DynamicallyQuantizedLinearWeight, shapes_and_dtype, 0.25)
+                # results are written on flush
+                self.assertFalse(os.path.exists(path))
+                store.flush()
+
+                # a new process only sees the results in the file
+                AUTOQUANT_CACHE.clear()
+                set_autoquant_cache_store(AutoQuantFileCacheStore(path))
+                self.assertEqual(check_cache(AQInt8DynamicallyQuantizedLinearWeight, shapes_and_dtype), 0.25)
+                self.assertIsNone(check_cache(AQWeightOnlyQuantizedLinearWeight, shapes_and_dtype))
+
+                # results from another device are ignored
+                AUTOQUANT_CACHE.clear()
+                set_autoquant_cache_store(AutoQuantFileCacheStore(path, device="meta"))
+                self.assertIsNone(check_cache(AQInt8DynamicallyQuantizedLinearWeight, shapes_and_dtype))
+        finally:
+            set_autoquant_cache_store(None)
+            AUTOQUANT_CACHE.clear()
+            AUTOQUANT_CACHE.update(saved_cache)
+
+    @unittest.skipIf(os.name == "nt", "needs fcntl file locking")
+    def test_autoquant_cache_store_concurrent_put(self):
+        import multiprocessing
+        import tempfile
+        num_procs, num_puts = 4, 8
+
+        def put_results(path, proc):
+            store = AutoQuantFileCacheStore(path)
+            for i in range(num_puts):
+                shapes_and_dtype = (torch.Size([proc, i]), torch.Size([8, 8]), None, torch.float32)
+                store.put((AQInt8DynamicallyQuantizedLinearWeight,) + shapes_and_dtype, float(i))
+                store.flush()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "autoquant_cache.json")
+            ctx = multiprocessing.get_context("fork")
+            procs = [ctx.Process(target=put_results, args=(path, proc)) for proc in range(num_procs)]
+            for proc in procs:
+                proc.start()
+            for proc in procs:
+                proc.join()
+                self.assertEqual(proc.exitcode, 0)
+            # no process dropped the results of another one
+            self.assertEqual(len(AutoQuantFileCacheStore(path).results), num_procs * num_puts)
+            self.assertEqual(sorted(os.listdir(tmp_dir)), ["autoquant_cache.json", "autoquant_cache.json.lock"])
+
+    def test_autoquant_cache_write_failure(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "autoquant_cache.json")
+            with self.assertRaises(TypeError):
+                # not json serializable
+                _write_cache_file(path, "version", {"key": object()})
+            # the temporary file is removed
+            self.assertEqual(os.listdir(tmp_dir), [])
+
+    def _run_autoquant_with_fake_benchmarks(self, model, example_input, fake_times, **kwargs):
+        # replaces the benchmarks with fixed times so that the tuning logic can be tested quickly
+        tuned = []
+        def fake_tune_autoquant(self, q_cls, shapes_and_dtype, best_time):
+            tuned.append((q_cls, shapes_and_dtype))
+            update_cache(q_cls, shapes_and_dtype, fake_times[q_cls])
+
+        saved_cache = dict(AUTOQUANT_CACHE)
+        AUTOQUANT_CACHE.clear()
+        try:
+            with unittest.mock.patch.object(AutoQuantizableLinearWeight, "tune_autoquant", fake_tune_autoquant):
+                torchao.autoquant(model, example_input, qtensor_class_list=list(fake_times), **kwargs)
+        finally:
+            AUTOQUANT_CACHE.clear()
+            AUTOQUANT_CACHE.update(saved_cache)
+        return tuned
+
+    @unittest.skipIf(not TORCH_VERSION_AFTER_2_3, "autoquant requires 2.3+.")
+    def test_autoquant_dedupes_shapes(self):
+        model = torch.nn.Sequential(*[torch.nn.Linear(128, 128) for _ in range(4)])
+        example_input = torch.randn(16, 128)
+        fake_times = {
+            AQFloatLinearWeight: 1.0,
+            AQWeightOnlyQuantizedLinearWeight: 0.5,
+        }
+        tuned = self._run_autoquant_with_fake_benchmarks(model, example_input, fake_times)
+        # all layers see the same shapes so each class is benchmarked once
+        self.assertEqual(len(tuned), len(fake_times))
+        self.assertEqual(len(set(tuned)), len(fake_times))
+        for mod in model:
+            self.assertIsInstance(mod.weight, AQWeightOnlyQuantizedLinearWeight)
+
+    @unittest.skipIf(not TORCH_VERSION_AFTER_2_3, "autoquant requires 2.3+.")
+    def test_autoquant_cache_store_flush(self):
+        import tempfile
+
+        class CountingStore(AutoQuantFileCacheStore):
+            writes = 0
+
+            def flush(self):
+                CountingStore.writes += self.dirty
+                super().flush()
+
+        model = torch.nn.Sequential(torch.nn.Linear(128, 256), torch.nn.Linear(256, 128))
+        example_input = torch.randn(16, 128)
+        fake_times = {
+            AQFloatLinearWeight: 1.0,
+            AQWeightOnlyQuantizedLinearWeight: 0.5,
+        }
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "autoquant_cache.json")
+                set_autoquant_cache_store(CountingStore(path, qtensor_class_list=list(fake_times)))
+                tuned = self._run_autoquant_with_fake_benchmarks(model, example_input, fake_times)
+                self.assertEqual(len(tuned), 4)
+                # all the results are written once at the end of autoquant
+                self.assertEqual(CountingStore.writes, 1)
+                self.assertEqual(len(AutoQuantFileCacheStore(path, qtensor_class_list=list(fake_times)).results), 4)
+        finally:
+            set_autoquant_cache_store(None)
+
+    @unittest.skipIf(not TORCH_VERSION_AFTER_2_3, "autoquant requires 2.3+.")
+    def test_autoquant_time_budget(self):
+        model = torch.nn.Sequential(torch.nn.Linear(128, 256), torch.nn.Linear(256, 128))
+        example_input = torch.randn(16, 128)
+        fake_times = {
+            AQFloatLinearWeight: 1.0,
+            AQWeightOnlyQuantizedLinearWeight: 0.5,
+        }
+        # no benchmarks run with an empty budget, the layers are left unquantized
+        tuned = self._run_autoquant_with_fake_benchmarks(model, example_input, fake_times, time_budget=0)
+        self.assertEqual(len(tuned), 0)
+        for mod in model:
+            self.assertIs(type(mod.weight), torch.nn.Parameter)
+        out = model(example_input)
+        self.assertEqual(out.shape, (16, 128))
+
 
 
 
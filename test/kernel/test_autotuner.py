@@ -6,12 +6,17 @@
 
 # mypy: ignore-errors
 # This test takes a long time to run
+import itertools
+import json
 import logging
 import os
+import tempfile
 import unittest
+from types import SimpleNamespace
 
 import pytest
 import torch
+import torch.multiprocessing as mp
 from parameterized import parameterized
 
 logging.basicConfig(level=logging.INFO)
@@ -77,5 +82,185 @@ class TestQuantFlow(unittest.TestCase):
         torch.testing.assert_allclose(out32_1, out32_2)
 
 
+def _record(kernel="k", args="[]", device="NVIDIA A100", time=1.0, block_m=32):
+    return {
+        "kernel": kernel,
+        "args": args,
+        "device": device,
+        "torch": "2.4.0",
+        "triton": "3.0.0",
+        "config": {"kwargs": {"BLOCK_M": block_m}, "num_warps": 4, "num_stages": 2, "num_ctas": 1},
+        "time": time,
+    }
+
+
+def _append_worker(rank, path, n_records):
+    from torchao.kernel.config_store import ConfigStore
+
+    store = ConfigStore(path)
+    for i in range(n_records):
+        store.append([_record(args=f"[{rank}, {i}]")])
+
+
+class TestConfigStore(unittest.TestCase):
+    def test_merge(self):
+        from torchao.kernel.config_store import ConfigStore
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "configs.jsonl")
+            store = ConfigStore(path)
+            store.append([_record(time=2.0, block_m=32), _record(device="cpu")])
+            # the faster config wins, writes of another process are merged on write
+            merged = ConfigStore(path).append([_record(time=1.0, block_m=64)])
+            assert len(merged) == 2
+            assert len(store.read()) == 3
+            best = store.load()[("k", "[]", "NVIDIA A100", "2.4.0", "3.0.0")]
+            self.assertEqual(best["config"]["kwargs"], {"BLOCK_M": 64})
+
+            # a line cut short by a killed process is skipped
+            with open(path, "a") as f:
+                f.write('{"kernel": "k", "ar')
+            assert len(store.read()) == 3
+
+            before, after = store.prune(device="NVIDIA A100")
+            self.assertEqual((before, after), (3, 1))
+            assert len(store.read()) == 1
+
+    def test_concurrent_append(self):
+        from torchao.kernel.config_store import ConfigStore
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "configs.jsonl")
+            mp.spawn(_append_worker, args=(path, 20), nprocs=4, join=True)
+            records = ConfigStore(path).read()
+            self.assertEqual(len(records), 80)
+            self.assertEqual(len(ConfigStore(path).load()), 80)
+
+    def test_cli(self):
+        from torchao.kernel.config_store import ConfigStore, main
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "configs.jsonl")
+            shipped = os.path.join(tmpdir, "shipped.jsonl")
+            other = os.path.join(tmpdir, "other.jsonl")
+            ConfigStore(path).append([_record(), _record(time=0.5), _record(device="cpu")])
+            main(["--path", path, "show"])
+            main(["--path", path, "export", shipped, "--device", "NVIDIA A100"])
+            records = ConfigStore(shipped).read()
+            self.assertEqual(len(records), 1)
+            self.assertEqual(records[0]["time"], 0.5)
+
+            main(["--path", other, "import", shipped])
+            self.assertEqual(ConfigStore(other).read(), records)
+            main(["--path", path, "prune"])
+            self.assertEqual(len(ConfigStore(path).read()), 2)
+
+    def test_config_roundtrip(self):
+        triton = pytest.importorskip("triton")
+        from torchao.kernel.autotuner import config_from_dict, config_to_dict
+
+        config = triton.Config({"BLOCK_M": 64, "BLOCK_N": 32}, num_stages=3, num_warps=8)
+        d = config_to_dict(config)
+        config2 = config_from_dict(d)
+        self.assertEqual(config2.kwargs, config.kwargs)
+        self.assertEqual((config2.num_warps, config2.num_stages), (8, 3))
+        self.assertEqual(config_to_dict(config2), d)
+
+
+class _SyntheticTuner:
+    # a convex cost over the config parameters with its minimum at BLOCK_M = 64, BLOCK_N = 128, num_warps = 4,
+    # with the abort thresholds of autotuner.do_bench
+    def __init__(self):
+        self.full_benchmarks = 0
+
+    def cost(self, config):
+        return 1.0 + abs(config.kwargs["BLOCK_M"] - 64) / 32 + abs(config.kwargs["BLOCK_N"] - 128) / 32 + abs(config.num_warps - 4)
+
+    def bench_quick(self, config, rep):
+        return self.cost(config)
+
+    def bench(self, config, best_time=None):
+        time = self.cost(config)
+        if best_time is not None and time > best_time * 10:
+            return float("inf")
+        self.full_benchmarks += 1
+        return time
+
+
+def _synthetic_configs():
+    return [
+        SimpleNamespace(kwargs={"BLOCK_M": m, "BLOCK_N": n}, num_warps=w, num_stages=2)
+        for m, n, w in itertools.product([16, 32, 64, 128, 256], [16, 32, 64, 128, 256], [1, 2, 4, 8])
+    ]
+
+
+class TestSearchStrategies(unittest.TestCase):
+    key = ("kernel", json.dumps([["torch.int8", [256, 512], [512, 1]]]), "device", "2.4.0", "3.0.0")
+
+    def test_strategies(self):
+        from torchao.kernel.autotuner_search import SEARCH_STRATEGIES
+
+        configs = _synthetic_configs()
+        tuned_records = [{
+            "kernel": "kernel",
+            "args": json.dumps([["torch.int8", [256, 1024], [1024, 1]]]),
+            "device": "device",
+            "config": {"kwargs": {"BLOCK_M": 64, "BLOCK_N": 64}, "num_warps": 4, "num_stages": 2},
+            "time": 1.0,
+        }]
+        full_benchmarks = {}
+        for name, strategy in SEARCH_STRATEGIES.items():
+            tuner = _SyntheticTuner()
+            config, time = strategy(tuner, configs, self.key, tuned_records)
+            self.assertEqual((config.kwargs, config.num_warps, time), ({"BLOCK_M": 64, "BLOCK_N": 128}, 4, 1.0))
+            full_benchmarks[name] = tuner.full_benchmarks
+        for name in ["successive_halving", "random_restart", "nearest_shape"]:
+            assert full_benchmarks[name] < full_benchmarks["exhaustive"] // 2, full_benchmarks
+
+    def test_nearest_shape_fallback(self):
+        from torchao.kernel.autotuner_search import nearest_shape_search
+
+        # no tuned shapes of the same kernel, falls back to successive halving
+        tuned_records = [{"kernel": "other", "args": self.key[1], "device": "device", "config": {}, "time": 1.0}]
+        config, _ = nearest_shape_search(_SyntheticTuner(), _synthetic_configs(), self.key, tuned_records)
+        self.assertEqual((config.kwargs, config.num_warps), ({"BLOCK_M": 64, "BLOCK_N": 128}, 4))
+
+    def test_nearest_shape_other_versions(self):
+        from torchao.kernel.autotuner_search import nearest_shape_search
+
+        # the best config of the same shapes tuned with another torch version seeds the search
+        tuned_records = [{
+            "kernel": "kernel",
+            "args": self.key[1],
+            "device": "device",
+            "torch": "2.3.0",
+            "triton": "3.0.0",
+            "config": {"kwargs": {"BLOCK_M": 64, "BLOCK_N": 128}, "num_warps": 4, "num_stages": 2},
+            "time": 1.0,
+        }]
+        tuner = _SyntheticTuner()
+        # the fallback strategy would start with quick benchmarks
+        tuner.bench_quick = None
+        config, time = nearest_shape_search(tuner, _synthetic_configs(), self.key, tuned_records)
+        self.assertEqual((config.kwargs, config.num_warps, time), ({"BLOCK_M": 64, "BLOCK_N": 128}, 4, 1.0))
+
+    def test_best_config_other_versions(self):
+        pytest.importorskip("triton")
+        from torchao.kernel import autotuner
+
+        record = _record(args=self.key[1], device="device")
+        record["torch"] = "2.3.0"
+        other_key = tuple(record[k] for k in ("kernel", "args", "device", "torch", "triton"))
+        key = other_key[:3] + ("2.4.0", "3.0.0")
+        best_configs = autotuner.BEST_CONFIGS
+        autotuner.BEST_CONFIGS = {other_key: record}
+        try:
+            # configs tuned with other versions are not reused as is
+            self.assertIsNone(autotuner.get_best_config_by_key(key))
+            self.assertEqual(autotuner.get_best_config_by_key(other_key).kwargs, {"BLOCK_M": 32})
+        finally:
+            autotuner.BEST_CONFIGS = best_configs
+
+
 if __name__ == "__main__":
     unittest.main()
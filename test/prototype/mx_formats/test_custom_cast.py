@@ -23,13 +23,16 @@ from torchao.prototype.mx_formats.custom_cast import (
     f32_to_f4_unpacked,
     f32_to_f6_e2m3_unpacked,
     f32_to_f6_e3m2_unpacked,
+    f4_or_f6_lut,
     f4_unpacked_to_f32,
     f6_e2m3_unpacked_to_f32,
     f6_e3m2_unpacked_to_f32,
     get_bits,
     pack_uint4,
+    pack_uint6,
     triton_f4_to_bf16,
     unpack_uint4,
+    unpack_uint6,
 )
 
 from torchao.prototype.mx_formats.fp_format_spec import (
@@ -320,6 +323,48 @@ def test_fp4_pack_unpack():
     assert torch.all(orig_vals_dq == orig_vals)
 
 
+@pytest.mark.parametrize("dtype_name", (DTYPE_FP4, DTYPE_FP6_E2M3, DTYPE_FP6_E3M2))
+def test_f4_or_f6_lut(dtype_name):
+    lut = f4_or_f6_lut(dtype_name, "cpu")
+    if dtype_name == DTYPE_FP4:
+        interesting_values = float4_e2m1_interesting_values
+        unpacked_to_f32 = f4_unpacked_to_f32
+    elif dtype_name == DTYPE_FP6_E2M3:
+        interesting_values = float6_e2m3_interesting_values
+        unpacked_to_f32 = f6_e2m3_unpacked_to_f32
+    else:
+        interesting_values = float6_e3m2_interesting_values
+        unpacked_to_f32 = f6_e3m2_unpacked_to_f32
+
+    # the values of the spec tables
+    for fp32_ref, _formula, s_enc, e_enc, m_enc, _label in interesting_values:
+        assert lut[int(s_enc + e_enc + m_enc, 2)].item() == fp32_ref
+
+    # bit-exact with the elementwise decode of every encoding
+    encodings = torch.arange(lut.numel(), dtype=torch.uint8)
+    torch.testing.assert_close(lut, unpacked_to_f32(encodings), atol=0, rtol=0)
+
+
+def test_fp6_pack_unpack():
+    # every 6 bit value, in every position of a group of 4
+    orig_vals = torch.arange(2**6, dtype=torch.uint8)
+    orig_vals = torch.stack([orig_vals.roll(i) for i in range(4)], dim=-1)
+    packed = pack_uint6(orig_vals)
+    assert packed.shape == (2**6, 3)
+    torch.testing.assert_close(unpack_uint6(packed), orig_vals, atol=0, rtol=0)
+
+
+def test_fp6_pack_bit_layout():
+    # same layout as torchao.dtypes.float6_e3m2.to_float6_e3m2: the 4 6-bit
+    # values are concatenated msb first and split into 3 bytes
+    orig_vals = torch.randint(0, 2**6, (16, 4), dtype=torch.uint8)
+    packed = pack_uint6(orig_vals)
+    for row, packed_row in zip(orig_vals, packed):
+        bits = "".join(get_bits(v)[2:] for v in row)
+        packed_bits = "".join(get_bits(v) for v in packed_row)
+        assert bits == packed_bits
+
+
 @pytest.mark.skipif(not torch.cuda.is_available(), reason="CUDA not available")
 @pytest.mark.skipif(not has_triton(), reason="unsupported without triton")
 def test_fp4_triton_unscaled_cast():
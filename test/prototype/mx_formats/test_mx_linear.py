@@ -15,9 +15,12 @@ from torchao.prototype.mx_formats.constants import SUPPORTED_ELEM_DTYPES
 from torchao.prototype.mx_formats.mx_linear import (
     MXInferenceLinear,
     MXLinear,
+    mx_linear_tiled,
+    register_mx_weight_cast_cache_hook,
     swap_linear_with_mx_inference_linear,
     swap_linear_with_mx_linear,
 )
+from torchao.prototype.mx_formats.mx_tensor import MXTensor
 
 from torchao.quantization.utils import compute_error, TORCH_VERSION_AFTER_2_4
 
@@ -191,6 +194,121 @@ def test_inference_compile_simple(elem_dtype):
         assert sqnr >= 14.0
 
 
+@pytest.mark.parametrize("elem_dtype", SUPPORTED_ELEM_DTYPES)
+@pytest.mark.parametrize("transposed", [True, False])
+@pytest.mark.parametrize("bias", [True, False])
+def test_linear_tiled(elem_dtype, transposed, bias):
+    """
+    Verify that the tiled MX linear matches dequantizing the whole weight
+    """
+    w = torch.randn(96, 256, dtype=torch.bfloat16)
+    if transposed:
+        # same layout as MXInferenceLinear
+        w_mx = MXTensor.to_mx(w.t().contiguous(), elem_dtype, 32).t()
+    else:
+        w_mx = MXTensor.to_mx(w, elem_dtype, 32)
+    b = torch.randn(96, dtype=torch.bfloat16) if bias else None
+    x = torch.randn(3, 5, 256, dtype=torch.bfloat16)
+
+    y_ref = torch.nn.functional.linear(
+        x.float(), w_mx.to_dtype(torch.float), b.float() if bias else None
+    )
+    # the tile size does not divide the number of rows
+    y = mx_linear_tiled(x, w_mx, b, tile_size=48)
+    assert y.shape == (3, 5, 96)
+    assert y.dtype == torch.bfloat16
+    # the fp32 accumulation order differs from a single matmul
+    torch.testing.assert_close(y, y_ref.to(torch.bfloat16))
+
+    torch._dynamo.reset()
+    y_c = torch.compile(mx_linear_tiled, backend="aot_eager", fullgraph=True)(
+        x, w_mx, b, 48
+    )
+    torch.testing.assert_close(y, y_c, atol=0, rtol=0)
+
+
+def test_linear_tiled_partial_blocks():
+    # blocks span rows of the weight, falls back to dequantizing all of it
+    w_mx = MXTensor.to_mx(torch.randn(4, 6), torch.float8_e4m3fn, 4)
+    x = torch.randn(2, 6)
+    y_ref = torch.nn.functional.linear(x, w_mx.to_dtype(torch.float))
+    torch.testing.assert_close(mx_linear_tiled(x, w_mx), y_ref)
+
+
+@pytest.mark.parametrize("use_compile", [False, True])
+def test_weight_cast_cache(use_compile):
+    """
+    Verify that caching the weight cast does not change numerics of MX linear
+    training with gradient accumulation
+    """
+    m_ref = nn.Sequential(nn.Linear(32, 64), nn.ReLU(), nn.Linear(64, 32))
+    m = copy.deepcopy(m_ref)
+    swap_linear_with_mx_linear(m_ref, torch.float8_e4m3fn, 32)
+    swap_linear_with_mx_linear(
+        m, torch.float8_e4m3fn, 32, cache_weight_cast=True
+    )
+    opt_ref = torch.optim.SGD(m_ref.parameters(), lr=0.1)
+    opt = torch.optim.SGD(m.parameters(), lr=0.1)
+    m_c = m
+    if use_compile:
+        # compiled code can't check the weight version counter
+        register_mx_weight_cast_cache_hook(opt, m)
+        m_c = torch.compile(m, backend="aot_eager", fullgraph=True)
+
+    for _ in range(3):
+        for _ in range(4):
+            x = torch.randn(4, 32)
+            (m_ref(x) ** 2).sum().backward()
+            (m_c(x) ** 2).sum().backward()
+        cache = m[0].weight_mx_cache_data
+        opt_ref.step()
+        opt.step()
+        opt_ref.zero_grad()
+        opt.zero_grad()
+        # the cache is updated in place
+        assert m[0].weight_mx_cache_data is cache
+
+    x = torch.randn(4, 32)
+    torch.testing.assert_close(m_ref(x), m_c(x), atol=0, rtol=0)
+    for p_ref, p in zip(m_ref.parameters(), m.parameters()):
+        torch.testing.assert_close(p_ref, p, atol=0, rtol=0)
+    w_mx = MXTensor.to_mx(m[0].weight, torch.float8_e4m3fn, 32)
+    torch.testing.assert_close(
+        m[0].weight_mx_cache_data, w_mx._data, atol=0, rtol=0
+    )
+    torch.testing.assert_close(
+        m[0].weight_mx_cache_scale_e8m0, w_mx._scale_e8m0, atol=0, rtol=0
+    )
+
+
+def test_weight_cast_cache_deepcopy():
+    """
+    Verify that a model with cached weight casts can be deep copied, e.g.
+    for EMA copies, and that the copy refreshes its own cache
+    """
+    m = nn.Sequential(nn.Linear(32, 64))
+    m_ref = copy.deepcopy(m)
+    swap_linear_with_mx_linear(m_ref, torch.float8_e4m3fn, 32)
+    swap_linear_with_mx_linear(
+        m, torch.float8_e4m3fn, 32, cache_weight_cast=True
+    )
+    x = torch.randn(4, 32)
+    y = m(x)
+    m_copy = copy.deepcopy(m)
+    torch.testing.assert_close(m_copy(x), y, atol=0, rtol=0)
+    assert (
+        m_copy[0].weight_mx_cache_data.data_ptr()
+        != m[0].weight_mx_cache_data.data_ptr()
+    )
+
+    with torch.no_grad():
+        m_copy[0].weight.mul_(2)
+        m_ref[0].weight.mul_(2)
+    torch.testing.assert_close(m_copy(x), m_ref(x), atol=0, rtol=0)
+    # the original is unchanged
+    torch.testing.assert_close(m(x), y, atol=0, rtol=0)
+
+
 def test_filter_fn():
     m1 = nn.Sequential(
         nn.Linear(32, 32),
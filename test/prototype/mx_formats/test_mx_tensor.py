@@ -15,7 +15,8 @@ from torchao.prototype.mx_formats.constants import (
     SUPPORTED_ELEM_DTYPES,
 )
 
-from torchao.prototype.mx_formats.custom_cast import pack_uint4
+from torchao.prototype.mx_formats.custom_cast import pack_uint4, pack_uint6
+from torchao.prototype.mx_formats.mx_ops import mx_int8_mm
 
 from torchao.prototype.mx_formats.mx_tensor import (
     E8M0_EXPONENT_NAN_VAL,
@@ -132,6 +133,10 @@ def test_exponent_nan_out(elem_dtype):
             [0, 1, 2, 3, 4, 5], dtype=torch.uint8, device="cuda"
         )  # noqa: E501
         data_bits = pack_uint4(data_bits)
+    elif elem_dtype == torch.int8:
+        data_bits = torch.tensor(
+            [0, 1, 2, 3, 4, 5], dtype=torch.int8, device="cuda"
+        )  # noqa: E501
     else:
         raise AssertionError("unsupported")
     block_size = 2
@@ -215,6 +220,141 @@ def test_view(elem_dtype):
     x_mx_2 = x_mx.view(2, 4)  # noqa: F841
 
 
+@pytest.mark.parametrize("elem_dtype", (DTYPE_FP4, DTYPE_FP6_E2M3, DTYPE_FP6_E3M2))
+@pytest.mark.parametrize("hp_dtype", [torch.float32, torch.bfloat16])
+def test_to_dtype_lut(elem_dtype, hp_dtype):
+    """
+    Verifies that the lookup table dequantize is bit-exact with the
+    elementwise one, for every e8m0 scale (including NaN) and element
+    """
+    block_size = 32
+    num_bits = 4 if elem_dtype == DTYPE_FP4 else 6
+    data = torch.randint(0, 2**num_bits, (256, block_size), dtype=torch.uint8)
+    scale_e8m0 = torch.arange(256, dtype=torch.uint8)
+    if elem_dtype == DTYPE_FP4:
+        data_lp, fp6_packed = pack_uint4(data), False
+    else:
+        data_lp, fp6_packed = pack_uint6(data), True
+
+    args = (data_lp, scale_e8m0, elem_dtype, block_size, hp_dtype, fp6_packed)
+    try:
+        config.use_lut_dequant = False
+        data_hp_ref = to_dtype(*args)
+    finally:
+        config.use_lut_dequant = True
+    data_hp = to_dtype(*args)
+    # compare the bits, except for the NaN payloads
+    is_nan = torch.isnan(data_hp_ref)
+    assert torch.equal(torch.isnan(data_hp), is_nan)
+    assert is_nan[E8M0_EXPONENT_NAN_VAL].all()
+    assert torch.equal(
+        data_hp[~is_nan].float().view(torch.int32),
+        data_hp_ref[~is_nan].float().view(torch.int32),
+    )
+
+
+@pytest.mark.parametrize("elem_dtype", (DTYPE_FP6_E2M3, DTYPE_FP6_E3M2))
+def test_fp6_packed(elem_dtype):
+    x = torch.randn(8, 64)
+    block_size = 32
+    x_mx = MXTensor.to_mx(x, elem_dtype, block_size)
+    assert x_mx._fp6_packed
+    assert x_mx.shape == x.shape
+    assert x_mx._data.numel() == x.numel() * 3 // 4
+
+    config.pack_fp6 = False
+    try:
+        x_mx_unpacked = MXTensor.to_mx(x, elem_dtype, block_size)
+    finally:
+        config.pack_fp6 = True
+    assert not x_mx_unpacked._fp6_packed
+    x_dq = x_mx.to_dtype(x.dtype)
+    torch.testing.assert_close(
+        x_dq, x_mx_unpacked.to_dtype(x.dtype), atol=0, rtol=0
+    )
+
+    # the packing is inferred from the data and scale sizes
+    x_mx_2 = MXTensor(
+        x_mx._scale_e8m0, x_mx._data, elem_dtype, block_size, x.dtype
+    )
+    assert x_mx_2._fp6_packed
+    torch.testing.assert_close(x_mx_2.to_dtype(x.dtype), x_dq, atol=0, rtol=0)
+
+    x_mx_t = x_mx.t()
+    assert x_mx_t._fp6_packed
+    assert x_mx_t.shape == (64, 8)
+    torch.testing.assert_close(x_mx_t.t().to_dtype(x.dtype), x_dq, atol=0, rtol=0)
+
+    x_mx_v = x_mx.view(2, 4, 64)
+    assert x_mx_v.shape == (2, 4, 64)
+    torch.testing.assert_close(
+        x_mx_v.to_dtype(x.dtype), x_dq.view(2, 4, 64), atol=0, rtol=0
+    )
+
+
+def test_int8_values():
+    # the largest block value maps to 1.0 times a power of two, elements are
+    # on a 2**-6 grid below that
+    x = torch.tensor([[-3.0, 0.0, 1.0, 2.0], [0.25, -0.5, 1 / 64, 1 / 128]])
+    x_mx = MXTensor.to_mx(x, torch.int8, 4)
+    assert x_mx._data.dtype == torch.int8
+    torch.testing.assert_close(
+        x_mx._data,
+        torch.tensor([[-96, 0, 32, 64], [32, -64, 2, 1]], dtype=torch.int8),
+        atol=0,
+        rtol=0,
+    )
+    torch.testing.assert_close(x_mx.to_dtype(torch.float), x, atol=0, rtol=0)
+    _test_mx(torch.randn(16, 64), torch.int8, 32)
+
+
+@pytest.mark.parametrize("hp_dtype", [torch.float32, torch.bfloat16])
+def test_int8_mm(hp_dtype, monkeypatch):
+    """
+    Verifies that the integer domain MX int8 matmul matches dequantizing
+    both operands, for row major a and column major b
+    """
+    a = torch.randn(16, 256, dtype=hp_dtype)
+    b = torch.randn(48, 256, dtype=hp_dtype)
+    # blocks far below the largest block of their row are flushed to zero
+    a[:, 32:64] *= 2**-30
+    a_mx = MXTensor.to_mx(a, torch.int8, 32)
+    b_mx = MXTensor.to_mx(b, torch.int8, 32).t()
+    a_dq = a_mx.to_dtype(torch.float64)
+    b_dq = b_mx.to_dtype(torch.float64)
+
+    res = mx_int8_mm(a_mx, b_mx)
+    assert res.dtype == hp_dtype
+    res_ref = a_dq[:, :32] @ b_dq[:32] + a_dq[:, 64:] @ b_dq[64:]
+    torch.testing.assert_close(res, res_ref.to(hp_dtype), atol=0, rtol=0)
+    torch.testing.assert_close(res, (a_dq @ b_dq).to(hp_dtype))
+
+    # dispatched to from mm and addmm when enabled
+    monkeypatch.setattr(config, "use_mx_int8_integer_mm", True)
+    torch.testing.assert_close(torch.mm(a_mx, b_mx), res, atol=0, rtol=0)
+    bias = torch.randn(48, dtype=hp_dtype)
+    torch.testing.assert_close(
+        torch.nn.functional.linear(a_mx, b_mx.t(), bias), bias + res, atol=0, rtol=0
+    )
+
+    # other layouts fall back to dequantizing
+    b_mx_row_major = MXTensor.to_mx(b.t().contiguous(), torch.int8, 32)
+    torch.testing.assert_close(
+        torch.mm(a_mx, b_mx_row_major),
+        torch.mm(a_mx.to_dtype(hp_dtype), b_mx_row_major.to_dtype(hp_dtype)),
+    )
+
+
+def test_int8_mm_nan():
+    a = torch.randn(4, 64)
+    b = torch.randn(8, 64)
+    a_mx = MXTensor.to_mx(a, torch.int8, 32)
+    a_mx._scale_e8m0.view(4, 2)[1, 1] = E8M0_EXPONENT_NAN_VAL
+    res = mx_int8_mm(a_mx, MXTensor.to_mx(b, torch.int8, 32).t())
+    assert torch.isnan(res[1]).all()
+    assert not torch.isnan(res[[0, 2, 3]]).any()
+
+
 @pytest.mark.skipif(not torch.cuda.is_available(), reason="CUDA not available")
 @pytest.mark.parametrize("elem_dtype", SUPPORTED_ELEM_DTYPES)
 @pytest.mark.parametrize("hp_dtype", [torch.float32, torch.bfloat16])
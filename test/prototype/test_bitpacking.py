@@ -1,5 +1,5 @@
 import torch
-from torchao.prototype.common.bitpacking import pack, unpack
+from torchao.prototype.common.bitpacking import pack, pack_bits, unpack, unpack_bits
 import pytest
 from torch.utils._triton import has_triton
 from torchao.quantization.utils import TORCH_VERSION_AFTER_2_4
@@ -67,4 +67,60 @@ def test_uint3_to_int16_col_wise():
     packed = pack(test_tensor,16, 3, False)
     unpacked = unpack(packed, 3, False)
     unpadded = unpacked[:test_tensor.shape[0], ...]
-    assert(unpadded.allclose(test_tensor))
\ No newline at end of file
+    assert(unpadded.allclose(test_tensor))
+
+
+def _reference_pack_bits(data, nbits):
+    # packs the rows of a 2d tensor as a bit string, most significant bit first
+    rows = []
+    for row in data.tolist():
+        bits = "".join(format(v, f"0{nbits}b") for v in row)
+        bits += "0" * (-len(row) % 8 * nbits)
+        rows.append([int(bits[i:i + 8], 2) for i in range(0, len(bits), 8)])
+    return torch.tensor(rows, dtype=torch.uint8)
+
+@pytest.mark.parametrize("nbits", range(1, 8))
+@pytest.mark.parametrize("shape", [(1, 8), (3, 13), (7, 64), (2, 101)])
+def test_pack_bits_reference(nbits, shape):
+    torch.manual_seed(nbits)
+    test_tensor = torch.randint(0, 2**nbits, shape, dtype=torch.uint8)
+    packed = pack_bits(test_tensor, nbits)
+    assert packed.shape == (shape[0], (shape[1] + 7) // 8 * nbits)
+    assert torch.equal(packed, _reference_pack_bits(test_tensor, nbits))
+
+@pytest.mark.parametrize("nbits", range(1, 8))
+@pytest.mark.parametrize("dim", [0, 1, -1])
+@pytest.mark.parametrize("seed", range(3))
+def test_pack_bits_round_trip(nbits, dim, seed):
+    torch.manual_seed(seed)
+    shape = torch.randint(1, 40, (3,)).tolist()
+    test_tensor = torch.randint(0, 2**nbits, shape, dtype=torch.uint8)
+    # all ones to catch bits leaking into the neighbouring elements
+    test_tensor[0] = 2**nbits - 1
+    packed = pack_bits(test_tensor, nbits, dim=dim)
+    unpacked = unpack_bits(packed, nbits, test_tensor.shape[dim], dim=dim)
+    assert torch.equal(unpacked, test_tensor)
+
+@pytest.mark.parametrize("data_size", [1, 2, 4])
+def test_pack_bits_matches_pack(data_size):
+    test_tensor = torch.randint(0, 2**data_size, (4, 64), dtype=torch.uint8)
+    assert torch.equal(pack_bits(test_tensor, data_size), pack(test_tensor, 8, data_size, False))
+
+@pytest.mark.parametrize("nbits", [3, 6])
+def test_pack_bits_compile_cpu(nbits):
+    torch._dynamo.config.specialize_int = True
+    pack_compiled = torch.compile(pack_bits, fullgraph=True)
+    unpack_compiled = torch.compile(unpack_bits, fullgraph=True)
+    test_tensor = torch.randint(0, 2**nbits, (8, 24), dtype=torch.uint8)
+    packed = pack_compiled(test_tensor, nbits)
+    assert torch.equal(packed, pack_bits(test_tensor, nbits))
+    assert torch.equal(unpack_compiled(packed, nbits, 24), test_tensor)
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="CUDA not available")
+@pytest.mark.parametrize("nbits", range(1, 8))
+def test_pack_bits_cuda(nbits):
+    test_tensor = torch.randint(0, 2**nbits, (16, 100), dtype=torch.uint8)
+    packed = pack_bits(test_tensor.cuda(), nbits)
+    assert packed.is_cuda
+    assert torch.equal(packed.cpu(), pack_bits(test_tensor, nbits))
+    assert torch.equal(unpack_bits(packed, nbits, 100).cpu(), test_tensor)
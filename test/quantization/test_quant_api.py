@@ -41,6 +41,7 @@ from torchao.quantization.quant_api import (
     get_apply_int4wo_quant,
     get_apply_int8wo_quant,
     get_apply_int8dyn_quant,
+    get_apply_sub_byte_wo_quant,
 )
 from torchao.quantization.utils import (
     TORCH_VERSION_AFTER_2_3,
@@ -50,6 +51,7 @@ from pathlib import Path
 from sentencepiece import SentencePieceProcessor
 from model import Transformer, prepare_inputs_for_model
 import copy
+import itertools
 
 
 def dynamic_quant(model, example_inputs):
@@ -138,6 +140,24 @@ def _ref_change_linear_weights_to_int8_dqtensors(model, filter_fn=None, **kwargs
         model, _get_subclass_inserter(Int8DynamicallyQuantizedLinearWeight, enable_parametrization=False, **kwargs), filter_fn
     )
 
+def _gptq_data_parallel_worker(rank, world_size, init_file, m, inputs, result_dir):
+    # quantizes `m` with the calibration inputs sharded across `world_size` ranks
+    import torch.distributed as dist
+    from torchao.quantization.GPTQ import Int8DynActInt4WeightGPTQQuantizer
+    from torchao.quantization.utils import _MultiInput
+
+    dist.init_process_group("gloo", init_method=f"file://{init_file}", rank=rank, world_size=world_size)
+    try:
+        shard = [_MultiInput(multi.values[rank::world_size]) for multi in inputs]
+        quantizer = Int8DynActInt4WeightGPTQQuantizer(32, 0.01, 32)
+        state_dict = quantizer._create_quantized_state_dict(
+            m, shard, 32, 0.01, 32, process_group=dist.group.WORLD
+        )
+        torch.save(state_dict, os.path.join(result_dir, f"{rank}.pt"))
+    finally:
+        dist.destroy_process_group()
+
+
 class TestQuantFlow(unittest.TestCase):
     def test_dynamic_quant_gpu_singleline(self):
         m = ToyLinearModel().eval()
@@ -210,6 +230,195 @@ class TestQuantFlow(unittest.TestCase):
         assert isinstance(m.linear2, Int8DynActInt4WeightLinear)
         m(*example_inputs)
 
+    @unittest.skipIf(not TORCH_VERSION_AFTER_2_4, "Test only enabled for 2.4+")
+    def test_8da4w_quantizer_packed(self):
+        from torchao.quantization.quant_api import Int8DynActInt4WeightQuantizer
+        from torchao.quantization.GPTQ import unpack_int4_weight
+
+        m = ToyLinearModel().eval()
+        m_copy = copy.deepcopy(m)
+        example_inputs = (torch.randn(2, 3, 64),)
+        m = Int8DynActInt4WeightQuantizer(groupsize=32, packed=True).quantize(m)
+        m_copy = Int8DynActInt4WeightQuantizer(groupsize=32).quantize(m_copy)
+        for linear, linear_copy in [(m.linear1, m_copy.linear1), (m.linear2, m_copy.linear2)]:
+            assert linear.packed
+            assert linear.weight.dtype == torch.uint8
+            assert linear.weight.shape == (linear.out_features, linear.in_features // 2)
+            self.assertTrue(torch.equal(unpack_int4_weight(linear.weight, linear.in_features), linear_copy.weight))
+
+        # integer domain forward matches dequantize + float linear up to float rounding
+        res = m(*example_inputs)
+        ref = m_copy(*example_inputs)
+        assert res.shape == (2, 3, 64)
+        torch.testing.assert_close(res, ref, rtol=1e-4, atol=1e-4)
+
+    @unittest.skipIf(not TORCH_VERSION_AFTER_2_3, "skipping when torch verion is 2.3 or lower")
+    def test_gptq_vectorized_quant(self):
+        from torchao.quantization.GPTQ import GenericGPTQRunner, Int8DynActInt4WeightGPTQQuantizer
+        from torchao.quantization.utils import _MultiInput
+
+        torch.manual_seed(0)
+        m = ToyLinearModel(m=128, n=64, k=128).eval()
+        inputs = [_MultiInput([m.example_inputs(batch_size=8)[0]])]
+        x = torch.randn(256, 128)
+        # a column that no input reaches
+        x[:, 5] = 0
+        H = 2 * x.t() @ x / x.shape[0]
+        W = torch.randn(48, 128)
+        # groupsize smaller and larger than the blocksize, and groups across blocks
+        for blocksize, groupsize in [(64, 32), (32, 64), (48, 32)]:
+            quantizer = Int8DynActInt4WeightGPTQQuantizer(blocksize, 0.01, groupsize)
+            runner = GenericGPTQRunner(
+                copy.deepcopy(m), inputs, blocksize, 0.01, groupsize,
+            ).configure_quantization_mode(
+                quantizer.get_qparams_func,
+                quantizer.quantize_func,
+                quantizer.dequantize_func,
+                quantizer.combine_qparams_list_func,
+                quantizer.make_names_and_values_dict_func,
+                quantizer.skip_layer_func,
+                quantizer.act_fake_quant_func,
+            )
+            Q, DQ, qparams = runner.vectorized_quant(H.clone(), W.clone())
+            self.assertTrue(torch.equal(DQ, quantizer.dequantize_func(Q, qparams)))
+            self.assertEqual(qparams[0].shape, (48, 128 // groupsize))
+
+            # GPTQ has a lower output error on the calibration inputs than round to nearest
+            qparams_rtn = quantizer.get_qparams_func(W)
+            DQ_rtn = quantizer.dequantize_func(quantizer.quantize_func(W, qparams_rtn), qparams_rtn)
+            W_live = W.clone()
+            W_live[:, 5] = 0
+            error = torch.linalg.norm(x @ (W_live - DQ).t())
+            error_rtn = torch.linalg.norm(x @ (W - DQ_rtn).t())
+            self.assertLess(error, error_rtn)
+
+    @unittest.skipIf(not TORCH_VERSION_AFTER_2_3, "skipping when torch verion is 2.3 or lower")
+    def test_gptq_offload(self):
+        import tempfile
+        from torchao.quantization.GPTQ import Int8DynActInt4WeightGPTQQuantizer
+        from torchao.quantization.utils import _MultiInput
+
+        torch.manual_seed(0)
+        m = ToyLinearModel(m=128, n=64, k=128).eval()
+        inputs = [_MultiInput([m.example_inputs(batch_size=8)[0] for _ in range(4)])]
+        quantizer = Int8DynActInt4WeightGPTQQuantizer(32, 0.01, 32)
+        ref = quantizer._create_quantized_state_dict(copy.deepcopy(m), inputs, 32, 0.01, 32)
+        with tempfile.TemporaryDirectory() as offload_dir:
+            res = quantizer._create_quantized_state_dict(
+                copy.deepcopy(m), inputs, 32, 0.01, 32, offload_dir=offload_dir
+            )
+            # spilled activations are cleaned up after the run
+            self.assertEqual(os.listdir(offload_dir), [])
+        self.assertEqual(ref.keys(), res.keys())
+        for name in ref:
+            self.assertTrue(torch.equal(ref[name], res[name]), name)
+
+    @unittest.skipIf(not TORCH_VERSION_AFTER_2_3, "skipping when torch verion is 2.3 or lower")
+    @unittest.skipIf(not os.path.exists("/proc/self/status"), "requires /proc/self/status")
+    def test_gptq_offload_memory(self):
+        import ctypes
+        import tempfile
+        from torchao.quantization.GPTQ import GenericGPTQRunner, Int8DynActInt4WeightGPTQQuantizer
+        from torchao.quantization.utils import _MultiInput
+
+        def rss_anon_bytes():
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("RssAnon:"):
+                        return int(line.split()[1]) * 1024
+            raise unittest.SkipTest("RssAnon not reported")
+
+        try:
+            libc = ctypes.CDLL("libc.so.6")
+        except OSError:
+            raise unittest.SkipTest("requires glibc")
+        # pin M_MMAP_THRESHOLD so that freed activations are unmapped instead of being kept
+        # in the heap, then RssAnon tracks the memory that is actually in use
+        libc.mallopt(-3, 128 * 1024)
+
+        class PeakRunner(GenericGPTQRunner):
+            peak = 0
+
+            def _offload(self, *args):
+                PeakRunner.peak = max(PeakRunner.peak, rss_anon_bytes())
+                return super()._offload(*args)
+
+        torch.manual_seed(0)
+        # 1 MiB of activations per input for the outputs of the linear and the relu
+        m = torch.nn.Sequential(torch.nn.Linear(64, 4096, bias=False), torch.nn.ReLU()).eval()
+        quantizer = Int8DynActInt4WeightGPTQQuantizer(32, 0.01, 32)
+        peaks = []
+        for n_inputs in [4, 32]:
+            inputs = [_MultiInput([torch.randn(64, 64) for _ in range(n_inputs)])]
+            with tempfile.TemporaryDirectory() as offload_dir:
+                runner = PeakRunner(
+                    copy.deepcopy(m), inputs, 32, 0.01, 32, offload_dir=offload_dir,
+                ).configure_quantization_mode(
+                    quantizer.get_qparams_func,
+                    quantizer.quantize_func,
+                    quantizer.dequantize_func,
+                    quantizer.combine_qparams_list_func,
+                    quantizer.make_names_and_values_dict_func,
+                    quantizer.skip_layer_func,
+                    quantizer.act_fake_quant_func,
+                )
+                PeakRunner.peak = 0
+                runner.run()
+                peaks.append(PeakRunner.peak)
+                del runner
+        # the outputs for the 28 extra inputs would take 28 MiB of anonymous memory per node
+        # if they were held in memory before being spilled
+        self.assertLess(peaks[1] - peaks[0], 8 * 1024 * 1024)
+
+    @unittest.skipIf(not TORCH_VERSION_AFTER_2_3, "skipping when torch verion is 2.3 or lower")
+    @unittest.skipIf(not torch.distributed.is_available(), "requires torch.distributed")
+    def test_gptq_data_parallel(self):
+        import tempfile
+        from torchao.quantization.GPTQ import (
+            Int8DynActInt4WeightGPTQQuantizer,
+            _add_batch_to_hessian,
+        )
+        from torchao.quantization.utils import _MultiInput
+
+        torch.manual_seed(0)
+        # a single layer so that the differences in the Hessian rounding don't compound across layers
+        m = torch.nn.Sequential(torch.nn.Linear(128, 64, bias=False)).eval()
+        # the shards have different numbers of batches
+        inputs = [_MultiInput([torch.randn(8, 128) for _ in range(5)])]
+
+        # combining the running averages of the shards matches accumulating all batches
+        H, total_batches = 0, 0
+        for x in inputs[0].values:
+            H, total_batches = _add_batch_to_hessian(H, total_batches, x)
+        shard_sum = 0
+        for shard in [inputs[0].values[0::2], inputs[0].values[1::2]]:
+            H_shard, shard_batches = 0, 0
+            for x in shard:
+                H_shard, shard_batches = _add_batch_to_hessian(H_shard, shard_batches, x)
+            shard_sum = shard_sum + H_shard * shard_batches
+        torch.testing.assert_close(shard_sum / total_batches, H)
+
+        quantizer = Int8DynActInt4WeightGPTQQuantizer(32, 0.01, 32)
+        ref = quantizer._create_quantized_state_dict(copy.deepcopy(m), inputs, 32, 0.01, 32)
+        world_size = 2
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            torch.multiprocessing.spawn(
+                _gptq_data_parallel_worker,
+                args=(world_size, os.path.join(tmp_dir, "init"), m, inputs, tmp_dir),
+                nprocs=world_size,
+            )
+            results = [torch.load(os.path.join(tmp_dir, f"{rank}.pt")) for rank in range(world_size)]
+
+        for name in ref:
+            # all ranks produce the same weights
+            self.assertTrue(torch.equal(results[0][name], results[1][name]), name)
+            # same as single process up to the rounding of the Hessian reduction, which can flip
+            # the rounding of a few weights
+            if ref[name].is_floating_point():
+                torch.testing.assert_close(results[0][name], ref[name])
+            else:
+                self.assertLess((results[0][name] != ref[name]).float().mean().item(), 0.01, name)
+
     # TODO: save model weights as artifacts and re-enable in CI
     # For now, to run this test, you will need to download the weights from HF
     # and run this script to convert them:
@@ -508,6 +717,97 @@ class TestQuantFlow(unittest.TestCase):
 
         torch.testing.assert_close(res, ref, rtol=0.00001, atol=1e-2)
 
+    @unittest.skipIf(not TORCH_VERSION_AFTER_2_4, "Test only enabled for 2.4+")
+    def test_quantized_tensor_subclass_int8_packed_cpu(self):
+        for dtype in [torch.float32, torch.bfloat16]:
+            m = ToyLinearModel().eval().to(dtype)
+            m_copy = copy.deepcopy(m)
+            example_inputs = m.example_inputs(batch_size=4, dtype=dtype)
+
+            m = quantize(m, get_apply_int8wo_quant(extended_layout="int8_packed_cpu"))
+            assert isinstance(m.linear1.weight, AffineQuantizedTensor)
+            assert m.linear1.weight.layout == "int8_packed_cpu"
+
+            # reference
+            m_copy = quantize(m_copy, get_apply_int8wo_quant())
+
+            res = m(*example_inputs)
+            ref = torch.nn.functional.linear(
+                torch.nn.functional.linear(example_inputs[0], m_copy.linear1.weight.dequantize()),
+                m_copy.linear2.weight.dequantize(),
+            )
+            torch.testing.assert_close(res, ref, rtol=1e-2, atol=1e-2)
+
+            # make sure it compiles
+            from torchao.quantization.utils import unwrap_tensor_subclass
+            m_compiled = torch.compile(unwrap_tensor_subclass(m), fullgraph=True)
+            torch.testing.assert_close(m_compiled(*example_inputs), res, rtol=1e-2, atol=1e-2)
+
+
+    @unittest.skipIf(not TORCH_VERSION_AFTER_2_4, "Test only enabled for 2.4+")
+    def test_quantized_tensor_subclass_int4_packed_cpu(self):
+        for dtype in [torch.float32, torch.bfloat16]:
+            # linear1 uses the _weight_int4pack_mm kernel, linear2 (n = 36) the blocked fallback
+            m = ToyLinearModel(256, 128, 36).eval().to(dtype)
+            m_copy = copy.deepcopy(m)
+            example_inputs = (torch.randn(2, 3, 256, dtype=dtype),)
+
+            m = quantize(m, get_apply_int4wo_quant(groupsize=32))
+            assert isinstance(m.linear1.weight, AffineQuantizedTensor)
+            assert m.linear1.weight.layout == "int4_packed_cpu"
+            assert m.linear1.weight.layout_tensor.packed_weight.dim() == 4
+            assert m.linear2.weight.layout_tensor.packed_weight.shape == (36, 64)
+
+            # same quantized values as the plain layout
+            m_copy = quantize(m_copy, get_apply_int4wo_quant(groupsize=32, extended_layout="plain"))
+            for linear, linear_copy in [(m.linear1, m_copy.linear1), (m.linear2, m_copy.linear2)]:
+                int_data, _, _ = linear.weight.layout_tensor.get_plain()
+                self.assertTrue(torch.equal(int_data, linear_copy.weight.layout_tensor.int_data))
+
+            res = m(*example_inputs)
+            ref = torch.nn.functional.linear(
+                torch.nn.functional.linear(example_inputs[0], m.linear1.weight.dequantize()),
+                m.linear2.weight.dequantize(),
+            )
+            torch.testing.assert_close(res, ref, rtol=1e-2, atol=1e-2)
+
+        # k = 640 is recovered from the kernel format in several chunks of columns
+        weight = torch.randn(64, 640)
+        weight_int4 = get_apply_int4wo_quant(groupsize=32)(weight)
+        weight_plain = get_apply_int4wo_quant(groupsize=32, extended_layout="plain")(weight)
+        assert weight_int4.layout_tensor.packed_weight.dim() == 4
+        int_data, scale, zero_point = weight_int4.layout_tensor.get_plain()
+        self.assertTrue(torch.equal(int_data, weight_plain.layout_tensor.int_data))
+        self.assertEqual(scale.shape, (64, 20))
+
+    @unittest.skipIf(not TORCH_VERSION_AFTER_2_4, "Test only enabled for 2.4+")
+    def test_quantized_tensor_subclass_sub_byte(self):
+        for nbits, dtype in itertools.product([2, 3], [torch.float32, torch.bfloat16]):
+            # n = 320 is more than one tile of rows
+            m = ToyLinearModel(512, 320, 64).eval().to(dtype)
+            example_inputs = (torch.randn(2, 3, 512, dtype=dtype),)
+
+            m = quantize(m, get_apply_sub_byte_wo_quant(nbits=nbits, groupsize=64))
+            weight = m.linear1.weight
+            assert isinstance(weight, AffineQuantizedTensor)
+            assert weight.layout == f"int{nbits}_packed"
+            assert weight.shape == (320, 512)
+            packed_weight = weight.layout_tensor.packed_weight
+            assert packed_weight.dtype == torch.uint8
+            assert packed_weight.shape == (320, 512 * nbits // 8)
+            int_data, _, _ = weight.layout_tensor.get_plain()
+            assert int_data.min() >= 0 and int_data.max() < 2**nbits
+
+            # the lookup table decode used by the matmul is bit exact with dequantize
+            lut = weight.layout_tensor.get_dequantize_lut(2 ** (nbits - 1), dtype)
+            self.assertTrue(torch.equal(weight.layout_tensor.dequantize_rows(8, 264, lut), weight.dequantize()[8:264]))
+
+            res = m(*example_inputs)
+            ref = torch.nn.functional.linear(
+                torch.nn.functional.linear(example_inputs[0], m.linear1.weight.dequantize()),
+                m.linear2.weight.dequantize(),
+            )
+            torch.testing.assert_close(res, ref, rtol=1e-2, atol=1e-2)
 
     @unittest.skipIf(not TORCH_VERSION_AFTER_2_4, "Test only enabled for 2.4+")
     @unittest.skipIf(not torch.cuda.is_available(), "Need CUDA available")
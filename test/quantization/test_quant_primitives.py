@@ -14,7 +14,9 @@ from torchao.quantization.quant_primitives import (
     quantize_affine,
     dequantize_affine,
     choose_qparams_affine,
+    choose_qparams_and_quantize_affine,
     MappingType,
+    ZeroPointDomain,
 )
 
 from torchao.quantization.utils import (
@@ -389,6 +391,75 @@ class TestQuantPrimitives(unittest.TestCase):
         self.assertTrue(torch.equal(scale, scale_ref))
         self.assertTrue(torch.equal(zero_point, zero_point_ref))
 
+    def test_choose_qparams_and_quantize_affine(self):
+        """Make sure the fused version gives the same result as choose_qparams_affine + quantize_affine"""
+        configs = [
+            # per token symmetric, e.g. int8 dynamic activation quantization
+            ((4, 3, 64), (1, 1, 64), MappingType.SYMMETRIC, torch.int8, dict(quant_min=-127, quant_max=127, eps=1e-5)),
+            # per token asymmetric, e.g. 8da4w activation quantization
+            ((4, 3, 64), (1, 1, 64), MappingType.ASYMMETRIC, torch.int8, dict()),
+            # per tensor and multi dim reduction
+            ((10, 10), (10, 10), MappingType.ASYMMETRIC, torch.int8, dict()),
+            ((3, 3, 10, 10), (3, 3, 2, 2), MappingType.ASYMMETRIC, torch.int8, dict()),
+            # groupwise with zero_point in float domain, e.g. int4 weight only quantization
+            ((32, 256), (1, 32), MappingType.ASYMMETRIC, torch.int32, dict(quant_min=0, quant_max=15, eps=1e-6, preserve_zero=False, zero_point_dtype=torch.bfloat16, zero_point_domain=ZeroPointDomain.FLOAT)),
+            # integer zero_point
+            ((32, 256), (1, 256), MappingType.SYMMETRIC, torch.int8, dict(zero_point_dtype=torch.int64)),
+        ]
+        for dtype in [torch.float32, torch.bfloat16, torch.float16]:
+            for shape, block_size, mapping_type, target_dtype, kwargs in configs:
+                kwargs = dict(kwargs)
+                if dtype == torch.float16:
+                    kwargs["scale_dtype"] = torch.float32
+                input = torch.randn(*shape, dtype=dtype)
+                scale_ref, zero_point_ref = choose_qparams_affine(input, mapping_type, block_size, target_dtype, **kwargs)
+                zero_point_domain = kwargs.get("zero_point_domain", ZeroPointDomain.INT)
+                quant_min, quant_max = kwargs.get("quant_min"), kwargs.get("quant_max")
+                quantized_ref = quantize_affine(input, block_size, scale_ref, zero_point_ref, target_dtype, quant_min, quant_max, zero_point_domain)
+
+                quantized, scale, zero_point = choose_qparams_and_quantize_affine(input, mapping_type, block_size, target_dtype, **kwargs)
+                self.assertTrue(torch.equal(scale, scale_ref))
+                self.assertTrue(torch.equal(zero_point, zero_point_ref))
+                self.assertTrue(torch.equal(quantized, quantized_ref))
+
+    def test_quantization_plan(self):
+        from torchao.quantization.quant_primitives import (
+            _get_quantization_plan,
+            _build_quantization_plan_cached,
+        )
+        plan = _get_quantization_plan((3, 3, 2, 10), torch.Size([3, 3, 10, 10]))
+        self.assertEqual(plan.shape_for_reduction, (3, 3, 5, 2, 10))
+        self.assertEqual(plan.reduction_dims, (0, 1, 3, 4))
+        self.assertEqual(plan.shape_after_reduction, (1, 1, 5, 1, 1))
+
+        # block_size can be passed in as a list, e.g. for per token quantization
+        input = torch.randn(4, 64)
+        block_size = [1, 64]
+        mapping_type = MappingType.SYMMETRIC
+        dtype = torch.int8
+        scale, zero_point = choose_qparams_affine(input, mapping_type, block_size, dtype)
+        hits = _build_quantization_plan_cached.cache_info().hits
+        scale, zero_point = choose_qparams_affine(input, mapping_type, block_size, dtype)
+        quantized = quantize_affine(input, block_size, scale, zero_point, dtype)
+        dequantized = dequantize_affine(quantized, block_size, scale, zero_point, dtype)
+        self.assertEqual(_build_quantization_plan_cached.cache_info().hits, hits + 3)
+
+    @unittest.skipIf(not TORCH_VERSION_AFTER_2_4, "skipping when torch version is 2.4 or lower")
+    def test_quantization_plan_compile(self):
+        mapping_type = MappingType.SYMMETRIC
+        dtype = torch.int8
+
+        def quant(x):
+            block_size = [1] * (x.dim() - 1) + [x.shape[-1]]
+            scale, zero_point = choose_qparams_affine(x, mapping_type, block_size, dtype)
+            return quantize_affine(x, block_size, scale, zero_point, dtype)
+
+        compiled = torch.compile(quant, dynamic=True, fullgraph=True)
+        for num_tokens in [1, 3, 8]:
+            input = torch.randn(2, num_tokens, 64)
+            # inductor might round differently from eager by 1 for values close to .5
+            torch.testing.assert_close(compiled(input).to(torch.int32), quant(input).to(torch.int32), atol=1, rtol=0)
+
 
 if __name__ == "__main__":
     unittest.main()
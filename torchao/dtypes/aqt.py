@@ -3,15 +3,17 @@ from typing import Dict, Callable, Any, Tuple, Optional
 from collections import defaultdict
 import functools
 from torchao.quantization.quant_primitives import (
-    choose_qparams_affine,
-    quantize_affine,
+    choose_qparams_and_quantize_affine,
     dequantize_affine,
     ZeroPointDomain,
     MappingType,
     pack_tinygemm_scales_and_zeros,
+    unpack_tinygemm_scales_and_zeros,
 )
+from torchao.quantization.utils import TORCH_VERSION_AFTER_2_4
 from torch.utils._python_dispatch import return_and_correct_aliasing
 from torchao.kernel.intmm import int_scaled_matmul
+from torchao.dtypes.utils import pack_bits, unpack_bits
 
 aten = torch.ops.aten
 
@@ -293,6 +295,380 @@ class TensorCoreTiledAQTLayout(AQTLayout):
             f"Unpacking for tensor core tiled storage is not yet implemented"
         )
 
+
+@register_aqt_layout_cls("int8_packed_cpu")
+class Int8PackedCPUAQTLayout(AQTLayout):
+    """
+    Layout storage class for int8_packed_cpu layout for affine quantized tensor, this is for per channel
+    int8 weight only quantization on cpu, it stores the original weight of dimension [n][k] as a contiguous
+    int8 tensor together with a 1-d scale tensor of dimension [n], which is the format consumed directly by
+    `torch.ops.aten._weight_int8pack_mm`, so that we don't need to transpose and cast the weight
+    in every call
+
+    fields:
+      packed_weight (torch.Tensor): the contiguous int8 weight Tensor of dimension [n][k]
+      scale (torch.Tensor): the per channel scale Tensor of dimension [n]
+      zero_point (torch.Tensor): the per channel zero_point Tensor of dimension [n], only used by `get_plain`
+    """
+
+    def __new__(
+        cls,
+        int_data: torch.Tensor,
+        scale: torch.Tensor,
+        zero_point: torch.Tensor,
+    ):
+        kwargs = {}
+        kwargs["device"] = int_data.device
+        kwargs["layout"] = (
+            kwargs.get("layout") if kwargs.get("layout", False) else int_data.layout
+        )
+        kwargs["dtype"] = int_data.dtype
+        kwargs["requires_grad"] = False
+        shape = int_data.shape
+        return torch.Tensor._make_wrapper_subclass(cls, shape, **kwargs)  # type: ignore[attr-defined]
+
+    def __init__(
+        self,
+        int_data: torch.Tensor,
+        scale: torch.Tensor,
+        zero_point: torch.Tensor,
+    ):
+        assert int_data.dtype == torch.int8 and int_data.dim() == 2, \
+            f"int8_packed_cpu layout expects a 2-d int8 weight, got {int_data.dtype} with shape {int_data.shape}"
+        self.packed_weight = int_data.contiguous()
+        self.scale = scale.reshape(-1).contiguous()
+        self.zero_point = zero_point.reshape(-1)
+
+    def __tensor_flatten__(self):
+        return ["packed_weight", "scale", "zero_point"], []
+
+    @classmethod
+    def __tensor_unflatten__(
+        cls, tensor_data_dict, tensor_attributes, outer_size, outer_stride
+    ):
+        packed_weight, scale, zero_point = tensor_data_dict["packed_weight"], tensor_data_dict["scale"], tensor_data_dict["zero_point"]
+        return cls(packed_weight, scale, zero_point)
+
+    def to(self, *args, **kwargs):
+        kwargs = self._get_to_kwargs(*args, **kwargs)
+        device = kwargs["device"]
+        if torch.device(device).type != "cpu":
+            raise ValueError(f"Int8PackedCPUAQTLayout is only available for cpu device")
+        return self.__class__(
+            self.packed_weight.to(device),
+            self.scale.to(device),
+            self.zero_point.to(device),
+        )
+
+    def _apply_fn_to_data(self, fn):
+        return self.__class__(
+            fn(self.packed_weight),
+            fn(self.scale),
+            fn(self.zero_point),
+        )
+
+    @classmethod
+    def __torch_dispatch__(cls, func, types, args, kwargs):
+        kwargs = {} if kwargs is None else kwargs
+
+        if func is aten.detach.default:
+            return return_and_correct_aliasing(
+                func, args, kwargs, args[0]._apply_fn_to_data(torch.detach)
+            )
+
+        raise NotImplementedError(
+            f"Int8PackedCPUAQTLayout dispatch: attempting to run {func}, this is not supported"
+        )
+
+    __torch_function__ = torch._C._disabled_torch_function_impl
+
+    def get_plain(self):
+        return self.packed_weight, self.scale, self.zero_point
+
+
+@register_aqt_layout_cls("int4_packed_cpu")
+class Int4PackedCPUAQTLayout(AQTLayout):
+    """
+    Layout storage class for int4_packed_cpu layout for affine quantized tensor, this is for groupwise uint4
+    weight only quantization on cpu, with float zero points (the same numerics as `tensor_core_tiled`).
+    When the cpu `torch.ops.aten._weight_int4pack_mm` kernel is available (PyTorch 2.4+) and the shape is
+    supported, it stores the weight of dimension [n][k] in the packed format of
+    `torch.ops.aten._convert_weight_to_int4pack`, otherwise it stores two 4 bit values per byte as a uint8
+    tensor of dimension [n][k / 2] that is dequantized a tile of rows at a time inside the matmul.
+    In both cases scales and zeros are stored together as a [k / groupsize][n][2] tensor
+
+    fields:
+      packed_weight (torch.Tensor): the 4-d packed int4 weight, or the [n][k / 2] uint8 weight
+      scale_and_zero (torch.Tensor): the combined scale Tensor used to map between floating point tensor to quantized tensor and zero_point Tensor
+    """
+
+    def __new__(
+        cls,
+        int_data: torch.Tensor,
+        scale: torch.Tensor,
+        zero_point: torch.Tensor,
+    ):
+        kwargs = {}
+        kwargs["device"] = int_data.device
+        kwargs["layout"] = (
+            kwargs.get("layout") if kwargs.get("layout", False) else int_data.layout
+        )
+        kwargs["dtype"] = int_data.dtype
+        kwargs["requires_grad"] = False
+        shape = int_data.shape
+        return torch.Tensor._make_wrapper_subclass(cls, shape, **kwargs)  # type: ignore[attr-defined]
+
+    def __init__(
+        self,
+        int_data: torch.Tensor,
+        scale: torch.Tensor,
+        zero_point: torch.Tensor,
+    ):
+        assert int_data.dim() == 2 and int_data.shape[1] % 2 == 0, \
+            f"int4_packed_cpu layout expects a 2-d weight with an even k, got shape {int_data.shape}"
+        n, k = int_data.shape
+        if self._use_int4pack_mm(n, k):
+            inner_k_tiles = 8 if k % 128 == 0 else 4 if k % 64 == 0 else 2
+            self.packed_weight = torch.ops.aten._convert_weight_to_int4pack(int_data.to(torch.int32), inner_k_tiles)
+        else:
+            self.packed_weight = pack_bits(int_data, 4)
+        # tinygemm expects bfloat16 scales and zeros, they are cast to the activation dtype in the matmul
+        self.scale_and_zero = pack_tinygemm_scales_and_zeros(scale.to(torch.bfloat16), zero_point.to(torch.bfloat16))
+
+    @staticmethod
+    def _use_int4pack_mm(n: int, k: int) -> bool:
+        return TORCH_VERSION_AFTER_2_4 and n % 8 == 0 and k % 32 == 0
+
+    @classmethod
+    def _from_packed(cls, packed_weight: torch.Tensor, scale_and_zero: torch.Tensor, shape: torch.Size):
+        layout_tensor = torch.Tensor._make_wrapper_subclass(  # type: ignore[attr-defined]
+            cls, shape, dtype=torch.int32, device=packed_weight.device, requires_grad=False
+        )
+        layout_tensor.packed_weight = packed_weight
+        layout_tensor.scale_and_zero = scale_and_zero
+        return layout_tensor
+
+    def __tensor_flatten__(self):
+        return ["packed_weight", "scale_and_zero"], [self.shape]
+
+    @classmethod
+    def __tensor_unflatten__(
+        cls, tensor_data_dict, tensor_attributes, outer_size, outer_stride
+    ):
+        packed_weight, scale_and_zero = tensor_data_dict["packed_weight"], tensor_data_dict["scale_and_zero"]
+        shape, = tensor_attributes
+        return cls._from_packed(packed_weight, scale_and_zero, shape)
+
+    def to(self, *args, **kwargs):
+        kwargs = self._get_to_kwargs(*args, **kwargs)
+        device = kwargs["device"]
+        if torch.device(device).type != "cpu":
+            raise ValueError(f"Int4PackedCPUAQTLayout is only available for cpu device")
+        return self._from_packed(self.packed_weight.to(device), self.scale_and_zero.to(device), self.shape)
+
+    def _apply_fn_to_data(self, fn):
+        return self._from_packed(fn(self.packed_weight), fn(self.scale_and_zero), self.shape)
+
+    @classmethod
+    def __torch_dispatch__(cls, func, types, args, kwargs):
+        kwargs = {} if kwargs is None else kwargs
+
+        if func is aten.detach.default:
+            return return_and_correct_aliasing(
+                func, args, kwargs, args[0]._apply_fn_to_data(torch.detach)
+            )
+
+        raise NotImplementedError(
+            f"Int4PackedCPUAQTLayout dispatch: attempting to run {func}, this is not supported"
+        )
+
+    __torch_function__ = torch._C._disabled_torch_function_impl
+
+    @property
+    def groupsize(self) -> int:
+        return self.shape[1] // self.scale_and_zero.shape[0]
+
+    def get_plain_rows(self, start: int, end: int) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+        Unpacks rows [start, end) of the weight, with their scale and zero_point, only for the
+        two 4 bit values per byte format, the `_weight_int4pack_mm` format is opaque, see `get_plain`
+        """
+        assert self.packed_weight.dim() == 2, "get_plain_rows is only supported for the uint8 packed weight"
+        scale, zero_point = unpack_tinygemm_scales_and_zeros(self.scale_and_zero[:, start:end])
+        int_data = unpack_bits(self.packed_weight[start:end], 4).to(torch.int32)
+        return int_data, scale.squeeze(-1), zero_point.squeeze(-1)
+
+    def get_plain(self):
+        if self.packed_weight.dim() == 2:
+            return self.get_plain_rows(0, self.shape[0])
+        # the packed format is opaque, recover the values with the kernel: with scales of 1 and zeros
+        # of 8 (the mid point) the weight is dequantized to the integer values. Multiplying by rows
+        # [k0, k1) of the identity gives columns [k0, k1) of the weight, a chunk of rows of the
+        # identity is built at a time instead of the whole k x k matrix
+        n, k = self.shape
+        ones_and_eights = torch.stack(
+            [torch.ones_like(self.scale_and_zero[..., 0]), torch.full_like(self.scale_and_zero[..., 1], 8)], dim=-1
+        )
+        int_data = torch.empty(n, k, dtype=torch.int32, device=self.device)
+        for k0 in range(0, k, _SUB_BYTE_TILE_ROWS):
+            k1 = min(k0 + _SUB_BYTE_TILE_ROWS, k)
+            eye_rows = torch.zeros(k1 - k0, k, dtype=torch.bfloat16, device=self.device)
+            eye_rows.diagonal(offset=k0).fill_(1)
+            columns = torch.ops.aten._weight_int4pack_mm(eye_rows, self.packed_weight, self.groupsize, ones_and_eights)
+            int_data[:, k0:k1] = columns.t().to(torch.int32)
+        scale, zero_point = unpack_tinygemm_scales_and_zeros(self.scale_and_zero)
+        return int_data, scale.squeeze(-1), zero_point.squeeze(-1)
+
+
+class SubByteBitPackedAQTLayout(AQTLayout):
+    """
+    Base layout storage class for the sub byte (2 and 3 bit) bit packed layouts for affine quantized tensor,
+    this is for groupwise weight only quantization with unsigned integer values in [0, 2**nbits), it stores
+    the original weight of dimension [n][k] densely packed along k, 8 values in nbits bytes, as a uint8 tensor
+    of dimension [n][ceil(k / 8) * nbits], see `torchao.dtypes.utils.pack_bits`
+
+    fields:
+      packed_weight (torch.Tensor): the uint8 bit packed weight Tensor of dimension [n][ceil(k / 8) * nbits]
+      scale (torch.Tensor): the scale Tensor used to map between floating point tensor to quantized tensor
+      zero_point (torch.Tensor): the zero_point Tensor used to map between floating point tensor to quantized tensor
+      int_data_dtype (torch.dtype): the dtype of the unpacked integer data returned by `get_plain`
+    """
+    # number of bits of the values, set by the subclasses
+    nbits: int
+
+    def __new__(
+        cls,
+        int_data: torch.Tensor,
+        scale: torch.Tensor,
+        zero_point: torch.Tensor,
+        int_data_dtype: Optional[torch.dtype] = None,
+    ):
+        kwargs = {}
+        kwargs["device"] = int_data.device
+        kwargs["layout"] = (
+            kwargs.get("layout") if kwargs.get("layout", False) else int_data.layout
+        )
+        kwargs["dtype"] = int_data.dtype if int_data_dtype is None else int_data_dtype
+        kwargs["requires_grad"] = False
+        shape = int_data.shape
+        if int_data_dtype is not None:
+            # int_data is already packed
+            shape = (shape[0], shape[1] // cls.nbits * 8)
+        return torch.Tensor._make_wrapper_subclass(cls, shape, **kwargs)  # type: ignore[attr-defined]
+
+    def __init__(
+        self,
+        int_data: torch.Tensor,
+        scale: torch.Tensor,
+        zero_point: torch.Tensor,
+        int_data_dtype: Optional[torch.dtype] = None,
+    ):
+        if int_data_dtype is None:
+            assert int_data.dim() == 2, f"{self.extended_layout} layout expects a 2-d weight, got shape {int_data.shape}"
+            assert int_data.shape[1] % 8 == 0, f"{self.extended_layout} layout expects k to be a multiple of 8, got {int_data.shape[1]}"
+            self.packed_weight = pack_bits(int_data, self.nbits)
+            int_data_dtype = int_data.dtype
+        else:
+            self.packed_weight = int_data
+        self.scale = scale
+        self.zero_point = zero_point
+        self.int_data_dtype = int_data_dtype
+
+    def __tensor_flatten__(self):
+        return ["packed_weight", "scale", "zero_point"], [self.int_data_dtype]
+
+    @classmethod
+    def __tensor_unflatten__(
+        cls, tensor_data_dict, tensor_attributes, outer_size, outer_stride
+    ):
+        packed_weight, scale, zero_point = tensor_data_dict["packed_weight"], tensor_data_dict["scale"], tensor_data_dict["zero_point"]
+        int_data_dtype, = tensor_attributes
+        return cls(packed_weight, scale, zero_point, int_data_dtype)
+
+    def to(self, *args, **kwargs):
+        kwargs = self._get_to_kwargs(*args, **kwargs)
+        return self.__class__(
+            self.packed_weight.to(kwargs["device"]),
+            self.scale.to(kwargs["device"]),
+            self.zero_point.to(kwargs["device"]),
+            self.int_data_dtype,
+        )
+
+    def _apply_fn_to_data(self, fn):
+        return self.__class__(
+            fn(self.packed_weight),
+            fn(self.scale),
+            fn(self.zero_point),
+            self.int_data_dtype,
+        )
+
+    @classmethod
+    def __torch_dispatch__(cls, func, types, args, kwargs):
+        kwargs = {} if kwargs is None else kwargs
+
+        if func is aten.detach.default:
+            return return_and_correct_aliasing(
+                func, args, kwargs, args[0]._apply_fn_to_data(torch.detach)
+            )
+
+        raise NotImplementedError(
+            f"{cls.__name__} dispatch: attempting to run {func}, this is not supported"
+        )
+
+    __torch_function__ = torch._C._disabled_torch_function_impl
+
+    def get_plain_rows(self, start: int, end: int) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """Unpacks rows [start, end) of the weight, with their scale and zero_point"""
+        int_data = unpack_bits(self.packed_weight[start:end], self.nbits, self.shape[1]).to(self.int_data_dtype)
+        return int_data, self.scale[start:end], self.zero_point[start:end]
+
+    def get_dequantize_lut(self, mid_point: float, output_dtype: torch.dtype) -> torch.Tensor:
+        """
+        Lookup table for `dequantize_rows`, row i is (value - mid_point) of the 4 values packed
+        in the 4 * nbits bits i, in `output_dtype`
+        """
+        index_bits = 4 * self.nbits
+        index = torch.arange(2**index_bits, dtype=torch.int32, device=self.device)
+        shifts = torch.arange(index_bits - self.nbits, -1, -self.nbits, dtype=torch.int32, device=self.device)
+        values = (index.unsqueeze(-1) >> shifts) & ((1 << self.nbits) - 1)
+        return (values - mid_point).to(output_dtype)
+
+    def dequantize_rows(self, start: int, end: int, lut: torch.Tensor) -> torch.Tensor:
+        """
+        Dequantizes rows [start, end) of the weight with float zero points, bit exact with
+        `dequantize_affine` with `ZeroPointDomain.FLOAT`. The packed bits are decoded 4 values at a
+        time with `lut` (see `get_dequantize_lut`) instead of unpacking and converting every value
+        """
+        packed_weight = self.packed_weight[start:end]
+        rows = packed_weight.shape[0]
+        if self.nbits == 2:
+            index = packed_weight.to(torch.int32)
+        else:
+            # 8 values in 3 bytes, each 12 bit half indexes 4 of them
+            b = packed_weight.view(rows, -1, 3).to(torch.int32)
+            index = torch.stack([(b[..., 0] << 4) | (b[..., 1] >> 4), ((b[..., 1] & 15) << 8) | b[..., 2]], dim=-1)
+        w = torch.nn.functional.embedding(index.view(rows, -1), lut)
+        scale, zero_point = self.scale[start:end], self.zero_point[start:end]
+        w = w.view(rows, scale.shape[-1], -1)
+        w *= scale.unsqueeze(-1)
+        if zero_point is not None:
+            w += zero_point.unsqueeze(-1)
+        return w.view(rows, -1)
+
+    def get_plain(self):
+        return self.get_plain_rows(0, self.shape[0])
+
+
+@register_aqt_layout_cls("int2_packed")
+class Int2PackedAQTLayout(SubByteBitPackedAQTLayout):
+    nbits = 2
+
+
+@register_aqt_layout_cls("int3_packed")
+class Int3PackedAQTLayout(SubByteBitPackedAQTLayout):
+    nbits = 3
+
+
 class AffineQuantizedTensor(torch.Tensor):
     """
     Base affine quantized tensor subclass. When the from_float method is used,
@@ -413,8 +789,9 @@ class AffineQuantizedTensor(torch.Tensor):
         zero_point_domain: ZeroPointDomain = ZeroPointDomain.INT,
         extended_layout: str = "plain",
     ):
-        scale, zero_point = choose_qparams_affine(input_float, mapping_type, block_size, target_dtype, quant_min, quant_max, eps, scale_dtype, zero_point_dtype, preserve_zero, zero_point_domain)
-        int_data = quantize_affine(input_float, block_size, scale, zero_point, target_dtype, quant_min, quant_max, zero_point_domain)
+        # fused choose_qparams + quantize, this matters when from_float is used as `input_quant_func`
+        # for dynamic activation quantization, where it's called for every input
+        int_data, scale, zero_point = choose_qparams_and_quantize_affine(input_float, mapping_type, block_size, target_dtype, quant_min, quant_max, eps, scale_dtype, zero_point_dtype, preserve_zero, zero_point_domain)
 
         layout_cls = get_aqt_layout_cls(extended_layout)
         layout_tensor = layout_cls(int_data, scale, zero_point)
@@ -507,6 +884,10 @@ class AffineQuantizedTensor(torch.Tensor):
             f"AffineQuantizedTensor dispatch: attempting to run {func}, this is not supported"
         )
 
+# number of rows of the weight that are unpacked and dequantized at a time by the sub byte layouts
+# (and by the blocked fallback of the int4_packed_cpu layout)
+_SUB_BYTE_TILE_ROWS = 256
+
 def _quantized_linear_op(input_tensor, weight_qtensor, bias):
     is_cuda = weight_qtensor.is_cuda
     is_cpu = weight_qtensor.device == torch.device("cpu")
@@ -573,6 +954,31 @@ def _quantized_linear_op(input_tensor, weight_qtensor, bias):
             packed_weight = weight_qtensor.layout_tensor.packed_weight
             scale_and_zero = weight_qtensor.layout_tensor.scale_and_zero
             return torch.ops.aten._weight_int4pack_mm(input_tensor.contiguous(), packed_weight, groupsize, scale_and_zero)
+        elif (
+            is_cpu and
+            weight_is_int8 and
+            input_tensor.is_floating_point() and
+            len(weight_qtensor.shape) == 2 and
+            len(weight_qtensor.block_size) == 2 and
+            weight_qtensor.block_size[0] == 1 and
+            weight_qtensor.block_size[1] == weight_qtensor.shape[1] and
+            weight_qtensor.layout == "int8_packed_cpu"
+        ):
+            # per channel int8 weight only quantizated mm with the weight already in the
+            # [n][k] contiguous format expected by the fused kernel
+            packed_weight = weight_qtensor.layout_tensor.packed_weight
+            w_scales = weight_qtensor.layout_tensor.scale
+            if w_scales.dtype != input_tensor.dtype:
+                w_scales = w_scales.to(input_tensor.dtype)
+            y = torch.ops.aten._weight_int8pack_mm(
+                input_tensor.reshape(-1, input_tensor.shape[-1]).contiguous(),
+                packed_weight,
+                w_scales,
+            )
+            y = y.reshape(*input_tensor.shape[:-1], y.shape[-1])
+            if bias is not None:
+                y += bias
+            return y
         elif (
             is_cpu and
             weight_is_int8 and
@@ -582,8 +988,8 @@ def _quantized_linear_op(input_tensor, weight_qtensor, bias):
             weight_qtensor.block_size[1] == weight_qtensor.shape[1] and
             weight_qtensor.layout == "plain"
         ):
-            # TODO: enable cpu and mps efficient path
-            # per channel int8 weight only quantizated mm
+            # per channel int8 weight only quantizated mm, use `int8_packed_cpu` layout
+            # to avoid the transpose and cast of the weight in every call
             w_vals_int8_t = weight_qtensor.layout_tensor.int_data.t().contiguous()
             orig_dtype = input_tensor.dtype
             y = (
@@ -591,15 +997,94 @@ def _quantized_linear_op(input_tensor, weight_qtensor, bias):
                     input_tensor.reshape(-1, input_tensor.shape[-1]),
                     w_vals_int8_t.to(input_tensor.dtype),
                 )
-                * weight_qtensor.scale
+                * weight_qtensor.layout_tensor.scale
             )
             y = y.reshape(*input_tensor.shape[:-1], y.shape[-1])
             if bias is not None:
                 y += bias
-                return y.to(orig_dtype)
+            return y.to(orig_dtype)
 
-            # is_cpu and is_mps only, some issue with is_contiguous() currently
-            # return torch.ops.aten._weight_int8pack_mm(input_tensor.contiguous(), w_vals_int8_t, weight_qtensor.layout_tensor.scale)
+        elif (
+            is_cpu and
+            weight_is_uint4 and
+            input_tensor.is_floating_point() and
+            len(weight_qtensor.shape) == 2 and
+            weight_qtensor.block_size[0] == 1 and
+            weight_qtensor.zero_point_domain == ZeroPointDomain.FLOAT and
+            weight_qtensor.layout == "int4_packed_cpu"
+        ):
+            # groupwise int4 weight only quantized mm on cpu
+            layout_tensor = weight_qtensor.layout_tensor
+            scale_and_zero = layout_tensor.scale_and_zero
+            if scale_and_zero.dtype != input_tensor.dtype:
+                scale_and_zero = scale_and_zero.to(input_tensor.dtype)
+            if layout_tensor.packed_weight.dim() == 4:
+                y = torch.ops.aten._weight_int4pack_mm(
+                    input_tensor.reshape(-1, input_tensor.shape[-1]).contiguous(),
+                    layout_tensor.packed_weight,
+                    layout_tensor.groupsize,
+                    scale_and_zero,
+                )
+                y = y.reshape(*input_tensor.shape[:-1], y.shape[-1])
+            else:
+                # blocked fallback, dequantize a tile of rows of the weight at a time
+                n = weight_qtensor.shape[0]
+                y = input_tensor.new_empty(*input_tensor.shape[:-1], n)
+                for start in range(0, n, _SUB_BYTE_TILE_ROWS):
+                    end = min(start + _SUB_BYTE_TILE_ROWS, n)
+                    int_data, scale, zero_point = layout_tensor.get_plain_rows(start, end)
+                    w_tile = dequantize_affine(
+                        int_data,
+                        weight_qtensor.block_size,
+                        scale.to(input_tensor.dtype),
+                        zero_point.to(input_tensor.dtype),
+                        int_data.dtype,
+                        weight_qtensor.quant_min,
+                        weight_qtensor.quant_max,
+                        weight_qtensor.zero_point_domain,
+                        output_dtype=input_tensor.dtype,
+                    )
+                    y[..., start:end] = torch.nn.functional.linear(input_tensor, w_tile)
+            if bias is not None:
+                y += bias
+            return y
+        elif (
+            weight_qtensor.layout in ("int2_packed", "int3_packed") and
+            input_tensor.is_floating_point() and
+            len(weight_qtensor.shape) == 2 and
+            weight_qtensor.block_size[0] == 1
+        ):
+            # sub byte groupwise weight only quantized mm, unpack and dequantize the weight one tile of
+            # rows at a time inside the matmul, instead of materializing the full floating point weight
+            layout_tensor = weight_qtensor.layout_tensor
+            n = weight_qtensor.shape[0]
+            use_lut = weight_qtensor.zero_point_domain == ZeroPointDomain.FLOAT
+            if use_lut:
+                quant_min = 0 if weight_qtensor.quant_min is None else weight_qtensor.quant_min
+                quant_max = 2**layout_tensor.nbits - 1 if weight_qtensor.quant_max is None else weight_qtensor.quant_max
+                lut = layout_tensor.get_dequantize_lut((quant_max + quant_min + 1) / 2, input_tensor.dtype)
+            y = input_tensor.new_empty(*input_tensor.shape[:-1], n)
+            for start in range(0, n, _SUB_BYTE_TILE_ROWS):
+                end = min(start + _SUB_BYTE_TILE_ROWS, n)
+                if use_lut:
+                    w_tile = layout_tensor.dequantize_rows(start, end, lut)
+                else:
+                    int_data, scale, zero_point = layout_tensor.get_plain_rows(start, end)
+                    w_tile = dequantize_affine(
+                        int_data,
+                        weight_qtensor.block_size,
+                        scale,
+                        zero_point,
+                        int_data.dtype,
+                        weight_qtensor.quant_min,
+                        weight_qtensor.quant_max,
+                        weight_qtensor.zero_point_domain,
+                        output_dtype=input_tensor.dtype,
+                    )
+                y[..., start:end] = torch.nn.functional.linear(input_tensor, w_tile)
+            if bias is not None:
+                y += bias
+            return y
 
     raise NotImplementedError("No specialized dispatch found for quantized linear op")
 
@@ -146,6 +146,21 @@ def _pt_float6_e3m2_to_float32(tensor: Tensor) -> Tensor:
     return results * 2.0 ** (127 - 3)  # exponent bias correction
 
 
+# (dtype, device) -> value of every FP6 encoding, see _lut_float6_e3m2_to_dtype()
+_FLOAT6_E3M2_LUT_CACHE = {}
+
+
+# gathers from a table of the 64 FP6 values computed with _pt_float6_e3m2_to_float32(), so the
+# results are bit-exact with it without its full size temporaries
+def _lut_float6_e3m2_to_dtype(tensor: Tensor, dtype: torch.dtype) -> Tensor:
+    key = (dtype, tensor.device)
+    if key not in _FLOAT6_E3M2_LUT_CACHE:
+        encodings = torch.arange(64, dtype=torch.uint8, device=tensor.device)
+        _FLOAT6_E3M2_LUT_CACHE[key] = _pt_float6_e3m2_to_float32(encodings).to(dtype)
+    lut = _FLOAT6_E3M2_LUT_CACHE[key]
+    return lut.index_select(0, tensor.flatten().to(torch.int32)).view(tensor.shape)
+
+
 def from_float6_e3m2(tensor: Tensor, no_bit_packing: bool = False, dtype: torch.dtype = torch.float32) -> Tensor:
     """Convert an FP6 tensor (created by :func:`to_float6_e3m2`) to FP32.
 
@@ -164,6 +179,10 @@ def from_float6_e3m2(tensor: Tensor, no_bit_packing: bool = False, dtype: torch.
         if tensor.is_cpu:
           return from_float6_e3m2_unpacked_cpu(tensor, dtype)
 
+        # the lookup table is a cached tensor, so only use it in eager mode
+        if not torch.compiler.is_compiling():
+            return _lut_float6_e3m2_to_dtype(tensor, dtype)
+
         return _pt_float6_e3m2_to_float32(tensor).to(dtype)
 
     assert tensor.shape[-1] % 3 == 0, "Last dim must be divisible by 3"
@@ -171,6 +190,14 @@ def from_float6_e3m2(tensor: Tensor, no_bit_packing: bool = False, dtype: torch.
         return from_float6_e3m2_packed_cpu(tensor, dtype)
 
     bits0, bits1, bits2 = tensor.unflatten(-1, (-1, 3)).unbind(-1)
+    if not torch.compiler.is_compiling():
+        val0 = bits0 >> 2
+        val1 = ((bits0 & 0x3) << 4) | (bits1 >> 4)
+        val2 = ((bits1 & 0xF) << 2) | (bits2 >> 6)
+        val3 = bits2 & 0x3F
+        unpacked = torch.stack([val0, val1, val2, val3], dim=-1).flatten(-2)
+        return _lut_float6_e3m2_to_dtype(unpacked, dtype)
+
     val0 = _pt_float6_e3m2_to_float32(bits0 >> 2).to(dtype)
     val1 = _pt_float6_e3m2_to_float32(((bits0 & 0x3) << 4) | (bits1 >> 4)).to(dtype)
     val2 = _pt_float6_e3m2_to_float32(((bits1 & 0xF) << 2) | (bits2 >> 6)).to(dtype)
@@ -4,6 +4,7 @@ import math
 from typing import Dict, Tuple
 import math
 import sys
+import warnings
 from enum import Enum, auto
 
 import torch
@@ -24,13 +25,27 @@ NF4_OPS_TABLE: Dict[Any, Any] = {}
 
 _INNER_TENSOR_NAMES_FOR_SHARDING = ["quantized_scalers", "quantization_factor", "quantized_data"]
 
-# Note: Quantize in Chunks
-# During quantization to NF4, one of the steps to convert from the original float number
-# to the index of the nearest value in the NF4 format. This can cause a large memory spike
-# Due to intermediates of the quantization process. Instead we process the original
-# tensor in chunks. This is a tradeoff between memory and speed. This number seems to
-# strike a good balance between memory and speed
-CHUNK_SIZE = 1024**2
+# Deprecated public constants, kept importable until external callers are migrated
+_DEPRECATED_CONSTANTS = {
+    # the quantization used to process the tensor in chunks of this many elements, it's not chunked anymore
+    "CHUNK_SIZE": 1024**2,
+}
+
+
+def __getattr__(name):
+    if name in _DEPRECATED_CONSTANTS:
+        warnings.warn(
+            f"torchao.dtypes.nf4tensor.{name} is deprecated and unused, it will be removed in a future release",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        return _DEPRECATED_CONSTANTS[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Byte alignment of the shards in the flat all-gather buffer, so the floating point quantization factors
+# can be viewed in place
+_FLAT_ALL_GATHER_ALIGNMENT = 8
 
 
 def same_metadata(a: "NF4Tensor", b: "NF4Tensor"):
@@ -75,6 +90,7 @@ def construct_nf4_args(nf4tensor: "NF4Tensor", kwargs: Optional[Dict[str, Any]]
         kwargs.get("scaler_mean", nf4tensor.scaler_mean),
         kwargs.get("quantized_data", nf4tensor.quantized_data),
         kwargs.get("nf4", nf4tensor.nf4),
+        kwargs.get("flat_all_gather", nf4tensor.flat_all_gather),
     )
 
 
@@ -307,6 +323,7 @@ def t_default(func, *args, **kwargs):
         a.scaler_mean,
         a.quantized_data,
         a.nf4,
+        a.flat_all_gather,
     )
     return b
 
@@ -420,6 +437,7 @@ class NF4Tensor(torch.Tensor):
         scaler_mean: torch.Tensor,
         quantized_data: torch.Tensor,
         nf4: torch.Tensor,
+        flat_all_gather: bool = False,
     ):
         """Create a new NF4Tensor object
         Args:
@@ -432,6 +450,10 @@ class NF4Tensor(torch.Tensor):
             scaler_mean: Mean of the scalers
             quantized_data: Quantized data represented as uint8 tensor
             nf4: NF4 tensor LUT for the quantization and dequantization
+            flat_all_gather: If True, `fsdp_pre_all_gather` packs the inner tensors of a shard into a single
+                uint8 tensor, so the all-gather inputs of all such NF4 parameters in an FSDP unit have the same
+                dtype and FSDP all-gathers them as one uint8 buffer, `fsdp_post_all_gather` then unpacks the
+                inner tensors as views of the all-gather output
 
         """
 
@@ -458,6 +480,7 @@ class NF4Tensor(torch.Tensor):
         scaler_mean: torch.Tensor,
         quantized_data: torch.Tensor,
         nf4: torch.Tensor,
+        flat_all_gather: bool = False,
     ):
         """Initialize the NF4Tensor class"""
         self.block_size = block_size
@@ -468,6 +491,7 @@ class NF4Tensor(torch.Tensor):
         self.scaler_mean = scaler_mean
         self.quantized_data = quantized_data
         self.nf4 = nf4
+        self.flat_all_gather = flat_all_gather
 
     @classmethod
     @torch.no_grad()
@@ -476,6 +500,7 @@ class NF4Tensor(torch.Tensor):
         inpt_tensor: torch.Tensor,
         block_size: int,
         scaler_block_size: int,
+        flat_all_gather: bool = False,
     ):
         assert inpt_tensor.dim() <= 2, f"expect input tensor dim <= 2 but got dim = {inpt_tensor.dim()}"
         assert (
@@ -538,6 +563,7 @@ class NF4Tensor(torch.Tensor):
             scaler_mean,
             quantized_data,
             nf4=nf4,
+            flat_all_gather=flat_all_gather,
         )
 
     @staticmethod
@@ -615,12 +641,13 @@ class NF4Tensor(torch.Tensor):
             scaler_block_size: Scaler block size to use for double quantization.
 
         """
-        assert inpt_tensor.dim() == 1, "Input tensor must be flattened"
         assert (
             inpt_tensor.numel() % scaler_block_size
         ) == 0, f"Input tensor must be divisible by block size, got {inpt_tensor.numel()} and {scaler_block_size}"
         n_scaler_blocks = inpt_tensor.numel() // scaler_block_size
-        inpt_tensor = inpt_tensor.view(n_scaler_blocks, scaler_block_size)
+        # reshape, the inner tensors unpacked from a flat all-gather are (world size, n) views
+        inpt_tensor = inpt_tensor.reshape(n_scaler_blocks, scaler_block_size)
+        quantization_factor = quantization_factor.reshape(n_scaler_blocks)
         dequantized = (inpt_tensor / quantization_factor.unsqueeze(-1)).flatten().to(
             self.dtype
         ) + self.scaler_mean
@@ -646,13 +673,7 @@ class NF4Tensor(torch.Tensor):
         scaled_blocks = blocks / scales
 
         # Returns a flattened tensor with each element quantized to nf4 index
-        # See Note: Quantize in Chunks
-        quantized_blocks = torch.empty(numel, dtype=torch.uint8, device=inpt_tensor.device)
-        flattened = scaled_blocks.flatten()
-        for chunk_num in range(math.ceil(numel / CHUNK_SIZE)):
-            start = chunk_num * CHUNK_SIZE
-            end = min(start + CHUNK_SIZE, numel)
-            quantized_blocks[start:end] = NF4Tensor.quantize_tensor_nearest(flattened[start:end], nf4).to(torch.uint8)
+        quantized_blocks = NF4Tensor.quantize_tensor_nearest(scaled_blocks.flatten(), nf4).to(torch.uint8)
 
         # Combine the quantized elements into uint8 values
         # This lays out two consecutive elements in the same byte
@@ -666,8 +687,8 @@ class NF4Tensor(torch.Tensor):
         """Get the original weight from the normalized float weight format"""
         # Since we are using uint8 we will decode 2 entries per byte
         # Shift elements down 4 and select out the bottom 4 bits
-        first_elements = (self.quantized_data >> 4).to(torch.long)
-        second_elements = (self.quantized_data & 0b1111).to(torch.long)
+        first_elements = (self.quantized_data >> 4).to(torch.long).flatten()
+        second_elements = (self.quantized_data & 0b1111).to(torch.long).flatten()
 
         # Dequantize every element
         dequantized_first = self.dequantize(first_elements, self.nf4)
@@ -690,16 +711,55 @@ class NF4Tensor(torch.Tensor):
         scaled_second = scaled_second.unsqueeze(-1).transpose(0, 1)
         return torch.stack([scaled_first, scaled_second], dim=-1).reshape(self.shape)
 
+    @staticmethod
+    def get_nf4_boundaries(nf4: torch.Tensor) -> torch.Tensor:
+        """Get the boundaries between consecutive nf4 values, such that a value v in nf4.dtype is
+        closest to nf4[i] iff boundaries[i - 1] < v <= boundaries[i]
+
+        Closest is defined as `(v - nf4).abs()` computed in nf4.dtype being the smallest, with ties
+        going to the lower index. Since the distances are rounded, the boundaries are within a few ulps
+        of the midpoints but not always at the midpoints.
+        """
+        lower, upper = nf4[:-1], nf4[1:]
+        mid = ((lower.double() + upper.double()) / 2).to(nf4.dtype)
+        # representable values around the midpoints, in increasing order
+        steps = 8
+        below, above = [mid], [mid]
+        for _ in range(steps):
+            below.append(torch.nextafter(below[-1], lower))
+            above.append(torch.nextafter(above[-1], upper))
+        candidates = torch.stack(below[::-1] + above[1:], dim=-1)
+        # whether each candidate is quantized to the lower value, this is monotonic
+        # (True then False) because rounding is monotonic
+        goes_to_lower = (candidates - lower.unsqueeze(-1)).abs() <= (candidates - upper.unsqueeze(-1)).abs()
+        assert goes_to_lower[:, 0].all() and not goes_to_lower[:, -1].any()
+        last_lower = goes_to_lower.sum(dim=-1, keepdim=True) - 1
+        return candidates.gather(-1, last_lower).squeeze(-1)
+
     @staticmethod
     def quantize_tensor_nearest(
         value: torch.Tensor, nf4: torch.Tensor
     ) -> torch.Tensor:
-        """Quantize a float16 tensor to nf4 format to nearest and not rounded up"""
-        value = value.unsqueeze(-1)  # (numel, 1)
-        # Compare the value tensor with the nf4 tensor element-wise
-        diff = (value - nf4).abs()
-        closest_nf4 = diff.min(dim=-1).indices
-        return closest_nf4
+        """Quantize a float16 tensor to nf4 format to nearest and not rounded up
+
+        Same result as taking the argmin of `(value.unsqueeze(-1) - nf4).abs()` but with a binary
+        search over the boundaries between the nf4 values instead of materializing the distances
+        to all 16 values.
+        """
+        boundaries = NF4Tensor.get_nf4_boundaries(nf4)
+
+        def bucketize(value):
+            closest_nf4 = torch.bucketize(value, boundaries, out_int32=True)
+            # nan is closest to the first value, for blocks with all zeros
+            return closest_nf4.masked_fill_(value.isnan(), 0)
+
+        if value.element_size() != 2 or not value.is_contiguous():
+            return bucketize(value)
+        # for 16 bit dtypes the results for all 2**16 bit patterns fit in a small lookup table,
+        # indexing it is faster than the binary search
+        bit_patterns = torch.arange(2**16, dtype=torch.int32, device=value.device)
+        table = bucketize(bit_patterns.to(torch.int16).view(value.dtype)).to(torch.uint8)
+        return table[value.view(torch.int16).to(torch.int32) & 0xFFFF]
 
     @staticmethod
     def dequantize(value: torch.Tensor, nf4: torch.Tensor) -> torch.Tensor:
@@ -727,6 +787,7 @@ class NF4Tensor(torch.Tensor):
             "n_blocks": self.n_blocks,
             "scaler_block_size": self.scaler_block_size,
             "tensor_meta": tensor_meta,
+            "flat_all_gather": self.flat_all_gather,
         }
         return [
             "quantized_data",
@@ -749,6 +810,7 @@ class NF4Tensor(torch.Tensor):
             inner_tensors["scaler_mean"],
             inner_tensors["quantized_data"],
             inner_tensors["nf4"],
+            metadata.get("flat_all_gather", False),
         )
 
     def __str__(self):
@@ -799,11 +861,25 @@ class NF4Tensor(torch.Tensor):
 
 
     def fsdp_pre_all_gather(self, mesh: DeviceMesh) -> Tuple[Tuple[torch.Tensor, ...], Any]:
-        return (
+        all_gather_inputs = (
             self.quantized_scalers,
             self.quantization_factor,
             self.quantized_data,
-        ), (
+        )
+        flat_layout = None
+        if self.flat_all_gather:
+            # [quantization_factor | quantized_scalers | quantized_data | padding], the quantization
+            # factors go first so they stay aligned in the all-gather output
+            byte_tensors = [
+                t.contiguous().view(torch.uint8)
+                for t in (self.quantization_factor, self.quantized_scalers, self.quantized_data)
+            ]
+            flat_layout = (self.quantization_factor.dtype, *(t.numel() for t in byte_tensors))
+            n_bytes = sum(t.numel() for t in byte_tensors)
+            padding = -n_bytes % _FLAT_ALL_GATHER_ALIGNMENT
+            byte_tensors.append(self.quantized_data.new_zeros(padding, dtype=torch.uint8))
+            all_gather_inputs = (torch.cat(byte_tensors),)
+        return all_gather_inputs, (
             SubclassTensorArgs(
                 self.size(),
                 self.stride(),
@@ -818,6 +894,7 @@ class NF4Tensor(torch.Tensor):
             self.scaler_mean,
             self.nf4,
             mesh.get_group().size(),
+            flat_layout,
         )
 
     def fsdp_post_all_gather(
@@ -828,10 +905,20 @@ class NF4Tensor(torch.Tensor):
         *,
         out: Optional[torch.Tensor] = None,
     ) -> Union[Tuple[torch.Tensor, Tuple[torch.Tensor, ...]], None]:
-        (quantized_scalers, quantization_factor, quantized_data) = all_gather_outputs
-        (tensor_meta, block_size, n_blocks, scaler_block_size, scaler_mean, nf4, pg_size) = metadata
+        (tensor_meta, block_size, n_blocks, scaler_block_size, scaler_mean, nf4, pg_size, flat_layout) = metadata
         if len(tensor_meta.original_shape) != 2:
             raise NotImplementedError(f"only support 2D shape but got dim={len(tensor_meta.original_shape)}")
+        if flat_layout is not None:
+            # the output holds the flat buffers of all ranks one after the other, the inner tensors
+            # are (world size, shard numel) views of it and are not copied
+            (flat_output,) = all_gather_outputs
+            factor_dtype, factor_bytes, scalers_bytes, data_bytes = flat_layout
+            rank_bytes = flat_output.view(pg_size, -1)
+            quantization_factor = rank_bytes[:, :factor_bytes].view(factor_dtype)
+            quantized_scalers = rank_bytes[:, factor_bytes : factor_bytes + scalers_bytes].view(torch.int8)
+            quantized_data = rank_bytes[:, factor_bytes + scalers_bytes : factor_bytes + scalers_bytes + data_bytes]
+        else:
+            (quantized_scalers, quantization_factor, quantized_data) = all_gather_outputs
         tensor_meta.original_shape = torch.Size((tensor_meta.original_shape[0] * pg_size, tensor_meta.original_shape[1]))
         if out is not None:
             # TODO: add param dtype for mixed precision
@@ -856,7 +943,8 @@ class NF4Tensor(torch.Tensor):
             scaler_mean,
             quantized_data,
             nf4,
-        ), (quantized_scalers, quantization_factor, quantized_data)
+            flat_all_gather=flat_layout is not None,
+        ), tuple(all_gather_outputs)
 
 
 class LinearNF4(torch.autograd.Function):
@@ -873,18 +961,168 @@ class LinearNF4(torch.autograd.Function):
         return grad_output @ weight.to(grad_output.dtype), None
 
 
-def linear_nf4(input: torch.Tensor, weight: NF4Tensor) -> torch.Tensor:
+def _get_tile_rows(weight: NF4Tensor, tile_rows: int) -> int:
+    """Round tile_rows up so that every tile starts at the start of a quantization block"""
+    k = weight.size(1)
+    rows_per_block = weight.block_size // math.gcd(k, weight.block_size)
+    return max(1, math.ceil(tile_rows / rows_per_block)) * rows_per_block
+
+
+def _dequantize_row_tiles(weight: NF4Tensor, dtype: torch.dtype, tile_rows: int):
+    """Yields (start, end, weight[start:end].to(dtype)) for the row tiles of a 2d NF4Tensor,
+    only a tile of the dequantized weight is alive at a time
+
+    The values are the same as the corresponding rows of `weight.get_original_weight()`
+    """
+    assert weight.dim() == 2, f"expect a 2d weight but got dim = {weight.dim()}"
+    n, k = weight.shape
+    tile_rows = _get_tile_rows(weight, tile_rows)
+    # these are n_blocks and 256 elements, small compared to the weight
+    scalers = weight.dequantize_scalers(
+        weight.quantized_scalers, weight.quantization_factor, weight.scaler_block_size
+    )
+    # the two nf4 values of each byte, high bits first
+    byte_values = torch.arange(256, device=weight.device)
+    byte_to_nf4 = torch.stack([weight.nf4[byte_values >> 4], weight.nf4[byte_values & 0b1111]], dim=-1)
+    quantized_data = weight.quantized_data.reshape(-1)
+    for start in range(0, n, tile_rows):
+        end = min(start + tile_rows, n)
+        data = quantized_data[start * k // 2 : end * k // 2]
+        tile_scalers = scalers[start * k // weight.block_size : end * k // weight.block_size]
+        dequantized = byte_to_nf4[data.to(torch.long)].view(-1, weight.block_size // 2, 2)
+        dequantized = dequantized * tile_scalers.view(-1, 1, 1)
+        yield start, end, dequantized.view(end - start, k).to(dtype)
+
+
+class LinearNF4Tiled(torch.autograd.Function):
+    @staticmethod
+    def forward(ctx, input: torch.Tensor, weight: NF4Tensor, tile_rows: int):
+        """Accumulate the output one tile of output features at a time"""
+        ctx.nf4_weight = weight
+        ctx.tile_rows = tile_rows
+        out = input.new_empty(*input.shape[:-1], weight.size(0))
+        for start, end, weight_tile in _dequantize_row_tiles(weight, input.dtype, tile_rows):
+            out[..., start:end] = F.linear(input, weight_tile)
+        return out
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        """The nf4 weight will never require grad so we only need grad_output @ weight, accumulated over the tiles"""
+        weight: NF4Tensor = ctx.nf4_weight
+        grad_output_2d = grad_output.reshape(-1, grad_output.size(-1))
+        # accumulate in float32 to not lose precision across the tiles with 16 bit dtypes
+        grad_input = grad_output_2d.new_zeros(grad_output_2d.size(0), weight.size(1), dtype=torch.float32)
+        for start, end, weight_tile in _dequantize_row_tiles(weight, grad_output.dtype, ctx.tile_rows):
+            grad_input += grad_output_2d[:, start:end] @ weight_tile
+        return grad_input.to(grad_output.dtype).view(*grad_output.shape[:-1], weight.size(1)), None, None
+
+
+def linear_nf4(input: torch.Tensor, weight: NF4Tensor, tile_rows: Optional[int] = None) -> torch.Tensor:
     """Apply a linear operation with the NF4Tensor weight
 
     Args:
         input: Input tensor
         weight: NF4Tensor weight
+        tile_rows: If set, the weight is dequantized `tile_rows` rows at a time in the forward and backward,
+            instead of all at once, this bounds the extra memory to a tile of the weight
     """
+    if tile_rows is not None:
+        return LinearNF4Tiled.apply(input, weight, tile_rows)
     return LinearNF4.apply(input, weight)
 
 
-def to_nf4(tensor, block_size: int = 64, scaler_block_size: int = 256):
-    return NF4Tensor.from_tensor(tensor, block_size, scaler_block_size)
+def to_nf4(tensor, block_size: int = 64, scaler_block_size: int = 256, flat_all_gather: bool = False):
+    return NF4Tensor.from_tensor(tensor, block_size, scaler_block_size, flat_all_gather)
+
+
+NF4_CHECKPOINT_VERSION = 1
+
+
+def save_nf4_checkpoint(state_dict: Dict[str, torch.Tensor], f) -> None:
+    """Save a state dict containing NF4Tensors without dequantizing them
+
+    Each NF4Tensor is stored as its inner tensors (quantized_data, quantized_scalers,
+    quantization_factor, scaler_mean, nf4) together with the metadata needed to rebuild it,
+    all other tensors are stored as is. Only types that can be loaded with `weights_only=True`
+    are written, so the checkpoint can be loaded with `load_nf4_checkpoint` without unpickling code
+
+    Args:
+        state_dict: Mapping from names to plain tensors or NF4Tensors
+        f: File name or file like object, same as `torch.save`
+    """
+    tensors = {}
+    nf4_tensors = {}
+    for name, tensor in state_dict.items():
+        if isinstance(tensor, NF4Tensor):
+            nf4_tensors[name] = {
+                "quantized_data": tensor.quantized_data,
+                "quantized_scalers": tensor.quantized_scalers,
+                "quantization_factor": tensor.quantization_factor,
+                "scaler_mean": tensor.scaler_mean,
+                "nf4": tensor.nf4,
+                "block_size": tensor.block_size,
+                "n_blocks": tensor.n_blocks,
+                "scaler_block_size": tensor.scaler_block_size,
+                "shape": list(tensor.shape),
+                "stride": list(tensor.stride()),
+                "storage_offset": tensor.storage_offset(),
+                "dtype": tensor.dtype,
+                "requires_grad": tensor.requires_grad,
+                "flat_all_gather": tensor.flat_all_gather,
+            }
+        else:
+            tensors[name] = tensor
+    torch.save(
+        {
+            "nf4_checkpoint_version": NF4_CHECKPOINT_VERSION,
+            "tensors": tensors,
+            "nf4_tensors": nf4_tensors,
+        },
+        f,
+    )
+
+
+def load_nf4_checkpoint(f, mmap: bool = True) -> Dict[str, torch.Tensor]:
+    """Load a state dict saved with `save_nf4_checkpoint`
+
+    With `mmap=True` the file is memory mapped and the inner tensors of the returned NF4Tensors
+    are views of the mapped file, nothing is read or requantized until the data is used, and
+    the (read only) pages are shared by all the processes that map the same file.
+    Use `model.load_state_dict(state_dict, assign=True)` to keep the parameters backed by the file
+
+    Args:
+        f: File name, mmap requires a file name
+        mmap: Whether to memory map the file instead of reading it into memory
+    """
+    checkpoint = torch.load(f, mmap=mmap, weights_only=True, map_location="cpu")
+    version = checkpoint.get("nf4_checkpoint_version")
+    if version != NF4_CHECKPOINT_VERSION:
+        raise ValueError(
+            f"Unsupported NF4 checkpoint version {version}, expected {NF4_CHECKPOINT_VERSION}"
+        )
+    state_dict = dict(checkpoint["tensors"])
+    for name, entry in checkpoint["nf4_tensors"].items():
+        tensor_meta = SubclassTensorArgs(
+            torch.Size(entry["shape"]),
+            tuple(entry["stride"]),
+            entry["storage_offset"],
+            entry["dtype"],
+            entry["quantized_data"].device,
+            entry["requires_grad"],
+        )
+        state_dict[name] = NF4Tensor(
+            tensor_meta,
+            entry["block_size"],
+            entry["n_blocks"],
+            entry["scaler_block_size"],
+            entry["quantized_scalers"],
+            entry["quantization_factor"],
+            entry["scaler_mean"],
+            entry["quantized_data"],
+            entry["nf4"],
+            entry.get("flat_all_gather", False),
+        )
+    return state_dict
 
 
 NF4_TORCH_FUNCTIONS = {}
@@ -0,0 +1,96 @@
+"""
+Helpers shared by the layouts in `torchao.dtypes`
+"""
+import functools
+from typing import List, Optional, Tuple
+
+import torch
+
+
+def pack_bits(data: torch.Tensor, nbits: int, dim: int = -1) -> torch.Tensor:
+    """
+    Packs `nbits` bit elements (1 <= nbits <= 7) densely into uint8 along `dim`, elements
+    can span two bytes when nbits doesn't divide 8 (e.g. 3, 5, 6 and 7 bits).
+    The first element takes the most significant bits, so for nbits in (1, 2, 4) this is the
+    same layout as `pack(data, 8, nbits, by_rows=False)`.
+
+    Every 8 elements are packed into `nbits` bytes, `dim` is padded with zeros to a multiple of 8.
+    Works on any device and with torch.compile, there are no per element python loops.
+
+    Inputs:
+    data: torch.Tensor - an integer tensor with values in [0, 2**nbits).
+    nbits: int - the size of the elements in bits.
+
+    optional:
+    dim: int - the dimension to pack along: tensor(..., n, ...) -> tensor(..., ceil(n / 8) * nbits, ...)
+
+    Returns: torch.Tensor - a uint8 tensor of packed elements.
+    """
+    assert 1 <= nbits <= 7, f"nbits must be between 1 and 7, got {nbits}"
+    data = data.movedim(dim, -1).to(torch.uint8)
+    size = data.shape[-1]
+    padding = -size % 8
+    if padding:
+        data = torch.nn.functional.pad(data, (0, padding))
+    # each group of 8 elements is packed into nbits bytes, every byte is the bitwise or of the (at most 3)
+    # elements that overlap it, shifted into place, the bits shifted out of the uint8 belong to other bytes
+    groups = data.reshape(*data.shape[:-1], -1, 8)
+    packed_bytes = []
+    for byte, overlaps in enumerate(_bit_overlaps(nbits)):
+        packed_byte = None
+        for element, shift in overlaps:
+            shifted = groups[..., element] << shift if shift >= 0 else groups[..., element] >> -shift
+            packed_byte = shifted if packed_byte is None else packed_byte | shifted
+        packed_bytes.append(packed_byte)
+    packed = torch.stack(packed_bytes, dim=-1)
+    return packed.view(*data.shape[:-1], -1).movedim(-1, dim)
+
+
+def unpack_bits(data: torch.Tensor, nbits: int, size: Optional[int] = None, dim: int = -1) -> torch.Tensor:
+    """
+    Unpacks `nbits` bit elements from a uint8 tensor packed with `pack_bits`.
+
+    Inputs:
+    data: torch.Tensor - a uint8 tensor of packed elements.
+    nbits: int - the size of the elements in bits.
+
+    optional:
+    size: int - the number of elements along `dim` before packing, the padding is removed,
+        defaults to all the packed elements (a multiple of 8)
+    dim: int - the dimension to unpack along: tensor(..., n * nbits, ...) -> tensor(..., size, ...)
+
+    Returns: torch.Tensor - a uint8 tensor of the unpacked elements.
+    """
+    assert 1 <= nbits <= 7, f"nbits must be between 1 and 7, got {nbits}"
+    assert data.dtype == torch.uint8, f"expect packed uint8 data but got {data.dtype}"
+    data = data.movedim(dim, -1)
+    assert data.shape[-1] % nbits == 0, f"packed size {data.shape[-1]} must be a multiple of nbits ({nbits})"
+    groups = data.reshape(*data.shape[:-1], -1, nbits)
+    # the inverse of `pack_bits`, every element is the bitwise or of the (at most 2) bytes that overlap it,
+    # shifted into place, and the bits of the neighbouring elements are masked out
+    elements = [None] * 8
+    for byte, overlaps in enumerate(_bit_overlaps(nbits)):
+        for element, shift in overlaps:
+            shifted = groups[..., byte] >> shift if shift >= 0 else groups[..., byte] << -shift
+            elements[element] = shifted if elements[element] is None else elements[element] | shifted
+    nbits_mask = (1 << nbits) - 1
+    unpacked = torch.stack(elements, dim=-1) & nbits_mask
+    unpacked = unpacked.view(*data.shape[:-1], -1)
+    if size is not None:
+        unpacked = unpacked[..., :size]
+    return unpacked.movedim(-1, dim)
+
+
+@functools.lru_cache
+def _bit_overlaps(nbits: int) -> List[List[Tuple[int, int]]]:
+    # for each of the nbits bytes of a group of 8 elements, the (element, left shift from element to byte)
+    # of the elements that overlap it, the elements are laid out most significant bit first
+    overlaps = []
+    for byte in range(nbits):
+        byte_overlaps = []
+        for element in range(8):
+            start, end = element * nbits, (element + 1) * nbits
+            if start < 8 * (byte + 1) and end > 8 * byte:
+                byte_overlaps.append((element, 8 * (byte + 1) - end))
+        overlaps.append(byte_overlaps)
+    return overlaps
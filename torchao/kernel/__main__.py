@@ -0,0 +1,3 @@
+from torchao.kernel.config_store import main
+
+main()
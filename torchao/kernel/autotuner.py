@@ -1,3 +1,5 @@
+import importlib.resources
+import json
 import logging
 import os
 import pathlib
@@ -6,7 +8,12 @@ import pickle
 import torch
 import triton
 
+from torchao.kernel.autotuner_search import get_search_strategy
+from torchao.kernel.config_store import ConfigStore, default_store_path
+
 AUTOTUNER_DATA_PATH = os.getenv("TORCHAO_AUTOTUNER_DATA_PATH", None)
+# one of torchao.kernel.autotuner_search.SEARCH_STRATEGIES
+AUTOTUNER_SEARCH = os.getenv("TORCHAO_AUTOTUNER_SEARCH", "exhaustive")
 
 
 def do_bench_triton(
@@ -96,43 +103,88 @@ def do_bench_triton(
     return getattr(torch, return_mode)(times).item()
 
 
+# the merged records of the config store, see `torchao.kernel.config_store`
 BEST_CONFIGS = None
+# configs of older torchao versions, pickled dicts from `get_args_key` to (config, time)
+LEGACY_CONFIGS = None
+# store key -> config, the configs already looked up or tuned in this process
+_CONFIG_CACHE = {}
 
 
-def _save_best_configs(best_configs):
-    device_name = torch.cuda.get_device_name()
-    if AUTOTUNER_DATA_PATH is None:
-        saved_configs = pathlib.Path.cwd() / "data.pkl"
+def _get_store_and_legacy_paths():
+    if AUTOTUNER_DATA_PATH is not None and not AUTOTUNER_DATA_PATH.endswith(".pkl"):
+        store_path = pathlib.Path(AUTOTUNER_DATA_PATH)
     else:
-        saved_configs = pathlib.Path(AUTOTUNER_DATA_PATH)
-    logging.info(
-        f"Trying to store configs for {device_name} locally under {saved_configs}"
-    )
-    with open(saved_configs, "wb") as f:
-        import pickle
+        store_path = default_store_path()
+    if AUTOTUNER_DATA_PATH is not None and AUTOTUNER_DATA_PATH.endswith(".pkl"):
+        legacy_path = pathlib.Path(AUTOTUNER_DATA_PATH)
+    else:
+        legacy_path = importlib.resources.files("torchao") / "kernel" / "configs" / "data_a100.pkl"
+    return store_path, legacy_path
 
-        logging.info(f"Saving best configs to file {saved_configs}")
-        pickle.dump(best_configs, f)
 
+def _get_store():
+    return ConfigStore(_get_store_and_legacy_paths()[0])
 
-def _load_best_configs():
+
+def _load_legacy_configs():
     device_name = torch.cuda.get_device_name()
-    import importlib
+    legacy_path = _get_store_and_legacy_paths()[1]
+    if legacy_path.name == "data_a100.pkl" and not device_name.startswith("NVIDIA A100"):
+        logging.info("Warning! Loaded configurations are optimized for A100!")
+    logging.info(f"Trying to load configs for {device_name} from {legacy_path}")
+    if legacy_path.is_file():
+        with open(legacy_path, "rb") as f:
+            logging.info(f"Loading best configs from file {legacy_path}")
+            return pickle.load(f)
 
-    if AUTOTUNER_DATA_PATH is None:
-        saved_configs = importlib.resources.files("torchao")
-        saved_configs = saved_configs / "kernel" / "configs" / "data_a100.pkl"
-        if not device_name.startswith("NVIDIA A100"):
-            logging.info("Warning! Loaded configurations are optimized for A100!")
-    else:
-        saved_configs = pathlib.Path(AUTOTUNER_DATA_PATH)
-    logging.info(f"Trying to load configs for {device_name} from {saved_configs}")
-    if saved_configs.is_file():
-        import pickle
 
-        with open(saved_configs, "rb") as f:
-            logging.info(f"Loading best configs from file {saved_configs}")
-            return pickle.load(f)
+def _load_best_configs():
+    store = _get_store()
+    logging.info(f"Loading best configs from {store.path}")
+    return store.load()
+
+
+def _save_best_config(record):
+    store = _get_store()
+    logging.info(f"Saving best config for {record['kernel']} on {record['device']} to {store.path}")
+    # merge the results of other processes tuning concurrently
+    return store.append([record])
+
+
+def get_kernel_key(fn):
+    return f"{fn.__module__}.{fn.__qualname__}"
+
+
+def get_store_args_key(args):
+    def arg_key(a):
+        if torch.is_tensor(a):
+            return [str(a.dtype), list(a.size()), list(a.stride())]
+        return a if isinstance(a, (bool, int, float, str)) or a is None else repr(a)
+
+    return json.dumps([arg_key(a) for a in args])
+
+
+def get_store_key(fn, args):
+    device = next((a.device for a in args if torch.is_tensor(a)), None)
+    device_name = torch.cuda.get_device_name(device) if device is not None and device.type == "cuda" else "cpu"
+    return (get_kernel_key(fn), get_store_args_key(args), device_name, torch.__version__, triton.__version__)
+
+
+def config_to_dict(config):
+    return {
+        "kwargs": config.kwargs,
+        "num_warps": config.num_warps,
+        "num_stages": config.num_stages,
+        "num_ctas": getattr(config, "num_ctas", 1),
+    }
+
+
+def config_from_dict(d):
+    kwargs = {"num_warps": d["num_warps"], "num_stages": d["num_stages"]}
+    if d.get("num_ctas", 1) != 1:
+        kwargs["num_ctas"] = d["num_ctas"]
+    return triton.Config(d["kwargs"], **kwargs)
 
 
 def get_arg_key(a):
@@ -163,6 +215,43 @@ def do_bench_basic(fn, rep):
     return estimate_ms
 
 
+def do_bench_quick(fn, args, config, rep):
+    # mean time of rep runs, inf if the config crashes
+    def wrapped_fn():
+        return fn(*(args + [config]))
+
+    try:
+        return do_bench_basic(wrapped_fn, rep)
+    except RuntimeError as e:
+        return float("inf")
+    except triton.runtime.OutOfResources:
+        return float("inf")
+
+
+class _Tuner:
+    # the benchmark functions of a kernel and its arguments used by the search strategies
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+
+    def bench(self, config, best_time=None):
+        return do_bench(self.fn, self.args, config, best_time)
+
+    def bench_quick(self, config, rep):
+        return do_bench_quick(self.fn, self.args, config, rep)
+
+
+def search_best_config(fn, args, configs, search=None, tuned_records=()):
+    """
+    Searches the best config of `fn` for `args` with the `search` strategy (defaults to
+    TORCHAO_AUTOTUNER_SEARCH), see `torchao.kernel.autotuner_search`. Returns (config, time).
+    """
+    search = search if search is not None else AUTOTUNER_SEARCH
+    key = get_store_key(fn, args)
+    logging.info(f"Starting {search} autotune search for key {key}.")
+    return get_search_strategy(search)(_Tuner(fn, args), configs, key, list(tuned_records))
+
+
 def do_bench(fn, args, config, best_time=None):
     # TODO: CUDA graph compatible version
     def wrapped_fn():
@@ -171,13 +260,8 @@ def do_bench(fn, args, config, best_time=None):
     # Get fast estimate to abort stupid configs
 
     # Run it once and skip if it crashes or is 100x slower
-    try:
-        time = do_bench_basic(wrapped_fn, 1)
-    except RuntimeError as e:
-        time = None
-    except triton.runtime.OutOfResources:
-        time = None
-    if time is None or (best_time is not None and time > best_time * 100):
+    time = do_bench_quick(fn, args, config, 1)
+    if best_time is not None and time > best_time * 100:
         return float("inf")
 
     # Run it five times and skip if it is 10x slower
@@ -190,49 +274,50 @@ def do_bench(fn, args, config, best_time=None):
 
 
 def get_best_config_by_key(key):
+    """
+    Returns the best known config for a store key, only configs tuned with the same torch and
+    triton versions are used, configs of other versions only seed the search (see the
+    `nearest_shape` strategy).
+    """
     if key in BEST_CONFIGS:
-        return BEST_CONFIGS[key][0]
+        return config_from_dict(BEST_CONFIGS[key]["config"])
 
 
-def get_best_config_fn(fn, args, configs):
-    global BEST_CONFIGS
-    if BEST_CONFIGS is None:
-        BEST_CONFIGS = _load_best_configs()
+def get_best_config_fn(fn, args, configs, search=None):
+    global BEST_CONFIGS, LEGACY_CONFIGS
+    key = get_store_key(fn, args)
+    if key in _CONFIG_CACHE:
+        return _CONFIG_CACHE[key]
 
-    # This means no config file was loaded
     if BEST_CONFIGS is None:
-        BEST_CONFIGS = {}
+        BEST_CONFIGS = _load_best_configs()
+    if LEGACY_CONFIGS is None:
+        # This means no legacy config file was loaded
+        LEGACY_CONFIGS = _load_legacy_configs() or {}
 
     if len(configs) == 0:
         return None
 
-    key = get_args_key(args)
     best_config = get_best_config_by_key(key)
+    args_key = get_args_key(args)
+    if best_config is None and args_key in LEGACY_CONFIGS:
+        best_config = LEGACY_CONFIGS[args_key][0]
     if best_config is not None:
+        _CONFIG_CACHE[key] = best_config
         return best_config
 
     logging.info(f"Starting autotune search. No config found for key {key}.")
 
     # Search for the best config
-    best_config = configs[0]
-    best_time = do_bench(fn, args, configs[0])
-    logging.info(" ".join(map(str, [key, best_time, best_config])))
-    i = 1
-    # TODO: Instead of walking this in order, a random selection
-    # is maybe better to end up with a reasonable config that can be
-    # used to filter bad configs sooner.
-    for config in configs[1:]:
-        time = do_bench(fn, args, config, best_time)
-        logging.info(
-            " ".join([f"{i:4d}/{len(configs):4d}", f"{time:6.3f}", str(config)])
-        )
-        if time < best_time:
-            best_time = time
-            best_config = config
-        i += 1
+    best_config, best_time = search_best_config(fn, args, configs, search, BEST_CONFIGS.values())
     # Also store time, so it can be proven that the config works
-    BEST_CONFIGS[key] = (best_config, best_time)
+    record = dict(
+        zip(("kernel", "args", "device", "torch", "triton"), key),
+        config=config_to_dict(best_config),
+        time=best_time,
+    )
     logging.info("-- perfetto --")
     logging.info(" ".join(map(str, [best_time, best_config])))
-    _save_best_configs(BEST_CONFIGS)
+    BEST_CONFIGS = _save_best_config(record)
+    _CONFIG_CACHE[key] = best_config
     return best_config
@@ -0,0 +1,215 @@
+"""
+Search strategies for the autotuner in `torchao.kernel.autotuner`.
+
+A strategy is called as `strategy(tuner, configs, key, tuned_records)` and returns the best
+(config, time) it found, where
+
+- `tuner.bench(config, best_time=None)` is `autotuner.do_bench`, it returns inf for configs that
+  crash, or are 100x slower than `best_time` on one run, or 10x slower on five runs, before
+  doing a full benchmark
+- `tuner.bench_quick(config, rep)` is the mean time of `rep` runs (inf for configs that crash)
+- `key` is the config store key of the kernel and arguments being tuned
+- `tuned_records` are the config store records of already tuned keys
+
+New strategies are added with `register_search_strategy`.
+"""
+import json
+import logging
+import math
+import random
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SEARCH_STRATEGIES: Dict[str, Callable] = {}
+
+
+def register_search_strategy(name: str):
+    def decorator(strategy):
+        SEARCH_STRATEGIES[name] = strategy
+        return strategy
+
+    return decorator
+
+
+def get_search_strategy(name: str) -> Callable:
+    if name not in SEARCH_STRATEGIES:
+        raise ValueError(f"Unknown search strategy {name}, expected one of {list(SEARCH_STRATEGIES)}")
+    return SEARCH_STRATEGIES[name]
+
+
+def config_params(config) -> Tuple:
+    """
+    The tunable parameters of a triton.Config as a hashable tuple.
+    """
+    return tuple(sorted(config.kwargs.items())) + (
+        ("num_warps", config.num_warps),
+        ("num_stages", config.num_stages),
+    )
+
+
+def _neighbors(configs: List[Any]) -> List[List[int]]:
+    # the configs that differ from each config in exactly one parameter
+    params = [config_params(c) for c in configs]
+    groups = defaultdict(list)
+    for i, p in enumerate(params):
+        for d in range(len(p)):
+            groups[(d, p[:d] + p[d + 1:])].append(i)
+    neighbors = [[] for _ in configs]
+    for i, p in enumerate(params):
+        for d in range(len(p)):
+            neighbors[i].extend(j for j in groups[(d, p[:d] + p[d + 1:])] if j != i)
+    return neighbors
+
+
+class _Search:
+    # keeps track of the benchmarked configs and of the best one
+    def __init__(self, tuner, configs):
+        self.tuner = tuner
+        self.configs = configs
+        self.times: Dict[int, float] = {}
+        self.best_index: Optional[int] = None
+        self.best_time = float("inf")
+
+    def evaluate(self, i: int) -> float:
+        if i not in self.times:
+            best_time = self.best_time if self.best_index is not None else None
+            time = self.tuner.bench(self.configs[i], best_time)
+            self.times[i] = time
+            logging.info(f"{len(self.times):4d}/{len(self.configs):4d} {time:6.3f} {self.configs[i]}")
+            if self.best_index is None or time < self.best_time:
+                self.best_index, self.best_time = i, time
+        return self.times[i]
+
+    def hill_climb(self, start: int, neighbors: List[List[int]], rng: random.Random) -> int:
+        # first improvement local search over the configs that differ in one parameter
+        current = start
+        self.evaluate(current)
+        improved = True
+        while improved:
+            improved = False
+            candidates = list(neighbors[current])
+            rng.shuffle(candidates)
+            for j in candidates:
+                if self.evaluate(j) < self.times[current]:
+                    current = j
+                    improved = True
+                    break
+        return current
+
+    def result(self):
+        return self.configs[self.best_index], self.best_time
+
+
+@register_search_strategy("exhaustive")
+def exhaustive_search(tuner, configs, key, tuned_records):
+    """
+    Benchmarks every config in order.
+    """
+    search = _Search(tuner, configs)
+    for i in range(len(configs)):
+        search.evaluate(i)
+    return search.result()
+
+
+@register_search_strategy("successive_halving")
+def successive_halving_search(tuner, configs, key, tuned_records, eta: int = 4):
+    """
+    Benchmarks every config with one run and keeps the fastest 1 / eta of them (dropping the
+    configs that crash or are 100x slower than the fastest), benchmarks those with five runs and
+    keeps the fastest 1 / eta (dropping the ones 10x slower), and does a full benchmark of the rest.
+    """
+    candidates = list(range(len(configs)))
+    for rep, abort_ratio in [(1, 100), (5, 10)]:
+        times = {i: tuner.bench_quick(configs[i], rep) for i in candidates}
+        fastest = min(times.values())
+        if math.isinf(fastest):
+            # every config crashed
+            return configs[0], fastest
+        candidates = sorted((i for i in candidates if times[i] <= fastest * abort_ratio), key=times.__getitem__)
+        candidates = candidates[:max(1, math.ceil(len(candidates) / eta))]
+        logging.info(f"{len(candidates)} configs left after benchmarking with {rep} runs")
+
+    search = _Search(tuner, configs)
+    for i in candidates:
+        search.evaluate(i)
+    return search.result()
+
+
+@register_search_strategy("random_restart")
+def random_restart_search(tuner, configs, key, tuned_records, restarts: int = 4):
+    """
+    Local search over the configs that differ in one parameter, from `restarts` random configs.
+    The best config found so far is the reference of the abort thresholds of `tuner.bench`,
+    so bad neighbors and restarts are pruned after one or five runs.
+    """
+    rng = random.Random(str(key))
+    neighbors = _neighbors(configs)
+    search = _Search(tuner, configs)
+    for _ in range(restarts):
+        unvisited = [i for i in range(len(configs)) if i not in search.times]
+        if not unvisited:
+            break
+        start = rng.choice(unvisited)
+        # restarts from configs that were aborted by the thresholds are pruned
+        if search.best_index is not None and math.isinf(search.evaluate(start)):
+            continue
+        search.hill_climb(start, neighbors, rng)
+    return search.result()
+
+
+def _shape_distance(args_a, args_b) -> float:
+    # sum of the log2 ratios of the sizes, inf for arguments with different dtypes or ranks
+    if len(args_a) != len(args_b):
+        return float("inf")
+    distance = 0.0
+    for a, b in zip(args_a, args_b):
+        if isinstance(a, list) and isinstance(b, list):
+            (dtype_a, size_a, _), (dtype_b, size_b, _) = a, b
+            if dtype_a != dtype_b or len(size_a) != len(size_b):
+                return float("inf")
+            distance += sum(abs(math.log2(max(x, 1)) - math.log2(max(y, 1))) for x, y in zip(size_a, size_b))
+        elif a != b:
+            return float("inf")
+    return distance
+
+
+@register_search_strategy("nearest_shape")
+def nearest_shape_search(tuner, configs, key, tuned_records, k: int = 4, fallback: str = "successive_halving"):
+    """
+    Warm start from the best configs of the `k` nearest already tuned shapes of the same kernel
+    and device: benchmarks them, and runs a local search from the fastest one. Records of the
+    same shapes tuned with other torch or triton versions are the nearest. Uses the `fallback`
+    strategy if there are no tuned shapes.
+    """
+    kernel, args, device = key[:3]
+    args = json.loads(args)
+    distances = []
+    for record in tuned_records:
+        record_key = (record["kernel"], record["args"], record["device"], record.get("torch"), record.get("triton"))
+        if record_key[0] == kernel and record_key[2] == device and record_key != tuple(key):
+            distance = _shape_distance(args, json.loads(record["args"]))
+            if not math.isinf(distance):
+                distances.append((distance, record))
+    distances.sort(key=lambda d: d[0])
+
+    index = {config_params(c): i for i, c in enumerate(configs)}
+    seeds = []
+    for _, record in distances:
+        config = record["config"]
+        params = tuple(sorted(config["kwargs"].items())) + (
+            ("num_warps", config["num_warps"]),
+            ("num_stages", config["num_stages"]),
+        )
+        if params in index and index[params] not in seeds:
+            seeds.append(index[params])
+        if len(seeds) == k:
+            break
+    if not seeds:
+        logging.info(f"No tuned shapes near {key}, using {fallback} search")
+        return get_search_strategy(fallback)(tuner, configs, key, tuned_records)
+
+    search = _Search(tuner, configs)
+    for i in seeds:
+        search.evaluate(i)
+    search.hill_climb(search.best_index, _neighbors(configs), random.Random(str(key)))
+    return search.result()
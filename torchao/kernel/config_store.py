@@ -0,0 +1,230 @@
+"""
+Persistent store for the configs found by the autotuner in `torchao.kernel.autotuner`.
+
+The store is an append-only JSON lines file, every line is one tuning result:
+
+    {"version": 1, "kernel": ..., "args": ..., "device": ..., "torch": ..., "triton": ...,
+     "config": {"kwargs": ..., "num_warps": ..., "num_stages": ...}, "time": ...}
+
+Writers take an exclusive lock on `<path>.lock` (`fcntl.flock`, where available) and only append,
+so concurrent processes never clobber each other's results. Readers take a shared lock and merge
+all the lines, keeping the fastest config for every key. `prune` rewrites the file with the merged
+records under the exclusive lock.
+
+`main` is the CLI to inspect, prune and ship tuned configs:
+
+    python -m torchao.kernel show
+    python -m torchao.kernel prune --device "NVIDIA A100-SXM4-80GB" --torch 2.4.0
+    python -m torchao.kernel export shipped.jsonl --device "NVIDIA A100-SXM4-80GB"
+    python -m torchao.kernel import other_machine.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import pathlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from torchao.utils import atomic_write, file_lock
+
+STORE_VERSION = 1
+
+# kernel, args, device, torch version, triton version
+StoreKey = Tuple[str, str, str, str, str]
+
+
+def default_store_path() -> pathlib.Path:
+    cache_dir = os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return pathlib.Path(cache_dir) / "torchao" / "autotuner_configs.jsonl"
+
+
+def record_key(record: Dict[str, Any]) -> StoreKey:
+    return (record["kernel"], record["args"], record["device"], record["torch"], record["triton"])
+
+
+def merge_records(records: Iterable[Dict[str, Any]]) -> Dict[StoreKey, Dict[str, Any]]:
+    """
+    Merges tuning results for the same key, keeping the fastest one.
+    """
+    merged = {}
+    for record in records:
+        key = record_key(record)
+        if key not in merged or record["time"] < merged[key]["time"]:
+            merged[key] = record
+    return merged
+
+
+class ConfigStore:
+    """
+    Append-only JSON lines store of autotuner results, see the module docstring.
+    """
+
+    def __init__(self, path: Optional[os.PathLike] = None):
+        self.path = pathlib.Path(path) if path is not None else default_store_path()
+
+    def _lock(self, exclusive: bool):
+        return file_lock(self.path, exclusive)
+
+    def _read_unlocked(self) -> List[Dict[str, Any]]:
+        if not self.path.is_file():
+            return []
+        records = []
+        with open(self.path) as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # e.g. a line cut short by a process that was killed while writing
+                    logging.warning(f"Skipping malformed line {line_number} of {self.path}")
+                    continue
+                if record.get("version") != STORE_VERSION:
+                    logging.warning(
+                        f"Skipping line {line_number} of {self.path} with version {record.get('version')}, "
+                        f"expected {STORE_VERSION}"
+                    )
+                    continue
+                records.append(record)
+        return records
+
+    def read(self) -> List[Dict[str, Any]]:
+        """
+        Returns all the records in the store, in the order they were written.
+        """
+        with self._lock(exclusive=False):
+            return self._read_unlocked()
+
+    def load(self) -> Dict[StoreKey, Dict[str, Any]]:
+        """
+        Returns the fastest record for every key in the store.
+        """
+        return merge_records(self.read())
+
+    def append(self, records: Iterable[Dict[str, Any]]) -> Dict[StoreKey, Dict[str, Any]]:
+        """
+        Appends `records` and returns the merged records of the store, including the ones
+        written by other processes since the last read.
+        """
+        records = [dict(record, version=STORE_VERSION) for record in records]
+        lines = "".join(json.dumps(record, sort_keys=True) + "\n" for record in records)
+        with self._lock(exclusive=True):
+            existing = self._read_unlocked()
+            with open(self.path, "a") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+        return merge_records(existing + records)
+
+    def rewrite(self, records: Iterable[Dict[str, Any]]):
+        """
+        Replaces the content of the store with `records`, atomically.
+        """
+        with self._lock(exclusive=True):
+            self._write_unlocked(records)
+
+    def _write_unlocked(self, records: Iterable[Dict[str, Any]]):
+        with atomic_write(self.path) as f:
+            for record in records:
+                f.write(json.dumps(dict(record, version=STORE_VERSION), sort_keys=True) + "\n")
+
+    def prune(
+        self,
+        kernel: Optional[str] = None,
+        device: Optional[str] = None,
+        torch_version: Optional[str] = None,
+        triton_version: Optional[str] = None,
+    ) -> Tuple[int, int]:
+        """
+        Compacts the store to the fastest record for every key and drops the records that don't
+        match the given kernel, device, torch and triton versions. Returns the number of records
+        before and after pruning.
+        """
+        with self._lock(exclusive=True):
+            records = self._read_unlocked()
+            kept = [
+                record
+                for record in merge_records(records).values()
+                if _matches(record, kernel, device, torch_version, triton_version)
+            ]
+            self._write_unlocked(kept)
+        return len(records), len(kept)
+
+
+def _matches(
+    record: Dict[str, Any],
+    kernel: Optional[str] = None,
+    device: Optional[str] = None,
+    torch_version: Optional[str] = None,
+    triton_version: Optional[str] = None,
+) -> bool:
+    return (
+        (kernel is None or record["kernel"] == kernel)
+        and (device is None or record["device"] == device)
+        and (torch_version is None or record["torch"] == torch_version)
+        and (triton_version is None or record["triton"] == triton_version)
+    )
+
+
+def _add_filter_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--kernel", type=str, default=None)
+    parser.add_argument("--device", type=str, default=None)
+    parser.add_argument("--torch", type=str, default=None, dest="torch_version")
+    parser.add_argument("--triton", type=str, default=None, dest="triton_version")
+
+
+def _filter_kwargs(args: argparse.Namespace) -> Dict[str, Optional[str]]:
+    return {
+        "kernel": args.kernel,
+        "device": args.device,
+        "torch_version": args.torch_version,
+        "triton_version": args.triton_version,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="inspect, prune and ship torchao autotuner configs")
+    parser.add_argument(
+        "--path",
+        type=str,
+        default=None,
+        help=f"the config store, defaults to TORCHAO_AUTOTUNER_DATA_PATH (unless it's a .pkl) or {default_store_path()}",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    show_parser = subparsers.add_parser("show", help="print the fastest config for every key")
+    _add_filter_args(show_parser)
+    prune_parser = subparsers.add_parser(
+        "prune", help="keep the fastest config for every key, and only the keys matching the filters"
+    )
+    _add_filter_args(prune_parser)
+    export_parser = subparsers.add_parser("export", help="write the merged configs matching the filters to a new store")
+    export_parser.add_argument("output", type=str)
+    _add_filter_args(export_parser)
+    import_parser = subparsers.add_parser("import", help="merge the configs of another store into this one")
+    import_parser.add_argument("input", type=str)
+    args = parser.parse_args(argv)
+
+    path = args.path
+    if path is None and not os.getenv("TORCHAO_AUTOTUNER_DATA_PATH", ".pkl").endswith(".pkl"):
+        path = os.getenv("TORCHAO_AUTOTUNER_DATA_PATH")
+    store = ConfigStore(path)
+    if args.command == "show":
+        for record in store.load().values():
+            if _matches(record, **_filter_kwargs(args)):
+                print(
+                    f"{record['kernel']} | {record['device']} | torch {record['torch']} | "
+                    f"triton {record['triton']} | {record['time']:.4f} ms | {record['args']} | "
+                    f"{json.dumps(record['config'], sort_keys=True)}"
+                )
+    elif args.command == "prune":
+        before, after = store.prune(**_filter_kwargs(args))
+        print(f"Pruned {store.path} from {before} to {after} records")
+    elif args.command == "export":
+        records = [r for r in store.load().values() if _matches(r, **_filter_kwargs(args))]
+        ConfigStore(args.output).rewrite(records)
+        print(f"Exported {len(records)} records to {args.output}")
+    elif args.command == "import":
+        records = ConfigStore(args.input).read()
+        store.append(records)
+        print(f"Imported {len(records)} records into {store.path}")
@@ -2,7 +2,7 @@ import itertools
 import os
 import torch
 
-from torchao.quantization.utils import TORCH_VERSION_AFTER_2_2
+from torchao.quantization.utils import TORCH_VERSION_AFTER_2_2, TORCH_VERSION_AFTER_2_4
 
 try:
     # Only works for torch2.2 or newer.
@@ -16,6 +16,36 @@ except ImportError:
 
 AUTOTUNER_ENABLE = bool(int(os.getenv("TORCHAO_AUTOTUNER_ENABLE", 0)))
 
+# the products of two int8 values are at most 2**14 in magnitude, so float32 sums of
+# up to 2**10 of them are exact
+_INT_MM_BLOCK_K = 1024
+
+
+def _blocked_int_mm(input: torch.Tensor, mat2: torch.Tensor) -> torch.Tensor:
+    """
+    Exact int8 x int8 -> int32 matrix multiplication with float32 GEMMs over blocks of
+    `_INT_MM_BLOCK_K` along the reduction dimension, accumulated in int32.
+    """
+    K = input.shape[1]
+    c = torch.zeros(input.shape[0], mat2.shape[1], dtype=torch.int32, device=input.device)
+    for k in range(0, K, _INT_MM_BLOCK_K):
+        c += torch.mm(
+            input[:, k:k + _INT_MM_BLOCK_K].to(torch.float32),
+            mat2[k:k + _INT_MM_BLOCK_K].to(torch.float32),
+        ).to(torch.int32)
+    return c
+
+
+def _int_mm_cpu(input: torch.Tensor, mat2: torch.Tensor) -> torch.Tensor:
+    """
+    int8 x int8 -> int32 matrix multiplication on cpu, uses the `torch._int_mm` cpu kernel
+    (torch 2.4+) and the blocked float32 implementation otherwise.
+    """
+    if TORCH_VERSION_AFTER_2_4 and input.dtype == torch.int8 and mat2.dtype == torch.int8:
+        return torch._int_mm(input, mat2)
+    return _blocked_int_mm(input, mat2)
+
+
 # torch._int_mm doesn't exist before 2.2
 if TORCH_VERSION_AFTER_2_2:
     from torch._dynamo import is_compiling as dynamo_is_compiling
@@ -56,9 +86,7 @@ if TORCH_VERSION_AFTER_2_2:
 
         if device_cpu or bad_dimensions_for_cublas:
             # fallback path
-            return torch.matmul(input.cpu().to(torch.int32), mat2.cpu().to(torch.int32)).to(
-                input.device.type
-            )
+            return _int_mm_cpu(input.cpu(), mat2.cpu()).to(input.device.type)
 
         # cublas paths
         if not mat2.is_contiguous():  # silently gives incorrect result without this
@@ -84,7 +112,7 @@ else:
         """
         # We can improve on this by writing Triton code that works for older versions of Triton
         # that ship with 2.1 or 2.0.
-        return torch.matmul(input.to(torch.float32), mat2.to(torch.float32)).to(torch.int32)
+        return _blocked_int_mm(input, mat2)
 
 
 def int_matmul(a: torch.Tensor, b: torch.Tensor) -> torch.Tensor:
@@ -124,10 +152,10 @@ def int_scaled_matmul(a: torch.Tensor, b: torch.Tensor, scales1: torch.Tensor) -
     assert M == scales1.size(0)
     assert 1 == scales1.size(1)
     assert scales1.is_contiguous()
-    scales1 = scales1.expand((M, N))
-    assert scales1.dim() == 2
     if intmm_triton is not None and AUTOTUNER_ENABLE:
-        return torch.ops.torchao.int_scaled_matmul(a, b, scales1)
+        return torch.ops.torchao.int_scaled_matmul(a, b, scales1.expand((M, N)))
 
+    # the (M, 1) scales are broadcast in the multiplication, which also converts the int32
+    # accumulator to the dtype of the scales, without materializing an expanded or converted copy
     c = safe_int_mm(a, b)
     return c * scales1
@@ -0,0 +1,72 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Benchmarking memory and dequantize throughput of packed vs unpacked fp6
+MX tensors
+
+Example:
+    python torchao/prototype/mx_formats/benchmarks/bench_fp6_packing.py --device cpu
+"""
+
+import argparse
+
+import pandas as pd
+import torch
+
+from torchao.prototype.mx_formats import config
+from torchao.prototype.mx_formats.constants import (  # noqa: E501
+    DTYPE_FP6_E2M3,
+    DTYPE_FP6_E3M2,
+)
+
+from torchao.prototype.mx_formats.mx_tensor import MXTensor
+from torchao.utils import benchmark_torch_function_in_microseconds
+
+
+def run(shape, device):
+    results = []
+    data_hp = torch.randn(*shape, dtype=torch.bfloat16, device=device)
+    for elem_dtype in (DTYPE_FP6_E2M3, DTYPE_FP6_E3M2):
+        for pack_fp6 in (False, True):
+            config.pack_fp6 = pack_fp6
+            data_lp = MXTensor.to_mx(data_hp, elem_dtype, block_size=32)
+            assert data_lp._fp6_packed == pack_fp6
+
+            # warm up
+            res = data_lp.to_dtype(torch.bfloat16)
+            dq_execution_time_us = benchmark_torch_function_in_microseconds(
+                data_lp.to_dtype, torch.bfloat16
+            )
+
+            # raw data and e8m0 exponents are one byte per stored element
+            stored_bytes = data_lp._data.numel() + data_lp._scale_e8m0.numel()
+            mem_reads_writes_bytes = stored_bytes + res.numel() * res.element_size()
+            results.append(
+                {
+                    "elem_dtype": elem_dtype,
+                    "pack_fp6": pack_fp6,
+                    "stored_mb": stored_bytes / 1e6,
+                    "bits_per_element": stored_bytes * 8 / data_hp.numel(),
+                    "dq_time_us": dq_execution_time_us,
+                    "dq_mem_bw_gb_s": mem_reads_writes_bytes
+                    / (dq_execution_time_us / 1e6)
+                    / 1e9,
+                }
+            )
+    config.pack_fp6 = True
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="fp6 packing benchmarks")
+    parser.add_argument("--shape", type=int, nargs="+", default=[4096, 11008])
+    parser.add_argument(
+        "--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu"
+    )
+    args = parser.parse_args()
+    df = pd.DataFrame(run(args.shape, args.device))
+    print(df.to_markdown(index=False))
@@ -0,0 +1,130 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Benchmarking time and peak memory of the MX inference linear forward,
+dequantizing the whole weight vs the tiled `mx_linear_tiled`, against a
+bfloat16 linear.
+
+Every config runs in a new process. On cpu the peak memory of the forward is
+the increase of the peak resident set size (reset through
+/proc/self/clear_refs, Linux only), with glibc's mmap threshold fixed so
+freed temporaries are returned to the OS. On cuda it is the peak allocated
+memory above the memory allocated before the forward.
+
+Example:
+    python torchao/prototype/mx_formats/benchmarks/bench_inference_linear.py --device cpu --compile
+"""
+
+import argparse
+import multiprocessing
+import os
+
+import pandas as pd
+import torch
+import torch.nn.functional as F
+
+from torchao.prototype.mx_formats.mx_linear import mx_linear_tiled
+from torchao.prototype.mx_formats.mx_tensor import MXTensor
+from torchao.utils import benchmark_torch_function_in_microseconds
+
+
+def _proc_status_kb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise AssertionError(f"{field} not found")
+
+
+def _peak_memory_mb(fn, device):
+    if device == "cuda":
+        torch.cuda.synchronize()
+        start = torch.cuda.memory_allocated()
+        torch.cuda.reset_peak_memory_stats()
+        fn()
+        torch.cuda.synchronize()
+        return (torch.cuda.max_memory_allocated() - start) / 1e6
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    start = _proc_status_kb("VmRSS")
+    fn()
+    return (_proc_status_kb("VmHWM") - start) / 1e3
+
+
+def run_config(name, elem_dtype, args):
+    torch.manual_seed(0)
+    device = args.device
+    w = torch.randn(
+        args.out_features, args.in_features, dtype=torch.bfloat16, device=device
+    )
+    x = torch.randn(args.tokens, args.in_features, dtype=torch.bfloat16, device=device)
+    if name == "bf16":
+        weight_bytes = w.numel() * w.element_size()
+        fn = lambda: F.linear(x, w)  # noqa: E731
+    else:
+        # same layout as MXInferenceLinear
+        w_mx = MXTensor.to_mx(w.t().contiguous(), elem_dtype, 32).t()
+        del w
+        weight_bytes = w_mx._data.numel() + w_mx._scale_e8m0.numel()
+        if name == "mx dequantize":
+            fn = lambda: F.linear(x, w_mx.to_dtype(x.dtype))  # noqa: E731
+        elif name == "mx tiled":
+            fn = lambda: mx_linear_tiled(x, w_mx, tile_size=args.tile_size)  # noqa: E731
+        else:
+            compiled = torch.compile(mx_linear_tiled, fullgraph=True)
+            fn = lambda: compiled(x, w_mx, tile_size=args.tile_size)  # noqa: E731
+
+    with torch.no_grad():
+        # warm up, this also compiles and builds the lookup tables
+        fn()
+        peak_mb = _peak_memory_mb(fn, device)
+        time_us = benchmark_torch_function_in_microseconds(fn)
+    return {
+        "elem_dtype": str(elem_dtype) if name != "bf16" else "-",
+        "linear": name,
+        "weight_mb": weight_bytes / 1e6,
+        "fwd_peak_mb": peak_mb,
+        "fwd_time_us": time_us,
+    }
+
+
+def run(args):
+    # big allocations are mmapped and returned to the OS when freed
+    os.environ["MALLOC_MMAP_THRESHOLD_"] = "65536"
+    names = ["mx dequantize", "mx tiled"] + (["mx tiled compiled"] if args.compile else [])
+    # torch.float8_* or one of the DTYPE_FP* strings
+    elem_dtypes = [getattr(torch, name, name) for name in args.elem_dtypes]
+    configs = [("bf16", None)] + [
+        (name, elem_dtype) for elem_dtype in elem_dtypes for name in names
+    ]
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for name, elem_dtype in configs:
+        with ctx.Pool(1) as pool:
+            results.append(pool.apply(run_config, (name, elem_dtype, args)))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MX inference linear benchmarks")
+    parser.add_argument("--in_features", type=int, default=4096)
+    parser.add_argument("--out_features", type=int, default=11008)
+    parser.add_argument("--tokens", type=int, default=16)
+    parser.add_argument("--tile_size", type=int, default=128)
+    parser.add_argument(
+        "--elem_dtypes",
+        type=str,
+        nargs="+",
+        default=["float8_e4m3fn", "fp6_e3m2", "fp4_e2m1"],
+    )
+    parser.add_argument("--compile", action="store_true")
+    parser.add_argument(
+        "--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu"
+    )
+    args = parser.parse_args()
+    df = pd.DataFrame(run(args))
+    print(df.to_markdown(index=False))
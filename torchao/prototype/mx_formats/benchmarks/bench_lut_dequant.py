@@ -0,0 +1,76 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Benchmarking eager mx dequantize of fp4 and fp6 with the lookup table decode
+vs the elementwise bit manipulation decode
+
+Example:
+    python torchao/prototype/mx_formats/benchmarks/bench_lut_dequant.py --device cpu
+"""
+
+import argparse
+
+import pandas as pd
+import torch
+
+from torchao.prototype.mx_formats import config
+from torchao.prototype.mx_formats.constants import (  # noqa: E501
+    DTYPE_FP4,
+    DTYPE_FP6_E2M3,
+    DTYPE_FP6_E3M2,
+)
+
+from torchao.prototype.mx_formats.mx_tensor import MXTensor
+from torchao.utils import benchmark_torch_function_in_microseconds
+
+
+def run(shape, device, hp_dtype):
+    results = []
+    data_hp = torch.randn(*shape, dtype=hp_dtype, device=device)
+    for elem_dtype in (DTYPE_FP4, DTYPE_FP6_E2M3, DTYPE_FP6_E3M2):
+        data_lp = MXTensor.to_mx(data_hp, elem_dtype, block_size=32)
+        times_us = {}
+        for use_lut_dequant in (False, True):
+            config.use_lut_dequant = use_lut_dequant
+            # warm up, this also builds the lookup tables
+            res = data_lp.to_dtype(hp_dtype)
+            times_us[use_lut_dequant] = benchmark_torch_function_in_microseconds(
+                data_lp.to_dtype, hp_dtype
+            )
+
+        # raw data and e8m0 exponents are one byte per stored element
+        mem_reads_writes_bytes = (
+            data_lp._data.numel()
+            + data_lp._scale_e8m0.numel()
+            + res.numel() * res.element_size()
+        )
+        for use_lut_dequant, dq_time_us in times_us.items():
+            results.append(
+                {
+                    "elem_dtype": elem_dtype,
+                    "use_lut_dequant": use_lut_dequant,
+                    "dq_time_us": dq_time_us,
+                    "dq_mem_bw_gb_s": mem_reads_writes_bytes / (dq_time_us / 1e6) / 1e9,
+                    "speedup": times_us[False] / dq_time_us,
+                }
+            )
+    config.use_lut_dequant = True
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="mx lookup table dequantize benchmarks")
+    parser.add_argument("--shape", type=int, nargs="+", default=[4096, 11008])
+    parser.add_argument(
+        "--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu"
+    )
+    parser.add_argument(
+        "--dtype", type=str, default="bfloat16", choices=["float32", "bfloat16"]
+    )
+    args = parser.parse_args()
+    df = pd.DataFrame(run(args.shape, args.device, getattr(torch, args.dtype)))
+    print(df.to_markdown(index=False))
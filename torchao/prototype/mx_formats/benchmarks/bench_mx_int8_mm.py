@@ -0,0 +1,76 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Benchmarking accuracy and time of the emulated MX int8 matmul in the integer
+domain (`mx_int8_mm`) vs dequantizing both operands, and vs MX fp8 e4m3, for
+a @ w.t() as in the forward of MXLinear. Accuracy is the SQNR against the
+high precision matmul of the original operands.
+
+Example:
+    python torchao/prototype/mx_formats/benchmarks/bench_mx_int8_mm.py --device cpu
+"""
+
+import argparse
+
+import pandas as pd
+import torch
+
+from torchao.prototype.mx_formats import config
+from torchao.prototype.mx_formats.mx_tensor import MXTensor
+from torchao.quantization.utils import compute_error
+from torchao.utils import benchmark_torch_function_in_microseconds
+
+
+def run(args):
+    torch.manual_seed(0)
+    hp_dtype = getattr(torch, args.dtype)
+    a = torch.randn(args.M, args.K, dtype=hp_dtype, device=args.device)
+    w = torch.randn(args.N, args.K, dtype=hp_dtype, device=args.device)
+    ref = torch.mm(a.double(), w.double().t())
+
+    configs = [
+        ("int8", torch.int8, True),
+        ("int8", torch.int8, False),
+        ("fp8_e4m3", torch.float8_e4m3fn, False),
+    ]
+    default_use_integer_mm = config.use_mx_int8_integer_mm
+    results = []
+    for name, elem_dtype, use_integer_mm in configs:
+        config.use_mx_int8_integer_mm = use_integer_mm
+        a_mx = MXTensor.to_mx(a, elem_dtype, args.block_size)
+        w_mx = MXTensor.to_mx(w, elem_dtype, args.block_size)
+        res = torch.mm(a_mx, w_mx.t())
+        time_us = benchmark_torch_function_in_microseconds(torch.mm, a_mx, w_mx.t())
+        results.append(
+            {
+                "elem_dtype": name,
+                "mm": "integer" if use_integer_mm else "dequantize",
+                "sqnr_db": compute_error(ref, res.double()).item(),
+                "time_us": time_us,
+            }
+        )
+    config.use_mx_int8_integer_mm = default_use_integer_mm
+    for result in results:
+        result["speedup_vs_fp8"] = results[-1]["time_us"] / result["time_us"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MX int8 matmul benchmarks")
+    parser.add_argument("--M", type=int, default=256)
+    parser.add_argument("--K", type=int, default=4096)
+    parser.add_argument("--N", type=int, default=4096)
+    parser.add_argument("--block_size", type=int, default=32)
+    parser.add_argument(
+        "--dtype", type=str, default="bfloat16", choices=["float32", "bfloat16"]
+    )
+    parser.add_argument(
+        "--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu"
+    )
+    args = parser.parse_args()
+    df = pd.DataFrame(run(args))
+    print(df.to_markdown(index=False))
@@ -0,0 +1,121 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+# All rights reserved.
+
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+
+"""
+Benchmarking MXLinear training with gradient accumulation, with and without
+caching the MX cast of the weights across micro-batches, on a small
+transformer
+
+Example:
+    python torchao/prototype/mx_formats/benchmarks/bench_weight_cast_cache.py --device cpu
+"""
+
+import argparse
+import copy
+import time
+
+import pandas as pd
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from torchao.prototype.mx_formats.mx_linear import swap_linear_with_mx_linear
+
+
+class Block(nn.Module):
+    def __init__(self, dim, n_head):
+        super().__init__()
+        self.n_head = n_head
+        self.norm1 = nn.LayerNorm(dim)
+        self.qkv = nn.Linear(dim, 3 * dim)
+        self.proj = nn.Linear(dim, dim)
+        self.norm2 = nn.LayerNorm(dim)
+        self.w1 = nn.Linear(dim, 4 * dim)
+        self.w2 = nn.Linear(4 * dim, dim)
+
+    def forward(self, x):
+        bsz, seqlen, dim = x.shape
+        q, k, v = self.qkv(self.norm1(x)).split(dim, dim=-1)
+        q, k, v = (
+            t.view(bsz, seqlen, self.n_head, -1).transpose(1, 2) for t in (q, k, v)
+        )
+        y = F.scaled_dot_product_attention(q, k, v, is_causal=True)
+        x = x + self.proj(y.transpose(1, 2).reshape(bsz, seqlen, dim))
+        return x + self.w2(F.gelu(self.w1(self.norm2(x))))
+
+
+def train_time_s(model, accumulation, n_steps, batch_size, seq_len, dim):
+    optimizer = torch.optim.SGD(model.parameters(), lr=1e-3)
+    device = next(model.parameters()).device
+    times = []
+    # the first step is warm up
+    for _ in range(n_steps + 1):
+        x = torch.randn(accumulation, batch_size, seq_len, dim, device=device)
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        for micro_batch in x:
+            loss = model(micro_batch).pow(2).mean() / accumulation
+            loss.backward()
+        optimizer.step()
+        optimizer.zero_grad()
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        times.append(time.perf_counter() - start)
+    return sum(times[1:]) / n_steps
+
+
+def run(args):
+    model = nn.Sequential(
+        *[Block(args.dim, args.n_head) for _ in range(args.n_layer)]
+    ).to(args.device)
+    elem_dtype = getattr(torch, args.elem_dtype)
+    results = []
+    for accumulation in args.accumulation:
+        step_times_s = {}
+        for cache_weight_cast in (False, True):
+            m = copy.deepcopy(model)
+            swap_linear_with_mx_linear(
+                m, elem_dtype, 32, cache_weight_cast=cache_weight_cast
+            )
+            step_times_s[cache_weight_cast] = train_time_s(
+                m,
+                accumulation,
+                args.n_steps,
+                args.batch_size,
+                args.seq_len,
+                args.dim,
+            )
+        for cache_weight_cast, step_time_s in step_times_s.items():
+            saved_s = step_times_s[False] - step_time_s
+            results.append(
+                {
+                    "accumulation": accumulation,
+                    "cache_weight_cast": cache_weight_cast,
+                    "step_time_ms": step_time_s * 1e3,
+                    "saved_ms": saved_s * 1e3,
+                    "saved_pct": saved_s / step_times_s[False] * 100,
+                }
+            )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MX weight cast cache benchmarks")
+    parser.add_argument("--n_layer", type=int, default=2)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--n_head", type=int, default=4)
+    parser.add_argument("--batch_size", type=int, default=1)
+    parser.add_argument("--seq_len", type=int, default=32)
+    parser.add_argument("--n_steps", type=int, default=3)
+    parser.add_argument("--accumulation", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--elem_dtype", type=str, default="float8_e4m3fn")
+    parser.add_argument(
+        "--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu"
+    )
+    args = parser.parse_args()
+    df = pd.DataFrame(run(args))
+    print(df.to_markdown(index=False))
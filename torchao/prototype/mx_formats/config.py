@@ -1,2 +1,18 @@
 # If True, uses a custom triton kernel for fp4 dequantize
 use_fp4_custom_triton_dequant_kernel = False
+
+# If True, `to_mx` packs fp6 elements 4 per 3 bytes (when the last dimension
+# is divisible by 4), otherwise they are stored one per byte
+pack_fp6 = True
+
+# If True, fp4 and fp6 dequantize outside of torch.compile gathers from a
+# lookup table of every (e8m0 scale, element) pair instead of decoding the
+# bits elementwise
+use_lut_dequant = True
+
+# If True, mm and addmm of two MX int8 tensors with the blocks along the
+# reduction dimension multiply the int8 blocks in the integer domain instead
+# of dequantizing to high precision, see `mx_ops.mx_int8_mm`. Off by default,
+# it is exact but currently slower than dequantizing, since every block of the
+# reduction dimension is a separate matmul and shifted accumulation.
+use_mx_int8_integer_mm = False
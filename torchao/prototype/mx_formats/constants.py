@@ -7,14 +7,14 @@ DTYPE_FP4 = "fp4_e2m1"
 DTYPE_FP6_E3M2 = "fp6_e3m2"
 DTYPE_FP6_E2M3 = "fp6_e2m3"
 
-# Supported element dtypes
-# TODO(future PR): add support for MX int8
+# Supported element dtypes, torch.int8 is MX int8
 SUPPORTED_ELEM_DTYPES = [
     torch.float8_e4m3fn,
     torch.float8_e5m2,
     DTYPE_FP6_E2M3,
     DTYPE_FP6_E3M2,
     DTYPE_FP4,
+    torch.int8,
 ]
 
 F8E4M3_MAX = torch.finfo(torch.float8_e4m3fn).max  # 448.0
@@ -25,6 +25,7 @@ F8E5M2_MAX_POW2 = 15  # 32768
 F6_E2M3_MAX_POW2 = 2  # 4
 F6_E3M2_MAX_POW2 = 4  # 16
 F4_E2M1_MAX_POW2 = 2  # 4
+INT8_MAX_POW2 = 0  # 1
 
 E8M0_EXPONENT_BIAS = 127
 E8M0_EXPONENT_NAN_VAL = 255
@@ -48,4 +49,10 @@ F4_E2M1_MAX = 6.0
 F4_E2M1_MIN_NORMAL = 1.0
 F4_E2M1_MAX_INT = 7
 
+# MX int8 elements are two's complement int8 values with an implicit scale
+# of 2**-6, symmetric around zero (-128 is not used)
+INT8_FRAC_BITS = 6
+INT8_MAX_INT = 127
+INT8_MAX = INT8_MAX_INT / 2**INT8_FRAC_BITS  # 1.984375
+
 BLOCK_SIZE_DEFAULT = 32
@@ -302,8 +302,8 @@ def _f4_or_f6_unpacked_to_f32(x: torch.Tensor, lp_dtype_name: str):
       containing an fp4_e2m1 encoding
     Output: torch.Tensor of dtype fp32 with the dequantized value
 
-    TODO(future): check if LUT for everything is faster than bit shifting,
-      especially for fp4.
+    Note: in eager mode, `mx_tensor.to_dtype` gathers from a lookup table
+      built with this function instead, see `f4_or_f6_lut`.
     """
     assert x.dtype == torch.uint8
 
@@ -411,6 +411,26 @@ def _f4_or_f6_unpacked_to_f32(x: torch.Tensor, lp_dtype_name: str):
     return result.view(torch.float)
 
 
+# (lp_dtype_name, device) -> fp32 value of every fp4 or fp6 encoding
+_F4_OR_F6_LUT_CACHE = {}
+
+
+def f4_or_f6_lut(lp_dtype_name: str, device) -> torch.Tensor:
+    """
+    Output: torch.Tensor of dtype fp32 and size 2**4 (fp4) or 2**6 (fp6),
+      with the dequantized value of every encoding, computed with
+      `_f4_or_f6_unpacked_to_f32` so a gather from it is bit-exact with it
+    """
+    key = (lp_dtype_name, torch.device(device))
+    if key not in _F4_OR_F6_LUT_CACHE:
+        num_bits = 4 if lp_dtype_name == DTYPE_FP4 else 6
+        encodings = torch.arange(2**num_bits, dtype=torch.uint8, device=device)
+        _F4_OR_F6_LUT_CACHE[key] = _f4_or_f6_unpacked_to_f32(
+            encodings, lp_dtype_name
+        )
+    return _F4_OR_F6_LUT_CACHE[key]
+
+
 def f4_unpacked_to_f32(x: torch.Tensor):
     """
     Input: torch.Tensor of dtype uint8, with bits 0-3 empty and bits 4-7
@@ -711,3 +731,52 @@ def pack_uint4(uint8_data) -> torch.Tensor:
     assert shape[-1] % 2 == 0
     uint8_data = uint8_data.contiguous().view(-1)
     return (uint8_data[::2] << 4 | uint8_data[1::2]).view(down_size(shape))
+
+
+def down_size_fp6(size):
+    assert size[-1] % 4 == 0, f"{size} last dim not divisible by four"
+    return (*size[:-1], size[-1] // 4 * 3)
+
+
+def up_size_fp6(size):
+    assert size[-1] % 3 == 0, f"{size} last dim not divisible by three"
+    return (*size[:-1], size[-1] // 3 * 4)
+
+
+def pack_uint6(uint8_data) -> torch.Tensor:
+    """
+    Packs the 6 bit values of a uint8 tensor, 4 values into 3 bytes along the
+    last dimension, with the same bit layout as
+    `torchao.dtypes.float6_e3m2.to_float6_e3m2`:
+    0000 0011 | 1111 2222 | 2233 3333
+    """
+    shape = uint8_data.shape
+    assert shape[-1] % 4 == 0
+    uint8_data = uint8_data.contiguous().view(-1, 4)
+    val0, val1, val2, val3 = uint8_data.unbind(-1)
+    # the bits shifted out of the uint8 belong to the previous byte
+    packed = torch.stack(
+        [(val0 << 2) | (val1 >> 4), (val1 << 4) | (val2 >> 2), (val2 << 6) | val3],
+        dim=-1,
+    )
+    return packed.view(down_size_fp6(shape))
+
+
+def unpack_uint6(uint8_data) -> torch.Tensor:
+    """
+    Inverse of `pack_uint6`, unpacks 3 bytes into 4 uint8 values along the
+    last dimension.
+    """
+    assert uint8_data.is_contiguous()
+    shape = uint8_data.shape
+    bits0, bits1, bits2 = uint8_data.view(-1, 3).unbind(-1)
+    unpacked = torch.stack(
+        [
+            bits0 >> 2,
+            ((bits0 & 0b11) << 4) | (bits1 >> 4),
+            ((bits1 & 0b1111) << 2) | (bits2 >> 6),
+            bits2 & 0b111111,
+        ],
+        dim=-1,
+    )
+    return unpacked.view(up_size_fp6(shape))
@@ -16,7 +16,10 @@ inference, and to a tensor subclass weight wrapper + module hooks for training.
 import torch
 import torch.nn.functional as F
 
-from torchao.prototype.mx_formats.mx_tensor import MXTensor, to_mx
+from torchao.prototype.mx_formats.mx_tensor import MXTensor, to_dtype, to_mx
+
+# number of rows of the weight dequantized at a time by `mx_linear_tiled`
+TILE_SIZE_DEFAULT = 128
 
 
 @torch._dynamo.allow_in_graph
@@ -42,33 +45,157 @@ class NoopFwToMXBw(torch.autograd.Function):
         )
 
 
+@torch._dynamo.allow_in_graph
+class CachedToMXConstrFunc(torch.autograd.Function):
+    """
+    Forward: returns the already computed MX cast of data_hp, from its
+        scale and raw data
+    Backward: no-op, same as the cast to MX
+    """
+
+    @staticmethod
+    def forward(ctx, data_hp, scale_e8m0, data_lp, elem_dtype, block_size, fp6_packed):
+        return MXTensor(
+            scale_e8m0, data_lp, elem_dtype, block_size, data_hp.dtype, fp6_packed
+        )
+
+    @staticmethod
+    def backward(ctx, g):
+        return g, None, None, None, None, None
+
+
 class MXLinear(torch.nn.Linear):
     """
     Linear layer with the compute happening in emulate MX. Currently the MX
     matmul is emulated since there is no hardware support yet. Activations,
     weights and grads are casted to MX and back to high precision for each
     matmul.
+
+    With `cache_weight_cast=True`, the MX cast of the weight is kept in the
+    `weight_mx_cache_scale_e8m0` and `weight_mx_cache_data` buffers and
+    reused until the weight changes, e.g. across the micro-batches of
+    gradient accumulation. In eager mode the cache is refreshed when the
+    version counter of the weight changes (optimizer steps update the weight
+    in place). Compiled code can't check the version counter, so with
+    torch.compile the cache must be refreshed explicitly after every
+    optimizer step, see `register_mx_weight_cast_cache_hook`.
     """
 
     @classmethod
     @torch.no_grad()
-    def from_float(cls, mod, elem_dtype, block_size):
+    def from_float(cls, mod, elem_dtype, block_size, cache_weight_cast=False):
         mod.__class__ = MXLinear
         mod.elem_dtype = elem_dtype
         mod.block_size = block_size
+        mod.cache_weight_cast = cache_weight_cast
+        if cache_weight_cast:
+            mod.refresh_weight_cast_cache()
         return mod
 
+    @torch.no_grad()
+    def refresh_weight_cast_cache(self):
+        """
+        Casts the weight to MX and stores its scale and raw data in the
+        `weight_mx_cache_scale_e8m0` and `weight_mx_cache_data` buffers. These
+        are plain tensors, so the module can still be deep copied, and are
+        updated in place, so compiled code sees the new values.
+        """
+        w_mx = MXTensor.to_mx(self.weight, self.elem_dtype, self.block_size)
+        data = getattr(self, "weight_mx_cache_data", None)
+        if data is None or data.shape != w_mx._data.shape:
+            self.register_buffer(
+                "weight_mx_cache_scale_e8m0", w_mx._scale_e8m0, persistent=False
+            )
+            self.register_buffer("weight_mx_cache_data", w_mx._data, persistent=False)
+        else:
+            self.weight_mx_cache_scale_e8m0.copy_(w_mx._scale_e8m0)
+            data.copy_(w_mx._data)
+        self._weight_mx_cache_fp6_packed = w_mx._fp6_packed
+        self._weight_mx_cache_key = self._weight_cache_key()
+
+    def _weight_cache_key(self):
+        return (self.weight.data_ptr(), self.weight._version)
+
+    def _weight_mx(self):
+        if not getattr(self, "cache_weight_cast", False):
+            return MXTensor.to_mx(self.weight, self.elem_dtype, self.block_size)
+        if (
+            not torch.compiler.is_compiling()
+            and self._weight_mx_cache_key != self._weight_cache_key()
+        ):
+            self.refresh_weight_cast_cache()
+        return CachedToMXConstrFunc.apply(
+            self.weight,
+            self.weight_mx_cache_scale_e8m0,
+            self.weight_mx_cache_data,
+            self.elem_dtype,
+            self.block_size,
+            self._weight_mx_cache_fp6_packed,
+        )
+
     def forward(self, x):
         x_mx = MXTensor.to_mx(x, self.elem_dtype, self.block_size)
-        w_mx = MXTensor.to_mx(self.weight, self.elem_dtype, self.block_size)
+        w_mx = self._weight_mx()
         y = F.linear(x_mx, w_mx, self.bias)
         y = NoopFwToMXBw.apply(y, self.elem_dtype, self.block_size)
         return y
 
 
+def mx_linear_tiled(x, w_mx, bias=None, tile_size=TILE_SIZE_DEFAULT):
+    """
+    F.linear(x, w_mx, bias) with the MX weight dequantized `tile_size` rows
+    of its underlying data at a time, inside the loop accumulating the
+    matmul in fp32, so only a tile of the weight is in high precision at any
+    time instead of the whole weight.
+
+    The rows of the underlying data are the rows of the weight, or of its
+    transpose for a transposed `w_mx` (as created by `MXInferenceLinear`), and
+    have to be made of whole blocks, otherwise this falls back to
+    dequantizing the whole weight. In eager mode this is the reference
+    implementation, under torch.compile the tile dequantize is fused.
+    """
+    out_features, in_features = w_mx.shape
+    is_transposed = not w_mx._data.is_contiguous()
+    row_size = out_features if is_transposed else in_features
+    if row_size % w_mx._block_size != 0:
+        return F.linear(x, w_mx.to_dtype(x.dtype), bias)
+
+    data_lp = w_mx._data.t() if is_transposed else w_mx._data
+    num_rows = data_lp.shape[0]
+    scale_e8m0 = w_mx._scale_e8m0.reshape(num_rows, -1)
+    orig_shape = x.shape
+    x_fp32 = x.reshape(-1, in_features).to(torch.float32)
+    y = torch.empty(
+        x_fp32.shape[0], out_features, dtype=torch.float32, device=x.device
+    )
+    for start in range(0, num_rows, tile_size):
+        end = min(start + tile_size, num_rows)
+        w_tile = to_dtype(
+            data_lp[start:end],
+            scale_e8m0[start:end],
+            w_mx._elem_dtype,
+            w_mx._block_size,
+            torch.float32,
+            w_mx._fp6_packed,
+        )
+        if is_transposed:
+            # rows start:end of the transposed weight, reduce over them
+            if start == 0:
+                torch.mm(x_fp32[:, start:end], w_tile, out=y)
+            else:
+                y.addmm_(x_fp32[:, start:end], w_tile)
+        else:
+            # rows start:end of the weight, the output features start:end
+            y[:, start:end] = torch.mm(x_fp32, w_tile.t())
+    if bias is not None:
+        y = y + bias
+    return y.to(x.dtype).reshape(*orig_shape[:-1], out_features)
+
+
 class MXInferenceLinear(torch.nn.Linear):
     """
     Inference version of MXLinear, with the weight pre-quantized to MX.
+    The forward dequantizes the weight a tile at a time, see `mx_linear_tiled`.
     """
 
     @classmethod
@@ -92,8 +219,8 @@ class MXInferenceLinear(torch.nn.Linear):
 
     @torch.no_grad()
     def forward(self, x):
-        w_hp = self.weight_mx.to_dtype(x.dtype)
-        y = F.linear(x, w_hp, self.bias)
+        tile_size = getattr(self, "tile_size", TILE_SIZE_DEFAULT)
+        y = mx_linear_tiled(x, self.weight_mx, self.bias, tile_size)
         return y
 
 
@@ -123,7 +250,13 @@ def _is_linear(mod, fqn):
     return isinstance(mod, torch.nn.Linear)
 
 
-def swap_linear_with_mx_linear(model, elem_dtype, block_size, filter_fn=None):
+def swap_linear_with_mx_linear(
+    model,
+    elem_dtype,
+    block_size,
+    filter_fn=None,
+    cache_weight_cast=False,
+):
     if filter_fn is None:
         combined_filter_fn = _is_linear
     else:
@@ -134,7 +267,9 @@ def swap_linear_with_mx_linear(model, elem_dtype, block_size, filter_fn=None):
         combined_filter_fn = __fn
     replace_with_custom_fn_if_matches_filter(
         model,
-        lambda mod: MXLinear.from_float(mod, elem_dtype, block_size),
+        lambda mod: MXLinear.from_float(
+            mod, elem_dtype, block_size, cache_weight_cast
+        ),
         combined_filter_fn,
     )
 
@@ -158,3 +293,26 @@ def swap_linear_with_mx_inference_linear(
         lambda mod: MXInferenceLinear.from_float(mod, elem_dtype, block_size),
         combined_filter_fn,
     )
+
+
+def refresh_mx_weight_cast_cache(model):
+    """
+    Refreshes the weight cast cache of every `MXLinear` in `model` created
+    with `cache_weight_cast=True`
+    """
+    for mod in model.modules():
+        if isinstance(mod, MXLinear) and getattr(mod, "cache_weight_cast", False):
+            mod.refresh_weight_cast_cache()
+
+
+def register_mx_weight_cast_cache_hook(optimizer, model):
+    """
+    Refreshes the weight cast caches of `model` after every `optimizer.step()`,
+    this is required when running the `MXLinear` modules with torch.compile.
+    Returns the hook handle.
+    """
+
+    def hook(optimizer, args, kwargs):
+        refresh_mx_weight_cast_cache(model)
+
+    return optimizer.register_step_post_hook(hook)
@@ -17,15 +17,25 @@ then the ops in this file are used under the hood to properly route
 the underlying data fields to the MX matmul.
 """
 
+import math
 from typing import Any, Dict
 
 import torch
 from torch.utils._pytree import tree_map
 
-from torchao.prototype.mx_formats.constants import DTYPE_FP4
+import torchao.prototype.mx_formats.config as config
+from torchao.kernel.intmm import safe_int_mm
+from torchao.prototype.mx_formats.constants import (
+    DTYPE_FP4,
+    E8M0_EXPONENT_BIAS,
+    E8M0_EXPONENT_NAN_VAL,
+    INT8_FRAC_BITS,
+    INT8_MAX_INT,
+)
 from torchao.prototype.mx_formats.mx_tensor import (  # noqa: E501
     MXTensor,
     tensor_size_hp_to_fp4x2,
+    tensor_size_hp_to_fp6x4,
 )
 
 aten = torch.ops.aten
@@ -54,15 +64,96 @@ def mx_desugar_op(aten_op, args, kwargs=None):
         old._elem_dtype,
         old._block_size,
         old._orig_dtype,
+        old._fp6_packed,
     )
     return new
 
 
+def _use_mx_int8_mm(a, b):
+    # MX int8 a @ b with the blocks of both along the reduction dimension,
+    # i.e. row major a and column major b
+    return (
+        config.use_mx_int8_integer_mm
+        and a._elem_dtype == torch.int8
+        and b._elem_dtype == torch.int8
+        and a._block_size == b._block_size
+        and a.dim() == 2
+        and b.dim() == 2
+        and a._data.is_contiguous()
+        and b._data.t().is_contiguous()
+    )
+
+
+def mx_int8_mm(a: MXTensor, b: MXTensor) -> torch.Tensor:
+    """
+    a @ b for MX int8 tensors, with int8 x int8 -> int32 matmuls of every
+    block of the reduction dimension (`safe_int_mm`) and the combined e8m0
+    exponents of the blocks applied as shifts, accumulating in int64.
+
+    The shifts are relative to the largest exponent of each row of a and of
+    each column of b, with enough headroom to accumulate without overflow.
+    Blocks more than the headroom (at least 17 binades for K <= 2**15) below
+    the largest block of their row or column are flushed to zero. The int64
+    result is scaled by the largest exponents once, in float64.
+    """
+    block_size = a._block_size
+    M, K = a.shape
+    N = b.shape[1]
+    num_blocks = K // block_size
+    a_data = a._data.reshape(M, num_blocks, block_size)
+    b_data = b._data.t().reshape(N, num_blocks, block_size)
+    a_exp = a._scale_e8m0.reshape(M, num_blocks).to(torch.int64)
+    b_exp = b._scale_e8m0.reshape(N, num_blocks).to(torch.int64)
+
+    # a block product is at most block_size * INT8_MAX_INT**2 in magnitude
+    # and num_blocks of them are summed, split the rest of the int64 bits
+    # between the shifts of a and b
+    product_bits = math.ceil(math.log2(block_size * INT8_MAX_INT**2))
+    headroom = 62 - product_bits - math.ceil(math.log2(num_blocks))
+    a_headroom = headroom // 2
+    b_headroom = headroom - a_headroom
+    a_max_exp = a_exp.amax(1, keepdim=True)
+    b_max_exp = b_exp.amax(1, keepdim=True)
+    a_shift = a_exp - a_max_exp + a_headroom
+    b_shift = b_exp - b_max_exp + b_headroom
+    a_data = torch.where(
+        (a_shift >= 0).unsqueeze(-1), a_data, torch.zeros_like(a_data)
+    )
+    b_data = torch.where(
+        (b_shift >= 0).unsqueeze(-1), b_data, torch.zeros_like(b_data)
+    )
+    a_shift = a_shift.clamp(min=0)
+    b_shift = b_shift.clamp(min=0)
+
+    # contiguous (M, block_size) and (N, block_size) slices for every block
+    a_blocks = a_data.transpose(0, 1).contiguous()
+    b_blocks = b_data.transpose(0, 1).contiguous()
+    acc = torch.zeros(M, N, dtype=torch.int64, device=a._data.device)
+    for i in range(num_blocks):
+        block_res = safe_int_mm(a_blocks[i], b_blocks[i].t())
+        acc += block_res.to(torch.int64) << (a_shift[:, i : i + 1] + b_shift[:, i])
+
+    # undo the shifts, the e8m0 biases and the implicit scales of the elements
+    a_exp = a_max_exp - E8M0_EXPONENT_BIAS - a_headroom - INT8_FRAC_BITS
+    b_exp = b_max_exp - E8M0_EXPONENT_BIAS - b_headroom - INT8_FRAC_BITS
+    a_scale = torch.exp2(a_exp.to(torch.float64))
+    b_scale = torch.exp2(b_exp.to(torch.float64))
+    # a NaN block exponent makes the rows and columns it contributes to NaN
+    a_is_nan = (a._scale_e8m0.reshape(M, -1) == E8M0_EXPONENT_NAN_VAL).any(1)
+    b_is_nan = (b._scale_e8m0.reshape(N, -1) == E8M0_EXPONENT_NAN_VAL).any(1)
+    a_scale = torch.where(a_is_nan.unsqueeze(1), float("nan"), a_scale)
+    b_scale = torch.where(b_is_nan.unsqueeze(1), float("nan"), b_scale)
+    res = acc.to(torch.float64) * a_scale * b_scale.t()
+    return res.to(a._orig_dtype)
+
+
 @implements([aten.mm.default, aten.matmul.default])
 def mx_mm(aten_op, args, kwargs=None):
     a = args[0]
     b = args[1]
     assert isinstance(a, MXTensor) and isinstance(b, MXTensor)
+    if _use_mx_int8_mm(a, b):
+        return mx_int8_mm(a, b)
     a_hp = a.to_dtype(a._orig_dtype)
     b_hp = b.to_dtype(b._orig_dtype)
     res = aten_op(a_hp, b_hp)
@@ -75,6 +166,8 @@ def mx_addmm(aten_op, args, kwargs=None):
     b = args[1]
     c = args[2]
     assert isinstance(b, MXTensor) and isinstance(c, MXTensor)
+    if _use_mx_int8_mm(b, c) and not kwargs:
+        return a + mx_int8_mm(b, c)
     b_hp = b.to_dtype(b._orig_dtype)
     c_hp = c.to_dtype(c._orig_dtype)
     res = aten_op(a, b_hp, c_hp)
@@ -91,6 +184,7 @@ def mx_t(aten_op, args, kwargs=None):
         old._elem_dtype,
         old._block_size,
         old._orig_dtype,
+        old._fp6_packed,
     )
     return new
 
@@ -122,6 +216,9 @@ def mx_view_op(aten_op, args, kwargs=None):
     if args[0]._elem_dtype == DTYPE_FP4:
         # special case fp4 as we pack two elements per byte
         new_size = tensor_size_hp_to_fp4x2(new_size, data.is_contiguous())
+    elif args[0]._fp6_packed:
+        # special case packed fp6 as we pack four elements per three bytes
+        new_size = tensor_size_hp_to_fp6x4(new_size, data.is_contiguous())
     new_data = aten_op(data, new_size, *args[2:], **kwargs)
     return MXTensor(
         args[0]._scale_e8m0,
@@ -129,6 +226,7 @@ def mx_view_op(aten_op, args, kwargs=None):
         args[0]._elem_dtype,
         args[0]._block_size,
         args[0]._orig_dtype,
+        args[0]._fp6_packed,
     )
 
 
@@ -153,6 +251,7 @@ def autocast_to_copy(aten_op, args, kwargs=None):
         args[0]._elem_dtype,
         args[0]._block_size,
         kwargs["dtype"],
+        args[0]._fp6_packed,
     )
     # print('after', res, res.dtype, res._orig_dtype)
     return res
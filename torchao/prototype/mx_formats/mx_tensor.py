@@ -39,6 +39,9 @@ from torchao.prototype.mx_formats.constants import (
     F8E4M3_MAX_POW2,
     F8E5M2_MAX,
     F8E5M2_MAX_POW2,
+    INT8_FRAC_BITS,
+    INT8_MAX,
+    INT8_MAX_POW2,
     SUPPORTED_ELEM_DTYPES,
 )
 
@@ -49,9 +52,12 @@ from torchao.prototype.mx_formats.custom_cast import (
     f4_unpacked_to_f32,
     f6_e2m3_unpacked_to_f32,
     f6_e3m2_unpacked_to_f32,
+    f4_or_f6_lut,
     pack_uint4,
+    pack_uint6,
     triton_f4_to_scaled_bf16,
     unpack_uint4,
+    unpack_uint6,
 )
 
 
@@ -105,6 +111,8 @@ def to_mx(
         target_max_pow2 = F6_E3M2_MAX_POW2
     elif elem_dtype == DTYPE_FP4:
         target_max_pow2 = F4_E2M1_MAX_POW2
+    elif elem_dtype == torch.int8:
+        target_max_pow2 = INT8_MAX_POW2
     else:
         raise AssertionError("unsupported")
     scale_e8m0_unbiased = largest_p2_lt_max_abs - target_max_pow2
@@ -153,6 +161,8 @@ def to_mx(
         max_pos = F6_E3M2_MAX
     elif elem_dtype == DTYPE_FP4:
         max_pos = F4_E2M1_MAX
+    elif elem_dtype == torch.int8:
+        max_pos = INT8_MAX
     else:
         raise AssertionError("unsupported")
     data_lp = torch.clamp(
@@ -163,13 +173,19 @@ def to_mx(
     # cast to target dtype
     if elem_dtype in (torch.float8_e4m3fn, torch.float8_e5m2):
         data_lp = data_lp.to(elem_dtype)
-    elif elem_dtype == DTYPE_FP6_E2M3:
-        data_lp = f32_to_f6_e2m3_unpacked(data_lp)
-    elif elem_dtype == DTYPE_FP6_E3M2:
-        data_lp = f32_to_f6_e3m2_unpacked(data_lp)
+    elif elem_dtype in (DTYPE_FP6_E2M3, DTYPE_FP6_E3M2):
+        if elem_dtype == DTYPE_FP6_E2M3:
+            data_lp = f32_to_f6_e2m3_unpacked(data_lp)
+        else:
+            data_lp = f32_to_f6_e3m2_unpacked(data_lp)
+        if config.pack_fp6 and data_lp.shape[-1] % 4 == 0:
+            data_lp = pack_uint6(data_lp)
     elif elem_dtype == DTYPE_FP4:
         data_lp = f32_to_f4_unpacked(data_lp)
         data_lp = pack_uint4(data_lp)
+    elif elem_dtype == torch.int8:
+        # round to nearest even on the 2**-6 grid of the int8 elements
+        data_lp = torch.round(data_lp * 2**INT8_FRAC_BITS).to(torch.int8)
     else:
         raise AssertionError("unsupported")
 
@@ -192,7 +208,45 @@ def get_fp_scale(scale_e8m0):
     return s_fp
 
 
-def to_dtype(data_lp, scale_e8m0, elem_dtype, block_size, target_dtype):
+# (elem_dtype, target_dtype, device) -> table of every e8m0 scale times every
+# fp4 or fp6 value, see `f4_or_f6_unpacked_to_scaled_dtype`
+_SCALED_LUT_CACHE = {}
+
+
+def get_scaled_lut(elem_dtype, target_dtype, device):
+    key = (elem_dtype, target_dtype, torch.device(device))
+    if key not in _SCALED_LUT_CACHE:
+        lut = f4_or_f6_lut(elem_dtype, device).to(target_dtype)
+        scales = torch.arange(256, dtype=torch.uint8, device=device)
+        s_fp = get_fp_scale(scales).reshape(-1, 1).to(target_dtype)
+        # the same ops as the scaling in `to_dtype`, so the values are bit-exact
+        _SCALED_LUT_CACHE[key] = (lut.reshape(1, -1) * s_fp).flatten()
+    return _SCALED_LUT_CACHE[key]
+
+
+def f4_or_f6_unpacked_to_scaled_dtype(
+    data_lp, scale_e8m0, elem_dtype, block_size, target_dtype
+):
+    """
+    Dequantizes unpacked fp4 or fp6 data and applies the e8m0 block scale with
+    a single gather from a table indexed by (scale, element) pairs, instead of
+    decoding the bits and scaling with full size temporaries.
+    """
+    num_bits = 4 if elem_dtype == DTYPE_FP4 else 6
+    table = get_scaled_lut(elem_dtype, target_dtype, data_lp.device)
+    scale_index = scale_e8m0.view(torch.uint8).to(torch.int32) << num_bits
+    index = scale_index.reshape(-1, 1) | data_lp.reshape(-1, block_size)
+    return table.index_select(0, index.flatten())
+
+
+def to_dtype(
+    data_lp,
+    scale_e8m0,
+    elem_dtype,
+    block_size,
+    target_dtype,
+    fp6_packed=False,
+):
     orig_shape = data_lp.shape
     is_transposed = not data_lp.is_contiguous()
     # if the underlying data is transposed, convert to row major before
@@ -202,14 +256,28 @@ def to_dtype(data_lp, scale_e8m0, elem_dtype, block_size, target_dtype):
         assert data_lp.is_contiguous()
         orig_shape = (orig_shape[1], orig_shape[0])
 
+    # the lookup tables are cached tensors, so only use them in eager mode
+    use_lut = config.use_lut_dequant and not torch.compiler.is_compiling()
+    is_scaled = False
+
     if elem_dtype in (torch.float8_e4m3fn, torch.float8_e5m2):
         data_hp = data_lp.to(target_dtype)
-    elif elem_dtype == DTYPE_FP6_E2M3:
-        data_hp = f6_e2m3_unpacked_to_f32(data_lp)
-        data_hp = data_hp.to(target_dtype)
-    elif elem_dtype == DTYPE_FP6_E3M2:
-        data_hp = f6_e3m2_unpacked_to_f32(data_lp)
-        data_hp = data_hp.to(target_dtype)
+    elif elem_dtype == torch.int8:
+        data_hp = data_lp.to(target_dtype) * 2**-INT8_FRAC_BITS
+    elif elem_dtype in (DTYPE_FP6_E2M3, DTYPE_FP6_E3M2):
+        if fp6_packed:
+            data_lp = unpack_uint6(data_lp)
+            # manually adjust shape to account for the unpacking
+            orig_shape = (*orig_shape[:-1], orig_shape[-1] // 3 * 4)
+        if use_lut:
+            data_hp = f4_or_f6_unpacked_to_scaled_dtype(
+                data_lp, scale_e8m0, elem_dtype, block_size, target_dtype
+            )
+            is_scaled = True
+        elif elem_dtype == DTYPE_FP6_E2M3:
+            data_hp = f6_e2m3_unpacked_to_f32(data_lp).to(target_dtype)
+        else:
+            data_hp = f6_e3m2_unpacked_to_f32(data_lp).to(target_dtype)
     elif elem_dtype == DTYPE_FP4:
         if config.use_fp4_custom_triton_dequant_kernel:
             data_hp_rescaled = triton_f4_to_scaled_bf16(
@@ -223,10 +291,16 @@ def to_dtype(data_lp, scale_e8m0, elem_dtype, block_size, target_dtype):
         else:
             # fp4
             f4_unpacked = unpack_uint4(data_lp)
-            # for now we only have a cast to f32
-            # TODO(future PR): add cast directly to bf16
-            f32 = f4_unpacked_to_f32(f4_unpacked)
-            data_hp = f32.to(target_dtype)
+            if use_lut:
+                data_hp = f4_or_f6_unpacked_to_scaled_dtype(
+                    f4_unpacked, scale_e8m0, elem_dtype, block_size, target_dtype
+                )
+                is_scaled = True
+            else:
+                # for now we only have a cast to f32
+                # TODO(future PR): add cast directly to bf16
+                f32 = f4_unpacked_to_f32(f4_unpacked)
+                data_hp = f32.to(target_dtype)
             # manually adjust shape to account for the unpacking
             # TODO(future PR): clean up the shape code and remove the hack
             # below
@@ -234,9 +308,10 @@ def to_dtype(data_lp, scale_e8m0, elem_dtype, block_size, target_dtype):
     else:
         raise AssertionError("unsupported")
 
-    data_hp = data_hp.reshape(-1, block_size)
-    s_fp = get_fp_scale(scale_e8m0).reshape(-1, 1).to(target_dtype)
-    data_hp = data_hp * s_fp
+    if not is_scaled:
+        data_hp = data_hp.reshape(-1, block_size)
+        s_fp = get_fp_scale(scale_e8m0).reshape(-1, 1).to(target_dtype)
+        data_hp = data_hp * s_fp
     data_hp = data_hp.reshape(orig_shape)
 
     # if we converted to row-major before unscaling convert back
@@ -264,6 +339,26 @@ def tensor_size_fp4x2_to_hp(orig_size, is_contiguous):
     return new_size
 
 
+def tensor_size_hp_to_fp6x4(orig_size, is_contiguous):
+    new_size = orig_size
+    if is_contiguous:
+        assert new_size[-1] % 4 == 0, f"{orig_size} last dim not divisible by four"
+        new_size = [*list(new_size[:-1]), new_size[-1] // 4 * 3]
+    else:
+        assert new_size[0] % 4 == 0, f"{orig_size} first dim not divisible by four"
+        new_size = [new_size[0] // 4 * 3, *list(new_size[1:])]
+    return new_size
+
+
+def tensor_size_fp6x4_to_hp(orig_size, is_contiguous):
+    new_size = orig_size
+    if is_contiguous:
+        new_size = [*list(new_size[:-1]), new_size[-1] // 3 * 4]
+    else:
+        new_size = [new_size[0] // 3 * 4, *list(new_size[1:])]
+    return new_size
+
+
 @torch._dynamo.allow_in_graph
 class ToMXConstrFunc(torch.autograd.Function):
     """
@@ -296,6 +391,7 @@ class FromMXConstrFunc(torch.autograd.Function):
             tensor_lp._elem_dtype,
             tensor_lp._block_size,
             target_dtype,
+            tensor_lp._fp6_packed,
         )
 
     @staticmethod
@@ -311,7 +407,17 @@ class MXTensor(torch.Tensor):
         elem_dtype,
         block_size,
         orig_dtype,
+        fp6_packed=None,
     ):
+        # fp6 elements are packed 4 per 3 bytes (see `pack_uint6`) or stored one
+        # per byte, if not specified this is inferred from the number of elements
+        if elem_dtype in (DTYPE_FP6_E2M3, DTYPE_FP6_E3M2):
+            if fp6_packed is None:
+                fp6_packed = (
+                    data_bits.numel() * 4 == scale_e8m0_bits.numel() * block_size * 3
+                )
+        else:
+            fp6_packed = False
         new_size = data_bits.size()
         if elem_dtype == DTYPE_FP4:
             # set the tensor size to what it would be without 2x4 packing
@@ -319,6 +425,12 @@ class MXTensor(torch.Tensor):
                 new_size,
                 data_bits.is_contiguous(),
             )
+        elif fp6_packed:
+            # set the tensor size to what it would be without 4x6 packing
+            new_size = tensor_size_fp6x4_to_hp(
+                new_size,
+                data_bits.is_contiguous(),
+            )
         self = torch.Tensor._make_wrapper_subclass(
             cls,
             new_size,
@@ -331,12 +443,16 @@ class MXTensor(torch.Tensor):
             torch.float8_e4m3fn,
             torch.float8_e5m2,
             torch.uint8,
+            torch.int8,
         ), "unsupported"
-        if elem_dtype in (
+        if fp6_packed:
+            target_numel = scale_e8m0_bits.numel() * block_size * 3 / 4
+        elif elem_dtype in (
             torch.float8_e4m3fn,
             torch.float8_e5m2,
             DTYPE_FP6_E2M3,
             DTYPE_FP6_E3M2,
+            torch.int8,
         ):
             target_numel = scale_e8m0_bits.numel() * block_size
         elif elem_dtype == DTYPE_FP4:
@@ -361,6 +477,7 @@ class MXTensor(torch.Tensor):
         self._elem_dtype = elem_dtype
         self._block_size = block_size
         self._orig_dtype = orig_dtype
+        self._fp6_packed = fp6_packed
         return self
 
     def __repr__(self):
@@ -394,6 +511,7 @@ class MXTensor(torch.Tensor):
             "_elem_dtype": self._elem_dtype,
             "_block_size": self._block_size,
             "_orig_dtype": self._orig_dtype,
+            "_fp6_packed": self._fp6_packed,
         }
         return ["_scale_e8m0", "_data"], ctx
 
@@ -410,6 +528,7 @@ class MXTensor(torch.Tensor):
             metadata["_elem_dtype"],
             metadata["_block_size"],
             metadata["_orig_dtype"],
+            metadata["_fp6_packed"],
         )
 
     # Do not force the MXTensor type on the returned tensor
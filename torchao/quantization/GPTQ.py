@@ -9,6 +9,9 @@
 # LICENSE file in the root directory of this source tree.
 
 import logging
+import os
+import shutil
+import tempfile
 from typing import Optional, List, Type
 
 import torch
@@ -23,6 +26,7 @@ from .utils import (
     _lm_eval_available,
     _MultiInput,
     TORCH_VERSION_AFTER_2_3,
+    TORCH_VERSION_AFTER_2_4,
     find_multiple,
 )
 from typing import Any, Dict, Optional
@@ -52,6 +56,37 @@ __all__ = [
 ] + add_ons
 
 
+def _add_batch_to_hessian(H, total_batches, x):
+    """
+    Adds a batch of activations `x` to the running average `H` of 2 * x x^T over
+    `total_batches` batches, returns the updated H and total_batches
+    """
+    shape = x.shape
+    n = 1 if len(shape) == 2 else shape[0]
+    H *= total_batches / (total_batches + n)
+    total_batches += n
+    x = ((2 / total_batches) ** (1 / 2)) * x.reshape(
+        -1, shape[-1]
+    ).t().float()
+    H += x.matmul(x.t())
+    return H, total_batches
+
+
+def _all_reduce_hessian(H, total_batches, process_group=None):
+    """
+    Combines the running averages `H` over `total_batches` batches of all the ranks in
+    `process_group` into the running average over the batches of all ranks
+    """
+    import torch.distributed as dist
+
+    H = H * total_batches
+    count = torch.tensor([total_batches], dtype=torch.float64, device=H.device)
+    dist.all_reduce(H, group=process_group)
+    dist.all_reduce(count, group=process_group)
+    total_batches = int(count.item())
+    return H / total_batches, total_batches
+
+
 class GenericGPTQRunner(fx.Interpreter):
     """
     This is a generic GPTQ runner that takes an existing model and applies GPTQ.
@@ -61,6 +96,19 @@ class GenericGPTQRunner(fx.Interpreter):
     into the state_dict so that the quantized model weights/qparams can be loaded
     directly into the model.
 
+    If `process_group` is given, the calibration inputs are expected to be sharded across the
+    ranks of the group, each rank runs the model on its shard and the Hessians of the ranks are
+    combined before quantizing each layer, so all ranks produce the same quantized weights.
+
+    If `offload_dir` is given, the output of every node for every calibration input is written to
+    a memory-mapped file in that directory as soon as it is computed, and only the mapped view is
+    kept. Peak anonymous host memory is then bounded by the activations of one node for one input
+    (plus the Hessian of the layer being quantized) rather than by the activations of all
+    calibration inputs. The spilled activations still count towards resident memory while their
+    pages are in the page cache, but they are file-backed and can be written back and dropped by
+    the kernel under memory pressure. The graph is still run one node at a time over all inputs,
+    there is no per transformer block calibration.
+
     intended to be used in concert with a GPTQQuantizer class to define the quantization mode.
     """
 
@@ -71,6 +119,8 @@ class GenericGPTQRunner(fx.Interpreter):
         blocksize=128,
         percdamp=0.01,
         groupsize=128,
+        offload_dir: Optional[str] = None,
+        process_group: Optional["torch.distributed.ProcessGroup"] = None,
     ):
 
         self.id_to_name = {
@@ -91,6 +141,10 @@ class GenericGPTQRunner(fx.Interpreter):
         self.percdamp = percdamp
 
         self.groupsize = groupsize
+        self.offload_dir = offload_dir
+        self.process_group = process_group
+        self._offload_run_dir = None
+        self._offload_count = 0
         self.inputs = inputs
         self.gptq_done = False
         self.debug = False
@@ -140,7 +194,36 @@ class GenericGPTQRunner(fx.Interpreter):
             self.get_qparams_func is not None
         ), "need to configure quantization mode before running"
         self.gptq_done = True
-        super().run(*self.inputs)
+        if self.offload_dir is None:
+            super().run(*self.inputs)
+            return
+        self._offload_run_dir = tempfile.mkdtemp(prefix="gptq_", dir=self.offload_dir)
+        try:
+            super().run(*self.inputs)
+        finally:
+            shutil.rmtree(self._offload_run_dir, ignore_errors=True)
+            self._offload_run_dir = None
+
+    def _offload(self, out):
+        """
+        Copies the output of a node for one input to a file and returns the memory-mapped view of
+        it, the pages are backed by the file so they can be dropped from host memory under pressure.
+        Returns `out` moved to cpu if offloading is disabled.
+        """
+        if self._offload_run_dir is None or out.numel() == 0:
+            return out.cpu()
+        path = os.path.join(self._offload_run_dir, f"{self._offload_count}.bin")
+        self._offload_count += 1
+        mapped = torch.from_file(path, shared=True, size=out.numel(), dtype=out.dtype).view(out.shape)
+        mapped.copy_(out)
+        try:
+            # the mapping stays valid after the file is removed and the disk space is
+            # reclaimed once the tensor is freed
+            os.remove(path)
+        except OSError:
+            # not supported on all platforms, the file is removed at the end of the run
+            pass
+        return mapped
 
     def get_quantized_state_dict(self):
         assert (
@@ -159,6 +242,9 @@ class GenericGPTQRunner(fx.Interpreter):
     def call_function(self, target, args, kwargs, already_quantized=False):  # noqa: C901
 
         def tensors_to_cuda(args):
+            # GPTQ runs on cpu if cuda is not available
+            if not torch.cuda.is_available():
+                return list(args)
             new_args = []
             for x in args:
                 new_args.append(x.cuda() if isinstance(x, torch.Tensor) else x)
@@ -216,14 +302,7 @@ class GenericGPTQRunner(fx.Interpreter):
             ):  # calculate H instead of output (will run the linear eventually with updated weight)
                 x = cur_args[0].float()
                 x = self.act_fake_quant_func(x)
-                shape = x.shape
-                n = 1 if len(shape) == 2 else shape[0]
-                H *= total_batches / (total_batches + n)
-                total_batches += n
-                x = ((2 / total_batches) ** (1 / 2)) * x.reshape(
-                    -1, shape[-1]
-                ).t().float()
-                H += x.matmul(x.t())
+                H, total_batches = _add_batch_to_hessian(H, total_batches, x)
             else:
                 # weight has already been quantized but still need to apply
                 # activation quant for final calculation
@@ -233,16 +312,27 @@ class GenericGPTQRunner(fx.Interpreter):
                 # get output if its not a linear
                 out = super().call_function(target, cur_args, cur_kwargs)
                 if isinstance(out, torch.Tensor):
-                    outputs.append(out.cpu())
+                    # spill every output as it is produced so the outputs for all inputs
+                    # are never in host memory at the same time
+                    outputs.append(self._offload(out) if has_multi_input else out.cpu())
                 else:
                     outputs.append(out)
+                del out
 
         if quantize_linear:
             mod_fqn = ".".join(self.id_to_name[id(args[1])].split(".")[:-1])
 
-            W = args[1].to(H.device)
+            if self.process_group is not None:
+                if not isinstance(H, torch.Tensor):
+                    # no calibration inputs on this rank
+                    columns = args[1].shape[1]
+                    H = torch.zeros(columns, columns, device=args[1].device)
+                H, total_batches = _all_reduce_hessian(H, total_batches, self.process_group)
+
+            # copy so that GPTQ does not update the weight of the model in place when it is already on H.device
+            W = args[1].to(H.device, copy=True)
 
-            Q, DQ, qparams = self.faster_quant(H, W.detach())
+            Q, DQ, qparams = self.vectorized_quant(H, W.detach())
             print(mod_fqn)
 
             #  `make_names_and_values_dict_func`.
@@ -278,7 +368,7 @@ class GenericGPTQRunner(fx.Interpreter):
                     "SQNR for QDQ (this should be inf)", SQNR(DQ, DQ_after)
                 )  # matches
                 print(
-                    "SQNR for weight (can be low)", SQNR(W, DQ.cuda())
+                    "SQNR for weight (can be low)", SQNR(W, DQ.to(W.device))
                 )  # fine to not match
                 print(
                     "SQNR for output with GPTQ (hopefully 35+)",
@@ -312,82 +402,121 @@ class GenericGPTQRunner(fx.Interpreter):
 
         return _MultiInput(outputs) if has_multi_input else outputs[0]
 
-    def faster_quant(self, H, W):
-        percdamp = self.percdamp
-        blocksize = self.blocksize
-        groupsize = self.groupsize
-        orig_dtype = W.dtype
+    def _prepare_hinv(self, H, W):
+        """
+        Returns W in float32 with the columns that no input reaches (zero diagonal of `H`) zeroed,
+        and the upper Cholesky factor of the inverse of the damped Hessian, `H` is updated in place.
+        """
         W = W.detach().float()
-        _, columns = W.shape[0], W.shape[1]
-        device = W.device
-
-        if groupsize == -1:
-
-            cur_qparams = self.get_qparams_func(W)
+        columns = W.shape[1]
         dead = torch.diag(H) == 0
         H[dead, dead] = 1
         W[:, dead] = 0
 
-        Losses = torch.zeros_like(W)
-        DQ = torch.zeros_like(W)
-
-        damp = percdamp * torch.mean(torch.diag(H))
-        diag = torch.arange(columns, device=device)
+        damp = self.percdamp * torch.mean(torch.diag(H))
+        diag = torch.arange(columns, device=W.device)
         H[diag, diag] += damp
         H = torch.linalg.cholesky(H)
         H = torch.cholesky_inverse(H)
         H = torch.linalg.cholesky(H, upper=True)
-        Hinv = H
+        return W, H
+
+    def faster_quant(self, H, W):
+        """
+        Alias of `vectorized_quant`, which computes the same Q, DQ and qparams as the former
+        column by column implementation of this method.
+        """
+        return self.vectorized_quant(H, W)
+
+    def _get_block_qparams(self, W, i1, i2):
+        """
+        Returns the qparams for all the groups that start in columns [i1, i2) of W, one qparams
+        object per group, with as few calls to get_qparams_func as possible.
+        """
+        groupsize = self.groupsize
+        columns = W.shape[1]
+        g1 = find_multiple(i1, groupsize)
+        if g1 >= i2:
+            return []
+        num_groups = (i2 - 1 - g1) // groupsize + 1
+        # only full groups can be batched, the last group of the weight can be smaller
+        num_full_groups = min(num_groups, (columns - g1) // groupsize)
+        qparams_list = []
+        if num_full_groups > 0:
+            qparams = self.get_qparams_func(W[:, g1 : g1 + num_full_groups * groupsize])
+            flat_qparams, spec = tree_flatten(qparams)
+            if all(
+                isinstance(x, torch.Tensor) and x.dim() == 2 and x.shape[1] == num_full_groups
+                for x in flat_qparams
+            ):
+                qparams_list = [
+                    tree_unflatten([x[:, g : g + 1] for x in flat_qparams], spec)
+                    for g in range(num_full_groups)
+                ]
+            else:
+                # qparams are not a pytree of [n, num_groups] tensors, we can't split them
+                qparams_list = [
+                    self.get_qparams_func(W[:, g1 + g * groupsize : g1 + (g + 1) * groupsize])
+                    for g in range(num_full_groups)
+                ]
+        for g in range(num_full_groups, num_groups):
+            start = g1 + g * groupsize
+            qparams_list.append(self.get_qparams_func(W[:, start : start + groupsize]))
+        return qparams_list
+
+    def vectorized_quant(self, H, W):
+        """
+        GPTQ over blocks of `blocksize` columns with less work per column than a column by
+        column implementation: the qparams for all the groups that start in a block are computed
+        at once and the block is stored transposed so that the column updates are contiguous
+        row updates. Runs on any device.
+        """
+        blocksize = self.blocksize
+        groupsize = self.groupsize
+        orig_dtype = W.dtype
+
+        if groupsize == -1:
+            # computed before the dead columns are zeroed
+            cur_qparams = self.get_qparams_func(W.detach().float())
+        W, Hinv = self._prepare_hinv(H, W)
+        columns = W.shape[1]
+        DQ = torch.zeros_like(W)
 
         all_qparams = []
         for i1 in range(0, columns, blocksize):
             i2 = min(i1 + blocksize, columns)
             count = i2 - i1
-            W1 = W[:, i1:i2].clone()
-            DQ1 = torch.zeros_like(W1)
-            Err1 = torch.zeros_like(W1)
-            Losses1 = torch.zeros_like(W1)
+            # the qparams of a group only depend on the weight at the start of the block
+            # that contains the start of the group, so they can be computed up front
+            if groupsize != -1:
+                block_qparams = self._get_block_qparams(W, i1, i2)
+                all_qparams.extend(block_qparams)
+                block_qparams = iter(block_qparams)
+
+            # transposed so that a column of the block is a contiguous row
+            W1t = W[:, i1:i2].t().contiguous()
+            DQ1t = torch.empty_like(W1t)
+            Err1t = torch.empty_like(W1t)
             Hinv1 = Hinv[i1:i2, i1:i2]
             for i in range(count):
-                w = W1[:, i]
-                d = Hinv1[i, i]
-
                 if groupsize != -1 and (i1 + i) % groupsize == 0:  # start of new group
-                    cur_qparams = self.get_qparams_func(
-                        W[:, (i1 + i) : (i1 + i + groupsize)]
-                    )
-                    all_qparams.append(cur_qparams)
-
-                q = self.quantize_func(w.unsqueeze(1), cur_qparams).flatten()
-
-                #  `dequantize_func`.
-
-                dq = self.dequantize_func(q.unsqueeze(1), cur_qparams).flatten()
-
-                DQ1[:, i] = dq
-                Losses1[:, i] = (w - dq) ** 2 / d**2
-
-                err1 = (w - dq) / d
-                W1[:, i:] -= (
-                    err1.to(Hinv1.dtype).unsqueeze(1).matmul(Hinv1[i, i:].unsqueeze(0))
-                )
-                Err1[:, i] = err1
+                    cur_qparams = next(block_qparams)
 
-            DQ[:, i1:i2] = DQ1
-            Losses[:, i1:i2] = Losses1 / 2
+                w = W1t[i]
+                q = self.quantize_func(w.unsqueeze(1), cur_qparams)
+                dq = self.dequantize_func(q, cur_qparams).flatten()
+                DQ1t[i] = dq
 
-            W[:, i2:] -= Err1.to(Hinv.dtype).matmul(Hinv[i1:i2, i2:])
+                err1 = torch.sub(w, dq, out=Err1t[i]).div_(Hinv1[i, i])
+                # rank 1 update of the remaining columns of the block
+                W1t[i + 1 :] -= Hinv1[i, i + 1 :].unsqueeze(1) * err1
 
-        torch.cuda.synchronize()
+            DQ[:, i1:i2] = DQ1t.t()
+            W[:, i2:] -= Err1t.t().contiguous().matmul(Hinv[i1:i2, i2:])
 
         if all_qparams == []:
-
             all_qparams.append(cur_qparams)
 
-        # convert a list of qparams objects into a single one. enerally by
-        # concatenating a bunch of n,1 scale/zeros tensors into a n,num_groups tensor
-
-        #  `combine_qparams_list_func`.
         all_qparams = self.combine_qparams_list_func(all_qparams)
         Q = self.quantize_func(DQ, all_qparams)
         return Q, DQ.to(orig_dtype), all_qparams
@@ -484,6 +613,8 @@ class GPTQQuantizer(Quantizer):
         blocksize,
         percdamp,
         groupsize,
+        offload_dir=None,
+        process_group=None,
         #  `typing.Dict[<key type>, <value type>]` to avoid runtime subscripting errors.
     ) -> Dict:
         print("Tracing model for GPTQ")
@@ -493,6 +624,8 @@ class GPTQQuantizer(Quantizer):
             blocksize,
             percdamp,
             groupsize,
+            offload_dir=offload_dir,
+            process_group=process_group,
         ).configure_quantization_mode(
             self.get_qparams_func,  # pyre-ignore[16]
             self.quantize_func,  # pyre-ignore[16]
@@ -747,6 +880,8 @@ class Int4WeightOnlyGPTQQuantizer(GPTQQuantizer):
                 self.blocksize,
                 self.percdamp,
                 self.groupsize,
+                offload_dir=kwargs.get("offload_dir", None),
+                process_group=kwargs.get("process_group", None),
             )
             model = self._convert_for_runtime(model)
             model.load_state_dict(state_dict, strict=False)
@@ -759,6 +894,7 @@ if TORCH_VERSION_AFTER_2_3:
         group_quantize_tensor_symmetric,
         per_token_dynamic_quant,
     )
+    from torchao.dtypes.utils import pack_bits, unpack_bits
 
     def linear_forward_8da4w(
         x,
@@ -799,6 +935,85 @@ if TORCH_VERSION_AFTER_2_3:
 
         return c
 
+    def pack_int4_weight(weight_int8: torch.Tensor) -> torch.Tensor:
+        """
+        Packs a (out_features, in_features) int8 tensor of int4 values in [-8, 7] into a
+        (out_features, in_features // 2) uint8 tensor, two values (offset by 8) per byte,
+        the first one in the most significant bits
+        """
+        return pack_bits((weight_int8.to(torch.int16) + 8).to(torch.uint8), 4)
+
+    def unpack_int4_weight(weight_int4packed: torch.Tensor, in_features: int) -> torch.Tensor:
+        """
+        Inverse of `pack_int4_weight`, returns a (out_features, in_features) int8 tensor
+        """
+        return unpack_bits(weight_int4packed, 4, in_features).to(torch.int8) - 8
+
+    def linear_forward_8da4w_packed(
+        x,
+        weight_int4packed,
+        scales,
+        zeros,
+        out_features,
+        groupsize,
+        precision,
+    ):
+        """
+        Integer domain implementation of `linear_forward_8da4w` for weights packed with `pack_int4_weight`,
+        the activation is quantized per token to int8 and multiplied with the int4 weight with one
+        int8 x int8 -> int32 GEMM (`torch._int_mm`) per group, the group scales are applied to the int32
+        partial sums and the zero point corrections are applied once after the loop over the groups.
+        The weight is never unpacked in order: the high nibbles (even columns) and low nibbles (odd columns)
+        of every group are split into its first and second half, and the activation is reordered to match.
+        Requires torch 2.4+ for the cpu `torch._int_mm` kernel.
+        """
+        assert TORCH_VERSION_AFTER_2_4, "packed 8da4w linear requires torch 2.4+ for torch._int_mm on cpu"
+        origin_x_size = x.size()
+        x = x.reshape(-1, origin_x_size[-1])
+        m, in_features = x.shape
+        n_groups = in_features // groupsize
+        half_groupsize = groupsize // 2
+        x_scales, x_zero_points = torch.ops.quantized_decomposed.choose_qparams_per_token_asymmetric(
+            x, torch.int8
+        )
+        x_int8 = torch.ops.quantized_decomposed.quantize_per_token(
+            x, x_scales, x_zero_points, -128, 127, torch.int8
+        )
+        x_sums = x_int8.view(m, n_groups, groupsize).sum(dim=-1, dtype=torch.int32).to(torch.float32)
+        # an extra row of ones computes the per group sums of the weight in the same GEMMs,
+        # torch._int_mm requires more than 16 rows on cuda
+        x_int8 = torch.cat([x_int8, torch.ones(1, in_features, dtype=torch.int8, device=x.device)])
+        if x_int8.is_cuda and m < 16:
+            x_int8 = F.pad(x_int8, (0, 0, 0, 16 - m))
+        rows = x_int8.shape[0]
+        x_split = torch.cat(
+            [
+                x_int8[:, 0::2].reshape(rows, n_groups, half_groupsize),
+                x_int8[:, 1::2].reshape(rows, n_groups, half_groupsize),
+            ],
+            dim=-1,
+        )
+        # the packed nibbles are the int4 values offset by 8, i.e. quantized with the zero points zeros + 8
+        w_packed = weight_int4packed.view(out_features, n_groups, half_groupsize)
+        w_split = torch.empty(out_features, n_groups, groupsize, dtype=torch.uint8, device=x.device)
+        torch.bitwise_right_shift(w_packed, 4, out=w_split[..., :half_groupsize])
+        torch.bitwise_and(w_packed, 0xF, out=w_split[..., half_groupsize:])
+        w_split = w_split.view(torch.int8)
+        scales = scales.to(torch.float32)
+
+        acc = torch.zeros(rows, out_features, dtype=torch.float32, device=x.device)
+        for g in range(n_groups):
+            acc += torch._int_mm(x_split[:, g], w_split[:, g].t()).to(torch.float32) * scales[:, g]
+
+        # sum_k (x - x_zp) * (w - w_zp) = sum_k x * w - x_zp * sum_k w - w_zp * (sum_k x - groupsize * x_zp),
+        # row m of acc is the sum over the groups of scale * sum_k w
+        x_zero_points = x_zero_points.to(torch.float32)
+        w_zero_points = zeros.to(torch.float32) + 8
+        c = acc[:m] - x_zero_points * acc[m]
+        c -= (x_sums - groupsize * x_zero_points) @ (w_zero_points * scales).t()
+        c = (c * x_scales.to(torch.float32)).to(precision)
+        return c.reshape(*origin_x_size[:-1], out_features)
+
     class Int8DynActInt4WeightLinear(torch.nn.Module):
         __constants__ = ["in_features", "out_features"]
 
@@ -813,6 +1028,8 @@ if TORCH_VERSION_AFTER_2_3:
         precision: precision of input and output. e.g. torch.float32 means input
         activation is float32 and output is float32.
         scales_precision: precision of per group scale.
+        packed: store the weight as packed int4 (two values per uint8, see `pack_int4_weight`)
+        instead of unpacked int8, and run the integer domain `linear_forward_8da4w_packed`.
         """
 
         def __init__(
@@ -825,6 +1042,7 @@ if TORCH_VERSION_AFTER_2_3:
             groupsize: int = 256,
             precision: torch.dtype = torch.float32,
             scales_precision: torch.dtype = torch.float32,
+            packed: bool = False,
         ) -> None:
             super().__init__()
             # always pad if needed since it becomes a noop at runtime if not needed
@@ -844,12 +1062,21 @@ if TORCH_VERSION_AFTER_2_3:
             # output precision of the dynamically quantized linear layer
             # that his module represents.
             self.precision = precision
-
-            # currently storing unpacked int8 weights
-            self.register_buffer(
-                "weight",
-                torch.empty((out_features, in_features), dtype=torch.int8),
-            )
+            self.packed = packed
+
+            if packed:
+                assert TORCH_VERSION_AFTER_2_4, "packed int4 weights require torch 2.4+"
+                assert groupsize % 2 == 0, f"require groupsize:{groupsize} % 2 == 0 for packed int4 weights"
+                self.register_buffer(
+                    "weight",
+                    torch.empty((out_features, in_features // 2), dtype=torch.uint8),
+                )
+            else:
+                # unpacked int8 weights
+                self.register_buffer(
+                    "weight",
+                    torch.empty((out_features, in_features), dtype=torch.int8),
+                )
             self.register_buffer(
                 "scales",
                 torch.empty(
@@ -869,7 +1096,8 @@ if TORCH_VERSION_AFTER_2_3:
             input = input.to(self.precision)
             # padding is removed for perf
             # input = F.pad(input, pad=(0, self.in_features - self.origin_in_features))
-            return linear_forward_8da4w(
+            forward = linear_forward_8da4w_packed if self.packed else linear_forward_8da4w
+            return forward(
                 input,
                 self.weight,
                 self.scales,
@@ -887,6 +1115,7 @@ if TORCH_VERSION_AFTER_2_3:
         scales_precision: torch.dtype,
         linear_class: Type[torch.nn.Module],
         copy_weights: bool = False,
+        **linear_kwargs: Any,
     ):
         for name, child in module.named_children():
             if isinstance(child, nn.Linear):
@@ -899,6 +1128,7 @@ if TORCH_VERSION_AFTER_2_3:
                         groupsize=groupsize,
                         precision=precision,
                         scales_precision=scales_precision,
+                        **linear_kwargs,
                     )
                     # In distributed training, the model may be instantiated
                     # on the meta device, in which case there is no need to
@@ -915,6 +1145,7 @@ if TORCH_VERSION_AFTER_2_3:
                     scales_precision,
                     linear_class,
                     copy_weights,
+                    **linear_kwargs,
                 )
 
     def replace_linear_8da4w(
@@ -923,6 +1154,7 @@ if TORCH_VERSION_AFTER_2_3:
         padding_allowed: bool,
         precision: torch.dtype,
         scales_precision: torch.dtype,
+        packed: bool = False,
     ):
         _replace_linear_8da4w(
             module,
@@ -931,6 +1163,7 @@ if TORCH_VERSION_AFTER_2_3:
             precision,
             scales_precision,
             Int8DynActInt4WeightLinear,
+            packed=packed,
         )
 
     class Int8DynActInt4WeightQuantizer(Quantizer):
@@ -940,12 +1173,14 @@ if TORCH_VERSION_AFTER_2_3:
             padding_allowed: bool = False,
             precision: torch.dtype = torch.float32,
             scales_precision: torch.dtype = torch.float32,
+            packed: bool = False,
         ) -> None:
             super().__init__()
             self.groupsize: int = groupsize
             self.padding_allowed: bool = padding_allowed
             self.precision: torch.dtype = precision
             self.scales_precision: torch.dtype = scales_precision
+            self.packed: bool = packed
 
         @torch.no_grad()
         def _create_quantized_state_dict(
@@ -986,6 +1221,8 @@ if TORCH_VERSION_AFTER_2_3:
                         self.groupsize,
                         self.scales_precision,
                     )
+                    if self.packed:
+                        weight_int8 = pack_int4_weight(weight_int8)
                     cur_state_dict[f"{fqn}.weight"] = weight_int8.to("cpu")
                     cur_state_dict[f"{fqn}.scales"] = scales.to("cpu")
                     cur_state_dict[f"{fqn}.zeros"] = zeros.to("cpu")
@@ -1000,6 +1237,7 @@ if TORCH_VERSION_AFTER_2_3:
                 self.padding_allowed,
                 self.precision,
                 self.precision,
+                self.packed,
             )
             return model
 
@@ -1093,6 +1331,8 @@ if TORCH_VERSION_AFTER_2_3:
                 self.blocksize,
                 self.percdamp,
                 self.groupsize,
+                offload_dir=kwargs.get("offload_dir", None),
+                process_group=kwargs.get("process_group", None),
             )
             model = self._convert_for_runtime(model)
             model.load_state_dict(state_dict, strict=False)
@@ -30,6 +30,11 @@ __all__ = [
     "autoquant",
     "change_linears_to_autoquantizable",
     "change_autoquantizable_to_quantized",
+    "AutoQuantCacheStore",
+    "AutoQuantFileCacheStore",
+    "set_autoquant_cache_store",
+    "export_autoquant_cache",
+    "import_autoquant_cache",
     "quant_int8_dynamic_linear",
     "quant_int8_matmul",
     "quant_int8_dynamic_per_token_linear",
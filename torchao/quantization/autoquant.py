@@ -1,3 +1,11 @@
+import json
+import logging
+import os
+import platform
+import statistics
+import time
+from typing import Dict, Optional
+
 import torch
 from .subclass import ( # noqa
     Int8DynamicallyQuantizedLinearWeight,
@@ -10,21 +18,206 @@ from .quant_primitives import (
     safe_int_mm,
 )
 from .utils import TORCH_VERSION_AFTER_2_4
+from torchao.utils import atomic_write, file_lock
 import torch.nn.functional as F
 try:
     from torch._inductor.utils import do_bench
 except:
     from torch._inductor.runtime.runtime_utils import do_bench
-
 aten = torch.ops.aten
 
+logger = logging.getLogger(__name__)
+
 AUTOQUANT_CACHE = {}
 
+# optional persistent store that check_cache and update_cache read through, see
+# `set_autoquant_cache_store`
+_AUTOQUANT_CACHE_STORE = None
+
 def check_cache(cls, shapes_and_dtype):
-    return AUTOQUANT_CACHE.get((cls,)+shapes_and_dtype, None)
+    key = (cls,)+shapes_and_dtype
+    res = AUTOQUANT_CACHE.get(key, None)
+    if res is None and _AUTOQUANT_CACHE_STORE is not None:
+        res = _AUTOQUANT_CACHE_STORE.get(key)
+        if res is not None:
+            AUTOQUANT_CACHE[key] = res
+    return res
 
 def update_cache(cls, shapes_and_dtype, res):
-    AUTOQUANT_CACHE[(cls,)+shapes_and_dtype] = res
+    key = (cls,)+shapes_and_dtype
+    AUTOQUANT_CACHE[key] = res
+    # None is only used as a placeholder for combinations that are not benchmarked yet
+    if res is not None and _AUTOQUANT_CACHE_STORE is not None:
+        _AUTOQUANT_CACHE_STORE.put(key, res)
+
+_AUTOQUANT_CACHE_FORMAT_VERSION = 1
+
+def _get_cls_name(cls):
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+def _get_device_name(device=None):
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    device = torch.device(device)
+    if device.type == "cuda":
+        return torch.cuda.get_device_name(device)
+    return f"{device.type}:{platform.machine()}:{platform.processor()}"
+
+def _get_cache_version(qtensor_class_list, device=None):
+    """The persisted benchmark results are only valid for the same torch version, device and
+    class set (the result for a class depends on the time to beat from the other classes)
+    """
+    return {
+        "format_version": _AUTOQUANT_CACHE_FORMAT_VERSION,
+        "torch_version": torch.__version__,
+        "device_name": _get_device_name(device),
+        "class_set": sorted(_get_cls_name(cls) for cls in qtensor_class_list),
+    }
+
+def _serialize_cache_key(key) -> str:
+    cls, act_shape, w_shape, bias_shape, dtype = key
+    return json.dumps([
+        _get_cls_name(cls),
+        list(act_shape),
+        list(w_shape),
+        None if bias_shape is None else list(bias_shape),
+        str(dtype),
+    ])
+
+def _deserialize_cache_key(serialized_key: str, name_to_cls: Dict[str, type]):
+    cls_name, act_shape, w_shape, bias_shape, dtype = json.loads(serialized_key)
+    if cls_name not in name_to_cls:
+        return None
+    return (
+        name_to_cls[cls_name],
+        torch.Size(act_shape),
+        torch.Size(w_shape),
+        None if bias_shape is None else torch.Size(bias_shape),
+        getattr(torch, dtype[len("torch."):]),
+    )
+
+def _read_cache_file(path, version) -> Dict[str, float]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        data = json.load(f)
+    if data.get("version") != version:
+        logger.warning(
+            f"ignoring autoquant cache {path} since it was created with {data.get('version')}, "
+            f"expected {version}"
+        )
+        return {}
+    return data["results"]
+
+def _write_cache_file(path, version, results: Dict[str, float]):
+    with atomic_write(path) as f:
+        json.dump({"version": version, "results": results}, f, indent=1, sort_keys=True)
+
+class AutoQuantCacheStore:
+    """
+    Interface for a persistent store of autoquant benchmark results, `check_cache` reads through
+    the store when a result is not in `AUTOQUANT_CACHE` and `update_cache` writes new results to it.
+    Keys are the same as the keys of `AUTOQUANT_CACHE`: (cls, act_shape, weight_shape, bias_shape, dtype)
+
+    Stores may buffer the results of `put` until `flush`, which autoquant calls once it is done
+    benchmarking.
+    """
+    def get(self, key) -> Optional[float]:
+        raise NotImplementedError
+
+    def put(self, key, res: float):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+class AutoQuantFileCacheStore(AutoQuantCacheStore):
+    """
+    File backed store for autoquant benchmark results, the results are saved as json together
+    with the torch version, device name and class set they are valid for, a file that was created
+    with a different version is ignored (and overwritten by new results). New results are kept in
+    memory until `flush`, which merges them with the results written by other processes since the
+    file was read.
+
+    Args:
+        path (str): path of the cache file
+        qtensor_class_list (list, optional): the classes autoquant chooses from. Defaults to DEFAULT_CLASS_LIST.
+        device (optional): device the benchmarks run on, defaults to cuda if available, otherwise cpu
+    """
+    def __init__(self, path, qtensor_class_list=None, device=None):
+        self.path = path
+        self.version = _get_cache_version(DEFAULT_CLASS_LIST if qtensor_class_list is None else qtensor_class_list, device)
+        self.results = _read_cache_file(path, self.version)
+        self.dirty = False
+
+    def get(self, key) -> Optional[float]:
+        return self.results.get(_serialize_cache_key(key), None)
+
+    def put(self, key, res: float):
+        serialized_key = _serialize_cache_key(key)
+        if self.results.get(serialized_key, None) == res:
+            return
+        self.results[serialized_key] = res
+        self.dirty = True
+
+    def flush(self):
+        if not self.dirty:
+            return
+        with file_lock(self.path):
+            # merge with results written by other processes since we last read the file
+            self.results = {**_read_cache_file(self.path, self.version), **self.results}
+            _write_cache_file(self.path, self.version, self.results)
+        self.dirty = False
+
+def set_autoquant_cache_store(store: Optional[AutoQuantCacheStore]):
+    """
+    Sets the persistent store that autoquant reads benchmark results from and writes new
+    benchmark results to, use None to only keep results in memory (the default)
+
+    Example usage:
+        set_autoquant_cache_store(AutoQuantFileCacheStore("autoquant_cache.json"))
+        torchao.autoquant(torch.compile(model))
+        model(*example_input)
+    """
+    global _AUTOQUANT_CACHE_STORE
+    _AUTOQUANT_CACHE_STORE = store
+
+def export_autoquant_cache(path, qtensor_class_list=None, device=None):
+    """
+    Saves the benchmark results in `AUTOQUANT_CACHE` to `path`, so that they can be loaded with
+    `import_autoquant_cache` (e.g. precomputed once and shipped with the model)
+
+    Returns:
+        int: number of exported results
+    """
+    qtensor_class_list = DEFAULT_CLASS_LIST if qtensor_class_list is None else qtensor_class_list
+    version = _get_cache_version(qtensor_class_list, device)
+    results = {
+        _serialize_cache_key(key): res for key, res in AUTOQUANT_CACHE.items()
+        if res is not None and key[0] in qtensor_class_list
+    }
+    with file_lock(path):
+        _write_cache_file(path, version, results)
+    return len(results)
+
+def import_autoquant_cache(path, qtensor_class_list=None, device=None):
+    """
+    Loads the benchmark results saved by `export_autoquant_cache` into `AUTOQUANT_CACHE`, results
+    from a different torch version, device or class set are ignored
+
+    Returns:
+        int: number of imported results
+    """
+    qtensor_class_list = DEFAULT_CLASS_LIST if qtensor_class_list is None else qtensor_class_list
+    version = _get_cache_version(qtensor_class_list, device)
+    name_to_cls = {_get_cls_name(cls): cls for cls in qtensor_class_list}
+    num_imported = 0
+    for serialized_key, res in _read_cache_file(path, version).items():
+        key = _deserialize_cache_key(serialized_key, name_to_cls)
+        if key is not None:
+            AUTOQUANT_CACHE[key] = res
+            num_imported += 1
+    return num_imported
 
 # TODO: Document the methods
 class AutoQuantizableLinearWeight(torch.Tensor):
@@ -80,14 +273,26 @@ class AutoQuantizableLinearWeight(torch.Tensor):
     def tune_autoquant(self, q_cls, shapes_and_dtype, best_time):
         act_shape, w_shape, bias_shape, act_dtype = shapes_and_dtype
         if check_cache(q_cls, shapes_and_dtype) is None:
+            start = time.monotonic()
             with torch.no_grad():
                 act_mat = torch.randn(act_shape, dtype=act_dtype, device=self.device)
                 bias = None if bias_shape is None else torch.randn(bias_shape, dtype=act_dtype, device=self.device)
                 res = q_cls._autoquant_test(act_mat, self.weight, bias, best_time, self.mode)
                 update_cache(q_cls, shapes_and_dtype, res)
+            logger.debug(f"tuning {q_cls.__name__} for {shapes_and_dtype} took {time.monotonic() - start:0.1f}s")
 
     @torch.no_grad()
-    def to_quantized(self, error_on_unseen, **kwargs):
+    def to_quantized(self, error_on_unseen, tune_missing=True, **kwargs):
+        """
+        Picks the class with the lowest total time over the logged shapes (weighted by the number of
+        times each shape was seen) and returns the weight quantized with it.
+
+        Args:
+            error_on_unseen (bool): raise an error if the weight has no logged shapes, otherwise the
+                weight is left unquantized
+            tune_missing (bool): benchmark (class, shape) combinations that are not in the cache yet,
+                if False they are treated as unavailable, e.g. when the tuning time budget is exhausted
+        """
         if error_on_unseen and self.logged_data == {}:
             raise RuntimeError("must run module normally to get shape, dtype info for autoquant")
         elif (self.logged_data == {}) and not error_on_unseen:
@@ -95,55 +300,42 @@ class AutoQuantizableLinearWeight(torch.Tensor):
             self = AQFloatLinearWeight.from_float(self.weight)
             return self
 
-
-        # only want to do shape+final print a single time if multiple layers
-        # see/have same shapes so we gate on check_cache being empty for
-        # at least one of the class/shape combinations.
-        do_final_print = False
-        print_once = True
-
-        def count_shapes(self, do_print=True):
-            differe_shape_count=0
-            for shapes_and_dtype, times_seen in self.logged_data.items():
-                differe_shape_count += 1
-                if do_print:
-                    act_shape, weight_shape, bias_shape, dtype = shapes_and_dtype
-                    print(f"activation_shapes: {act_shape}, times_seen: {times_seen}")
-            if do_print:
-                print(f"weight_shape: {weight_shape}, dtype: {dtype}, bias_shape: {bias_shape}")
-            return differe_shape_count
+        shape_count = len(self.logged_data)
+        for shapes_and_dtype, times_seen in self.logged_data.items():
+            act_shape, weight_shape, bias_shape, dtype = shapes_and_dtype
+            logger.debug(f"activation_shapes: {act_shape}, times_seen: {times_seen}")
+        logger.debug(f"weight_shape: {weight_shape}, dtype: {dtype}, bias_shape: {bias_shape}")
 
         # check each class
         best_time = torch.inf
         best_cls = None
         for q_cls in self.qtensor_class_list:
             # for each logged shape+dtype, benchmark
-            cur_time=0
-            shape_count = count_shapes(self, do_print=False)
+            cur_time = 0
             for shapes_and_dtype, times_seen in self.logged_data.items():
-                if check_cache(q_cls, shapes_and_dtype) is None:
-                    # only do final print if we have to autotune at least one cls/shape pair
-                    do_final_print=True
-
-                    # only print shapes once
-                    if print_once == True:
-                        print_once = False
-                        count_shapes(self, do_print=True)
-
+                if check_cache(q_cls, shapes_and_dtype) is None and tune_missing:
                     time_for_best_shape = check_cache(best_cls, shapes_and_dtype)
                     time_for_best_shape = torch.inf if time_for_best_shape is None else time_for_best_shape
                     self.tune_autoquant(q_cls, shapes_and_dtype, time_for_best_shape)
                     torch._dynamo.reset()
-                cur_time += check_cache(q_cls, shapes_and_dtype) * times_seen
-            if shape_count is not None and shape_count > 1:
-                print(f">time (all shapes): {cur_time:0.3f}ms for {q_cls}, prev_best: {best_time:0.3f}ms")
-            if best_time >= cur_time:
+                res = check_cache(q_cls, shapes_and_dtype)
+                if res is None:
+                    # not benchmarked within the time budget
+                    cur_time = torch.inf
+                    break
+                cur_time += res * times_seen
+                if cur_time > best_time:
+                    # already provably worse than the current best, no need to benchmark the remaining shapes
+                    break
+            if shape_count > 1:
+                logger.debug(f">time (all shapes): {cur_time:0.3f}ms for {q_cls}, prev_best: {best_time:0.3f}ms")
+            if cur_time != torch.inf and best_time >= cur_time:
                 best_time = cur_time
                 best_cls = q_cls
-        # only print if this is the first time seeing some cls+shape combo,
-        # otherwise we will print the same thing for every layer.
-        if do_final_print:
-            print(f"best_cls={best_cls}\n")
+        if best_cls is None:
+            logger.warning(f"no benchmark results for weight of shape {self.shape}, leaving it unquantized")
+            best_cls = AQFloatLinearWeight
+        logger.info(f"best_cls={best_cls} for weight of shape {self.shape}")
         # TODO handle random cls args/kwargs? or should they be curried?
         self = best_cls.from_float(self.weight)
         return self
@@ -182,20 +374,35 @@ class AutoQuantizableLinearWeight(torch.Tensor):
             with torch._C.DisableTorchFunctionSubclass():
                 return func(*args, **kwargs)
         except:
-            print(f"ERR: subclass doesn't implement {func}")
+            logger.error(f"ERR: subclass doesn't implement {func}")
 
     @classmethod
     def __torch_dispatch__(cls, func, types, args, kwargs):
          if func is aten.detach.default:
             return return_and_correct_aliasing(func, args, kwargs, args[0]._apply_fn_to_data(torch.detach))
 
+def _get_bench_device(args):
+    for arg in args:
+        if isinstance(arg, torch.Tensor):
+            return arg.device
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
 @torch.no_grad()
 def do_autoquant_bench(op, *args, **kwargs):
     """
-    runs benchmark op(*args, **kwargs) avoiding torch.compile overhead
+    runs benchmark op(*args, **kwargs) avoiding torch.compile overhead, returns the median time in ms
+
+    The timing backend is chosen based on `device` (defaults to the device of the first Tensor argument),
+    cuda devices are benchmarked with cuda graphs, other devices with wall-clock timing, see
+    `_do_autoquant_bench_wall_clock`
     """
     rep = kwargs.pop("rep", 100)
     warmup = kwargs.pop("warmup", 25)
+    device = kwargs.pop("device", None)
+    device = _get_bench_device(args) if device is None else torch.device(device)
+    if device.type != "cuda":
+        return _do_autoquant_bench_wall_clock(op, *args, warmup=warmup, rep=rep, **kwargs)
+
     with torch.no_grad():
         torch.cuda.synchronize()
         stream = torch.cuda.Stream()
@@ -216,6 +423,35 @@ def do_autoquant_bench(op, *args, **kwargs):
             res = do_bench(lambda: graph.replay(), warmup=warmup, rep=rep, return_mode="median")
     return res
 
+@torch.no_grad()
+def _do_autoquant_bench_wall_clock(op, *args, warmup=25, rep=100, **kwargs):
+    """
+    benchmarks op(*args, **kwargs) with wall-clock timing, this is used for devices without cuda graphs
+    (e.g. cpu). Same as `do_bench`, `warmup` and `rep` are the time budgets in ms for warmup and for
+    measurement, the median of the per iteration times is returned so that outliers (e.g. from other
+    processes on the host) don't affect the result
+    """
+    # the first call is not timed, it might trigger compilation
+    op(*args, **kwargs)
+
+    # estimate the time of a single call to decide on the number of iterations
+    start = time.perf_counter()
+    for _ in range(5):
+        op(*args, **kwargs)
+    estimate_ms = max((time.perf_counter() - start) * 1000 / 5, 1e-6)
+    n_warmup = max(1, int(warmup / estimate_ms))
+    n_repeat = max(1, int(rep / estimate_ms))
+
+    for _ in range(n_warmup):
+        op(*args, **kwargs)
+
+    times = []
+    for _ in range(n_repeat):
+        start = time.perf_counter()
+        op(*args, **kwargs)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
 def _is_interpolate_mode(mode):
     if isinstance(mode, list) and mode[0]=="interpolate" and len(mode)==2 and isinstance(mode[1], float):
         return True
@@ -244,11 +480,11 @@ class AQMixin():
         else:
             func = lambda a,b,c: F.relu(cls._quantized_op(F.relu(a), b, c))
             q_c_op = torch.compile(func, mode="max-autotune-no-cudagraphs")
-        res = do_autoquant_bench(q_c_op, act_mat, w_qtensor, bias, warmup=25, rep=100)
+        res = do_autoquant_bench(q_c_op, act_mat, w_qtensor, bias, warmup=25, rep=100, device=weight.device)
         if res < best_time*1.1:
-            res2 = do_autoquant_bench(q_c_op, act_mat, w_qtensor, bias, warmup=25, rep=900)
+            res2 = do_autoquant_bench(q_c_op, act_mat, w_qtensor, bias, warmup=25, rep=900, device=weight.device)
             res=(res2*.9+res*.1)
-        print(f">>time: {res:0.3f}ms for {cls}, to_beat: {best_time:0.3f}ms ")
+        logger.debug(f">>time: {res:0.3f}ms for {cls}, to_beat: {best_time:0.3f}ms ")
         return res
 
 class AQInt8DynamicallyQuantizedLinearWeight(AQMixin, Int8DynamicallyQuantizedLinearWeight):
@@ -286,8 +522,8 @@ class AQInt8DynamicallyQuantizedLinearWeight(AQMixin, Int8DynamicallyQuantizedLi
         )
         q_c_matmul=torch.compile(quantized_matmul, mode="max-autotune-no-cudagraphs")
         with torch.no_grad():
-            res_matmul = do_autoquant_bench(q_c_matmul, x_vals_int8, x_scales.reshape(-1,1), w_qtensor.int_data)
-        print(f">>time: {res_matmul:0.3f}ms for {cls} matmul, to_beat: {best_time:0.3f}ms")
+            res_matmul = do_autoquant_bench(q_c_matmul, x_vals_int8, x_scales.reshape(-1,1), w_qtensor.int_data, device=weight.device)
+        logger.debug(f">>time: {res_matmul:0.3f}ms for {cls} matmul, to_beat: {best_time:0.3f}ms")
 
         # if the (much faster) matmul kernel is already beat, don't bother benchmarking full op
         if res_matmul>=best_time:
@@ -298,7 +534,7 @@ class AQInt8DynamicallyQuantizedLinearWeight(AQMixin, Int8DynamicallyQuantizedLi
         res = super()._autoquant_test(act_mat, weight, bias, to_beat)
         max_int_const_win = (best_time-res_matmul)/(res-res_matmul)
         res_f = INTERPOLATION_CONSTANT*res+(1-INTERPOLATION_CONSTANT)*res_matmul
-        print(f">>time: {res_f:0.3f}ms for {cls} interpolated, breakeven constant: {max_int_const_win:0.2f}")
+        logger.debug(f">>time: {res_f:0.3f}ms for {cls} interpolated, breakeven constant: {max_int_const_win:0.2f}")
         return res_f
 
 class AQWeightOnlyQuantizedLinearWeight(Int8WeightOnlyQuantizedLinearWeight, AQMixin):
@@ -390,6 +626,7 @@ def change_linears_to_autoquantizable(model, **kwargs):
     from torchao.quantization.quant_api import _is_linear
     filter_fn = kwargs.pop("filter_fn", _is_linear)
     _ = kwargs.pop("error_on_unseen", True) # same kwargs used for this and to_quantized
+    _ = kwargs.pop("time_budget", None)
     kwargs["qtensor_class_list"] = kwargs.get("qtensor_class_list", DEFAULT_CLASS_LIST)
     kwargs["mode"] = kwargs.get("mode", ["relu", None])
     from torchao.quantization.quant_api import _replace_with_custom_fn_if_matches_filter
@@ -400,12 +637,77 @@ def change_linears_to_autoquantizable(model, **kwargs):
         filter_fn if filter_fn is not None else _is_linear,
     )
 
+@torch.no_grad()
+def _autoquant_tune_all(autoquant_weights, time_budget=None):
+    """
+    Benchmarks the (class, shape) combinations of all `autoquant_weights` up front, each combination
+    is benchmarked once even if it's seen by many layers. For each shape, classes are benchmarked in
+    order with the best time so far as the time to beat, so that classes that are clearly worse skip the
+    longer benchmark run.
+
+    Benchmarks run one at a time since concurrent runs on the same device would skew the timings.
+
+    Args:
+        autoquant_weights (List[AutoQuantizableLinearWeight]): the weights to tune
+        time_budget (Optional[float]): time budget in seconds, no new benchmarks are started after it's
+            exhausted
+
+    Returns:
+        bool: True if all combinations are benchmarked, False if the time budget was exhausted
+    """
+    # deduplicate the jobs across the model, a (class, shape) benchmark only depends on the shapes
+    # so we can use any weight that saw the shape
+    shape_to_weight = {}
+    for weight in autoquant_weights:
+        for shapes_and_dtype in weight.logged_data:
+            shape_to_weight.setdefault(shapes_and_dtype, weight)
+
+    num_jobs = sum(
+        check_cache(q_cls, shapes_and_dtype) is None
+        for shapes_and_dtype, weight in shape_to_weight.items()
+        for q_cls in weight.qtensor_class_list
+    )
+    logger.info(
+        f"autoquant: {num_jobs} benchmarks to run for {len(shape_to_weight)} distinct shapes "
+        f"in {len(autoquant_weights)} layers"
+    )
+
+    start = time.monotonic()
+    num_done = 0
+    for shapes_and_dtype, weight in shape_to_weight.items():
+        best_time = torch.inf
+        tuned = False
+        for q_cls in weight.qtensor_class_list:
+            if check_cache(q_cls, shapes_and_dtype) is None:
+                elapsed = time.monotonic() - start
+                if time_budget is not None and elapsed > time_budget:
+                    logger.warning(
+                        f"autoquant: time budget of {time_budget}s exhausted after {num_done}/{num_jobs} "
+                        "benchmarks, the remaining classes won't be considered"
+                    )
+                    return False
+                weight.tune_autoquant(q_cls, shapes_and_dtype, best_time)
+                tuned = True
+                num_done += 1
+                logger.info(
+                    f"autoquant: {num_done}/{num_jobs} benchmarks done, {time.monotonic() - start:0.1f}s elapsed"
+                )
+            res = check_cache(q_cls, shapes_and_dtype)
+            if res is not None and res < best_time:
+                best_time = res
+        if tuned:
+            torch._dynamo.reset()
+    return True
+
 def change_autoquantizable_to_quantized(model, **kwargs):
     """
     Converts AutoQuantizableLinearWeight tensor subclasses
     to various quantized/non-quantized tensor subclasses depending
     on benchmark results. Expectation is that these modules are
     torch.compiled afterwards.
+
+    Accepts a `time_budget` kwarg (in seconds) that bounds the time spent on benchmarking,
+    the classes that are not benchmarked within the budget are not considered.
     """
     hold =  torch._dynamo.config.automatic_dynamic_shapes
     torch._dynamo.config.automatic_dynamic_shapes = False
@@ -416,15 +718,27 @@ def change_autoquantizable_to_quantized(model, **kwargs):
             hasattr(mod, "weight") and isinstance(mod.weight, AutoQuantizableLinearWeight)
     )
     error_on_unseen=kwargs.pop("error_on_unseen", True)
+    time_budget = kwargs.pop("time_budget", None)
+
+    autoquant_weights = {}
+    for fqn, mod in model.named_modules():
+        if filter_fn(mod, fqn) and isinstance(getattr(mod, "weight", None), AutoQuantizableLinearWeight):
+            autoquant_weights[id(mod.weight)] = mod.weight
     from torchao.quantization.quant_api import _replace_with_custom_fn_if_matches_filter
     from torchao.quantization.quant_api import _get_subclass_inserter
-    _replace_with_custom_fn_if_matches_filter(
-        model,
-        _get_subclass_inserter(
-            AutoQuantizableLinearWeight, method="to_quantized", error_on_unseen=error_on_unseen, **kwargs
-        ),
-        filter_fn,
-    )
+    try:
+        tuned_all = _autoquant_tune_all(list(autoquant_weights.values()), time_budget)
+        _replace_with_custom_fn_if_matches_filter(
+            model,
+            _get_subclass_inserter(
+                AutoQuantizableLinearWeight, method="to_quantized", error_on_unseen=error_on_unseen, tune_missing=tuned_all, **kwargs
+            ),
+            filter_fn,
+        )
+    finally:
+        # persist the new benchmark results with one write, also if tuning was interrupted
+        if _AUTOQUANT_CACHE_STORE is not None:
+            _AUTOQUANT_CACHE_STORE.flush()
     torch._dynamo.config.automatic_dynamic_shapes = hold
     torch._dynamo.reset()
 
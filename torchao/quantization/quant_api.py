@@ -69,6 +69,7 @@ __all__ = [
     "get_apply_8da4w_quant",
     "get_apply_int4wo_quant",
     "get_apply_int8wo_quant",
+    "get_apply_sub_byte_wo_quant",
     "get_apply_int8dyn_quant",
 ]
 
@@ -341,12 +342,20 @@ def get_apply_8da4w_quant(groupsize=32):
     return apply_8da4w_quant
 
 
-def get_apply_int4wo_quant(groupsize=32):
+def get_apply_int4wo_quant(groupsize=32, extended_layout=None):
+    """
+    Args:
+        groupsize (int): number of elements along k sharing the same scale and zero_point
+        extended_layout (Optional[str]): layout for the int4 weight, "tensor_core_tiled" for cuda and
+          "int4_packed_cpu" for cpu, by default it's chosen based on the device of the weight
+    """
     def apply_int4wo_quant(weight):
         # avoid circular dep
         from torchao.dtypes.aqt import to_aq
 
-        groupsize = 32
+        layout = extended_layout
+        if layout is None:
+            layout = "int4_packed_cpu" if weight.device.type == "cpu" else "tensor_core_tiled"
         mapping_type = MappingType.ASYMMETRIC
         block_size = (1, groupsize)
         target_dtype = torch.int32
@@ -356,12 +365,46 @@ def get_apply_int4wo_quant(groupsize=32):
         preserve_zero = False
         zero_point_dtype = torch.bfloat16
         zero_point_domain = ZeroPointDomain.FLOAT
-        return to_aq(weight, mapping_type, block_size, target_dtype, quant_min, quant_max, eps, zero_point_dtype=zero_point_dtype, preserve_zero=preserve_zero, zero_point_domain=zero_point_domain, extended_layout="tensor_core_tiled")
+        return to_aq(weight, mapping_type, block_size, target_dtype, quant_min, quant_max, eps, zero_point_dtype=zero_point_dtype, preserve_zero=preserve_zero, zero_point_domain=zero_point_domain, extended_layout=layout)
 
     return apply_int4wo_quant
 
 
-def get_apply_int8wo_quant():
+def get_apply_sub_byte_wo_quant(nbits=2, groupsize=64):
+    """
+    Groupwise 2 or 3 bit weight only quantization, the weight is stored bit packed in the
+    "int2_packed" / "int3_packed" layout and is unpacked a tile at a time inside the matmul
+
+    Args:
+        nbits (int): number of bits of the quantized weight, 2 or 3
+        groupsize (int): number of elements along k sharing the same scale and zero_point
+    """
+    assert nbits in (2, 3), f"nbits must be 2 or 3, got {nbits}"
+
+    def apply_sub_byte_wo_quant(weight):
+        # avoid circular dep
+        from torchao.dtypes.aqt import to_aq
+
+        mapping_type = MappingType.ASYMMETRIC
+        block_size = (1, groupsize)
+        target_dtype = torch.uint8
+        quant_min = 0
+        quant_max = 2**nbits - 1
+        eps = 1e-6
+        preserve_zero = False
+        zero_point_dtype = weight.dtype
+        zero_point_domain = ZeroPointDomain.FLOAT
+        return to_aq(weight, mapping_type, block_size, target_dtype, quant_min, quant_max, eps, zero_point_dtype=zero_point_dtype, preserve_zero=preserve_zero, zero_point_domain=zero_point_domain, extended_layout=f"int{nbits}_packed")
+
+    return apply_sub_byte_wo_quant
+
+
+def get_apply_int8wo_quant(extended_layout="plain"):
+    """
+    Args:
+        extended_layout (str): layout for the int8 weight, use "int8_packed_cpu" for the fused
+          int8 weight only matmul kernel on cpu
+    """
     def apply_int8wo_quant(weight):
         # avoid circular dep
         from torchao.dtypes.aqt import to_aq
@@ -371,7 +414,7 @@ def get_apply_int8wo_quant():
         eps = torch.finfo(torch.float32).eps
         zero_point_dtype = torch.int64
         block_size = (1, weight.shape[1])
-        return to_aq(weight, mapping_type, block_size, target_dtype, eps=eps, zero_point_dtype=zero_point_dtype)
+        return to_aq(weight, mapping_type, block_size, target_dtype, eps=eps, zero_point_dtype=zero_point_dtype, extended_layout=extended_layout)
     return apply_int8wo_quant
 
 def get_apply_int8dyn_quant():
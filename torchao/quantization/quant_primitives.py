@@ -4,8 +4,9 @@
 # This source code is licensed under the license found in the
 # LICENSE file in the root directory of this source tree.
 
+import functools
 from enum import Enum
-from typing import List, Optional, Tuple
+from typing import List, NamedTuple, Optional, Tuple
 import torch
 from torch._dynamo import is_compiling as dynamo_is_compiling
 from torch._higher_order_ops.out_dtype import out_dtype
@@ -41,6 +42,7 @@ __all__ = [
     "groupwise_affine_quantize_tensor",
     "groupwise_affine_dequantize_tensor",
     "choose_qparams_affine",
+    "choose_qparams_and_quantize_affine",
     "quantize_affine",
     "dequantize_affine",
     # TODO: need to clean up above functions
@@ -142,6 +144,51 @@ def _get_reduction_params(block_size, input_size):
     return shape_for_reduction, reduction_dims
 
 
+class _QuantizationPlan(NamedTuple):
+    """Precomputed shapes used by the affine quantization primitives for a given
+    (block_size, input_size) pair
+
+    fields:
+      shape_for_reduction (Tuple[int, ...]): the shape we use to `view` input to prepare it for reduction
+      reduction_dims (Tuple[int, ...]): the dims we'll do reduction over
+      shape_after_reduction (Tuple[int, ...]): the shape we use to `view` scale and zero_point so that
+        they broadcast against the input viewed as `shape_for_reduction`
+    """
+    shape_for_reduction: Tuple[int, ...]
+    reduction_dims: Tuple[int, ...]
+    shape_after_reduction: Tuple[int, ...]
+
+
+def _build_quantization_plan(block_size, input_size) -> _QuantizationPlan:
+    shape_for_reduction, reduction_dims = _get_reduction_params(block_size, input_size)
+    shape_after_reduction = list(shape_for_reduction)
+    for i in reduction_dims:
+        shape_after_reduction[i] = 1
+    return _QuantizationPlan(tuple(shape_for_reduction), tuple(reduction_dims), tuple(shape_after_reduction))
+
+
+# the number of distinct (block_size, input_size) pairs in a model is small (one per
+# linear shape and token count), so a bounded cache is enough to hit in steady state
+_build_quantization_plan_cached = functools.lru_cache(maxsize=1024)(_build_quantization_plan)
+
+
+def _get_quantization_plan(block_size, input_size) -> _QuantizationPlan:
+    """Returns the memoized `_QuantizationPlan` for `block_size` and `input_size`, this avoids
+    rebuilding the reduction params in every call of the affine quantization primitives, which
+    matters for dynamic activation quantization where they are called for every input
+
+    When tracing with torch.compile, the plan is computed directly since shapes might be symbolic
+    and the Python overhead is paid only once anyways
+    """
+    if dynamo_is_compiling():
+        return _build_quantization_plan(block_size, input_size)
+    try:
+        return _build_quantization_plan_cached(tuple(block_size), tuple(input_size))
+    except TypeError:
+        # symbolic sizes (e.g. when tracing with dynamic shapes) are not hashable
+        return _build_quantization_plan(block_size, input_size)
+
+
 def quantize_affine(
     input: torch.Tensor,
     block_size: Tuple[int, ...],
@@ -189,15 +236,12 @@ def quantize_affine(
     # TODO: validate scale/zero_point dimensions are compatible with block_size
     assert input.dtype in [torch.float32, torch.float16, torch.bfloat16], f"Unsupported input dtype: {input.dtype}"
     quant_min, quant_max = _get_and_check_qmin_qmax(output_dtype, quant_min, quant_max)
-    shape_for_reduction, reduction_dims = _get_reduction_params(block_size, input.size())
+    plan = _get_quantization_plan(block_size, input.size())
     original_shape = input.shape
-    input = input.view(shape_for_reduction)
-    shape_after_reduction = shape_for_reduction
-    for i in reduction_dims:
-        shape_after_reduction[i] = 1
-    scale = scale.view(shape_after_reduction)
+    input = input.view(plan.shape_for_reduction)
+    scale = scale.view(plan.shape_after_reduction)
     if zero_point is not None:
-        zero_point = zero_point.view(shape_after_reduction)
+        zero_point = zero_point.view(plan.shape_after_reduction)
 
     if zero_point_domain == ZeroPointDomain.INT:
         quant = torch.clamp(
@@ -256,15 +300,12 @@ def dequantize_affine(
     assert output_dtype in [torch.float32, torch.float16, torch.bfloat16], f"Unsupported output dtype: {output_dtype}"
     quant_min, quant_max = _get_and_check_qmin_qmax(input_dtype, quant_min, quant_max)
 
-    shape_for_reduction, reduction_dims = _get_reduction_params(block_size, input.size())
+    plan = _get_quantization_plan(block_size, input.size())
     original_shape = input.shape
-    input = input.view(shape_for_reduction)
-    shape_after_reduction = shape_for_reduction
-    for i in reduction_dims:
-        shape_after_reduction[i] = 1
-    scale = scale.view(shape_after_reduction)
+    input = input.view(plan.shape_for_reduction)
+    scale = scale.view(plan.shape_after_reduction)
     if zero_point is not None:
-        zero_point = zero_point.view(shape_after_reduction)
+        zero_point = zero_point.view(plan.shape_after_reduction)
 
     if zero_point_domain == ZeroPointDomain.INT:
         # Force a copy to avoid input modification due
@@ -340,15 +381,58 @@ def choose_qparams_affine(
         zero_point_dtype = input.dtype
 
     assert len(block_size) == input.dim()
-    shape_for_reduction, reduction_dims = _get_reduction_params(block_size, input.size())
-    input = input.view(shape_for_reduction)
+    plan = _get_quantization_plan(block_size, input.size())
+    input = input.view(plan.shape_for_reduction)
+
+    min_val, max_val = _get_min_max(input, plan.reduction_dims)
+    if eps is None:
+        eps = torch.finfo(input.dtype).eps
+    return _choose_qparams_from_min_max(
+        min_val,
+        max_val,
+        mapping_type,
+        quant_min,
+        quant_max,
+        eps,
+        scale_dtype,
+        zero_point_dtype,
+        preserve_zero,
+        zero_point_domain,
+    )
+
+
+def _get_min_max(input: torch.Tensor, reduction_dims: Tuple[int, ...]) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Computes min and max of `input` over `reduction_dims`, using a single pass over `input`
+    with `torch.aminmax` when the reduction is over one dimension or over all dimensions
+    """
+    if len(reduction_dims) == 1:
+        return torch.aminmax(input, dim=reduction_dims[0], keepdim=False)
+    if len(reduction_dims) == input.dim():
+        return torch.aminmax(input)
+    return (
+        torch.amin(input, dim=reduction_dims, keepdim=False),
+        torch.amax(input, dim=reduction_dims, keepdim=False),
+    )
 
-    min_val = torch.amin(input, dim=reduction_dims, keepdim=False)
-    max_val = torch.amax(input, dim=reduction_dims, keepdim=False)
 
+def _choose_qparams_from_min_max(
+    min_val: torch.Tensor,
+    max_val: torch.Tensor,
+    mapping_type: MappingType,
+    quant_min: int,
+    quant_max: int,
+    eps: float,
+    scale_dtype: torch.dtype,
+    zero_point_dtype: torch.dtype,
+    preserve_zero: bool,
+    zero_point_domain: ZeroPointDomain,
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Computes scale and zero_point from the reduced min and max values, see `choose_qparams_affine`
+    for the meaning of the arguments
+    """
     if preserve_zero:
-        min_val_neg = torch.min(min_val, torch.zeros_like(min_val))
-        max_val_pos = torch.max(max_val, torch.zeros_like(max_val))
+        min_val_neg = torch.clamp(min_val, max=0)
+        max_val_pos = torch.clamp(max_val, min=0)
     else:
         min_val_neg = min_val
         max_val_pos = max_val
@@ -371,13 +455,94 @@ def choose_qparams_affine(
             mid_point = (quant_max + quant_min + 1) / 2
             zero_point = min_val_neg + scale * mid_point
 
-    if eps is None:
-        eps = torch.finfo(input.dtype).eps
     scale = torch.clamp(scale, min=eps)
 
     return scale.to(dtype=scale_dtype), zero_point.to(dtype=zero_point_dtype)
 
 
+def choose_qparams_and_quantize_affine(
+    input: torch.Tensor,
+    mapping_type: MappingType,
+    block_size: Tuple[int, ...],
+    target_dtype: torch.dtype,
+    quant_min: Optional[int] = None,
+    quant_max: Optional[int] = None,
+    eps: Optional[float] = None,
+    scale_dtype: Optional[torch.dtype] = None,
+    zero_point_dtype: Optional[torch.dtype] = None,
+    preserve_zero: bool = True,
+    zero_point_domain = ZeroPointDomain.INT,
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Fused version of `choose_qparams_affine` followed by `quantize_affine`, this is intended for
+    dynamic quantization (e.g. of activations) where both are called for every input.
+
+    It gives the same result as calling the two primitives, but reads `input` once for both min
+    and max (instead of once for each) and does the quantization with in-place ops on a single
+    temporary, instead of allocating a new tensor for each elementwise op.
+
+    Args:
+        see `choose_qparams_affine`
+
+    Output:
+        Tuple of quantized Tensor with `target_dtype`, scales and zero_points Tensor with requested dtype
+    """
+    assert input.dtype in [torch.float32, torch.float16, torch.bfloat16], f"Unsupported input dtype: {input.dtype}"
+    quant_min, quant_max = _get_and_check_qmin_qmax(target_dtype, quant_min, quant_max)
+    assert mapping_type in [MappingType.SYMMETRIC, MappingType.ASYMMETRIC], f"Unsupported mapping type: {mapping_type}"
+
+    if scale_dtype is None:
+        scale_dtype = input.dtype
+    if zero_point_dtype is None:
+        zero_point_dtype = input.dtype
+    if eps is None:
+        eps = torch.finfo(input.dtype).eps
+
+    assert len(block_size) == input.dim()
+    plan = _get_quantization_plan(block_size, input.size())
+    original_shape = input.shape
+    input = input.view(plan.shape_for_reduction)
+
+    min_val, max_val = _get_min_max(input, plan.reduction_dims)
+    scale, zero_point = _choose_qparams_from_min_max(
+        min_val,
+        max_val,
+        mapping_type,
+        quant_min,
+        quant_max,
+        eps,
+        scale_dtype,
+        zero_point_dtype,
+        preserve_zero,
+        zero_point_domain,
+    )
+
+    # same computation as `quantize_affine`, done in place on a single temporary, we only need to
+    # make sure the temporary has the dtype that the out of place version would have promoted to
+    broadcast_scale = scale.view(plan.shape_after_reduction)
+    broadcast_zero_point = zero_point.view(plan.shape_after_reduction)
+    if zero_point_domain == ZeroPointDomain.INT:
+        quant = input * (1.0 / broadcast_scale)
+        quant.round_()
+        if torch.result_type(quant, broadcast_zero_point) != quant.dtype:
+            quant = quant + broadcast_zero_point
+        else:
+            quant.add_(broadcast_zero_point)
+    else:
+        assert zero_point_domain == ZeroPointDomain.FLOAT
+        mid_point = (quant_max + quant_min + 1) / 2
+        min_val = broadcast_zero_point - broadcast_scale * mid_point
+        quant = input - min_val
+        if torch.result_type(quant, broadcast_scale) != quant.dtype:
+            quant = quant / broadcast_scale
+        else:
+            quant.div_(broadcast_scale)
+        quant.round_()
+    quant.clamp_(quant_min, quant_max)
+    quant = quant.to(target_dtype).view(original_shape)
+
+    return quant, scale, zero_point
+
+
 # copy-pasta of https://www.internalfb.com/intern/anp/view/?id=3350736
 def dynamically_quantize_per_tensor(
     x,